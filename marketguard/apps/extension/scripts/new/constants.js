@@ -14,6 +14,8 @@
     NLP_GENERATIVE_EXPLANATION: "http://localhost:8002/api/nlp/v1/generative-explanation",
     CHECK_UPI: "http://localhost:8001/api/check/v1/upi-verify",
     SEBI_REGISTRY: "http://localhost:8001/api/registry/v1/verify",
+    SEBI_REGISTRY_BULK: "http://localhost:8001/api/registry/v1/verify-bulk",
+    SEBI_REGISTRY_SCAN: "http://localhost:8001/api/registry/v1/scan-text",
     DEEPFAKE_IMAGE_DATAURL: "http://localhost:8003/api/detect/image-dataurl",
     DEEPFAKE_VIDEO_DATAURL: "http://localhost:8003/api/detect/video-dataurl",
     MEDIA_BATCH: "http://localhost:8003/api/detect/batch-media"
@@ -19,6 +19,16 @@
     return MG.services.registryVerify(params);
   };
 
+  // Many identifiers (e.g. every reg no / PAN / UPI on a page) in one round trip
+  MG.registryVerifyBulk = function registryVerifyBulk(items) {
+    return MG.services.registryVerifyBulk(items);
+  };
+
+  // Raw page text in, identifiers with char offsets and verdicts out (server-side extraction)
+  MG.registryScanText = function registryScanText(text, type) {
+    return MG.services.registryScanText(text, type);
+  };
+
   MG.summarizeMatches = function summarizeMatches(json) {
     const n = Number(json?.count || json?.matches?.length || 0);
     if (!n) return 'No match';
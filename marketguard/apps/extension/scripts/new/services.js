@@ -123,6 +123,39 @@
       return await assertOk(r, "registry_error");
     },
 
+    /**
+     * Verify many identifiers in one request. Accepts an array of items:
+     *   [{ kind: "reg_no"|"pan"|"upi"|"name", value, type?, fuzzy? }]
+     * Returns: Array of { kind, value, count, matches } aligned to inputs.
+     */
+    async registryVerifyBulk(items) {
+      const url = MG?.API?.SEBI_REGISTRY_BULK;
+      if (!url) throw new Error("Registry BULK API not configured");
+      if (!Array.isArray(items) || !items.length) return [];
+      const r = await mgFetch(url, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ items }),
+      });
+      const j = await assertOk(r, "registry_bulk_error");
+      return Array.isArray(j?.results) ? j.results : [];
+    },
+
+    /**
+     * Find and verify every reg no / PAN / UPI handle in raw page text.
+     * Returns: { hits: [{ kind, value, start, end, ref }], identifiers: [{ kind, key, verdict, count, matches }] }
+     */
+    async registryScanText(text, type) {
+      const url = MG?.API?.SEBI_REGISTRY_SCAN;
+      if (!url) throw new Error("Registry SCAN API not configured");
+      const r = await mgFetch(url, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(type ? { text: String(text || ""), type } : { text: String(text || "") }),
+      });
+      return await assertOk(r, "registry_scan_error");
+    },
+
     // -------------------------------------------------------------------------
     // Deepfake / Media Detection
     // -------------------------------------------------------------------------
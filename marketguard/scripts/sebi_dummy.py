@@ -12,15 +12,31 @@
 
 import argparse
 import hashlib
+import importlib.util
+import os
 import random
 import sqlite3
 import string
 import time
 from datetime import datetime
+from types import ModuleType
 from typing import Optional
 
 from faker import Faker
 
+# The registry service owns the DB schema (services/registry/schema.py, risk_summary.py);
+# both are loaded by path so this script leaves sys.path alone
+REGISTRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "services", "registry")
+
+def _load_registry_module(name: str) -> ModuleType:
+    spec = importlib.util.spec_from_file_location(name, os.path.join(REGISTRY_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+risk_summary = _load_registry_module("risk_summary")
+schema = _load_registry_module("schema")
+
 # --------------------------- Config ---------------------------
 
 INTERMEDIARY_TYPES = ["IA", "RA", "PMS", "BROKER", "NONE"]
@@ -115,83 +131,10 @@ class SEBIDummyDB:
 
     def setup_database(self):
         conn = self.get_connection()
-        cur = conn.cursor()
-
-        # Users table
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                full_name TEXT NOT NULL,
-                email TEXT NOT NULL,
-                phone TEXT,
-                registration_date TEXT NOT NULL,   -- YYYY-MM-DD
-                last_login TEXT,                   -- YYYY-MM-DD
-                account_status TEXT DEFAULT 'active',
-                malicious_activity_history INTEGER DEFAULT 0,
-                -- Enrichment fields:
-                pan_id TEXT,
-                intermediary_type TEXT,            -- IA/RA/PMS/BROKER/NONE
-                sebi_reg_no TEXT                   -- INA/INH/INP/INZ + 8 digits
-            )
-            """
-        )
 
-        # UPI accounts
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS upi_accounts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                upi_id TEXT UNIQUE NOT NULL,
-                bank_name TEXT NOT NULL,
-                account_number TEXT NOT NULL,
-                ifsc_code TEXT NOT NULL,
-                verification_status TEXT DEFAULT 'pending',
-                created_date TEXT NOT NULL,        -- YYYY-MM-DD
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-            """
-        )
-
-        # Login attempts
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS login_attempts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL,
-                attempt_time TEXT NOT NULL,        -- YYYY-MM-DD HH:MM:SS
-                success INTEGER NOT NULL,
-                ip_address TEXT
-            )
-            """
-        )
-
-        # Malicious activities
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS malicious_activities (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                activity_type TEXT NOT NULL,
-                activity_date TEXT NOT NULL,       -- YYYY-MM-DD HH:MM:SS
-                severity TEXT CHECK(severity IN ('low','medium','high')),
-                description TEXT,
-                resolved INTEGER DEFAULT 0,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-            """
-        )
-
-        # Helpful indexes
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_users_sebi ON users(sebi_reg_no)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_upi_user ON upi_accounts(user_id)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_upi_upi_id ON upi_accounts(upi_id)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_mal_user ON malicious_activities(user_id)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_login_username ON login_attempts(username)")
+        # Tables & helpful indexes (services/registry/schema.py)
+        schema.create_tables(conn)
+        schema.create_indexes(conn)
 
         conn.commit()
         conn.close()
@@ -556,6 +499,15 @@ def main():
     print(f"Generating data into {args.db} ...")
     sebi.generate_dummy_data(num_users=args.users)
 
+    # Pre-aggregated lookup table (+ triggers that keep it current)
+    print("Building risk summary table...")
+    conn = sebi.get_connection()
+    try:
+        rows = risk_summary.install(conn)
+    finally:
+        conn.close()
+    print(f"  {rows} summary rows")
+
     # Stats
     sebi.get_database_stats()
 
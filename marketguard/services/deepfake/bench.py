@@ -0,0 +1,404 @@
+# bench.py
+# Throughput benchmark for the deepfake service
+# - Deterministic synthetic images (sizes x formats) and videos (codecs x fps x length)
+# - In-process: load_image_from_bytes, detect_image_stub, _detect_video_path,
+#   batch-media pipeline, OCR pool
+# - Over HTTP (--http URL): the same workloads against a running service
+# - Every iteration uses fresh bytes so the result caches never short-circuit work
+# - Reports latency (mean/p50/p99/max), items/s, bytes/s, frames/s and peak RSS as JSON
+#
+# Usage:
+#   python bench.py --quick --out bench.json
+#   python bench.py --http http://localhost:8003 --out bench_http.json
+#   python bench.py --quick --compare bench_old.json
+#   python bench.py --only video --workdir /tmp/mg-bench   # keep the synthetic media
+# -------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import base64
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZES = [(640, 480), (1280, 720), (1920, 1080), (3840, 2160)]
+IMAGE_FORMATS = ["JPEG", "PNG", "WEBP"]
+VIDEO_CODECS = [("mp4v", ".mp4"), ("MJPG", ".avi"), ("XVID", ".avi")]
+VIDEO_FPS = [15, 30]
+VIDEO_SECONDS = [4, 16]
+VIDEO_SIZE = (640, 360)
+
+
+def _isolate_service_state(workdir: str) -> None:
+  # Memory-only caches with no retention, and scratch paths for everything on disk
+  os.environ.update({
+    "RESULT_CACHE_PATH": "",
+    "RESULT_CACHE_MEM_ITEMS": "0",
+    "PHASH_INDEX_PATH": "",
+    "HTTP_CACHE_DIR": "",
+    "JOB_DB_PATH": os.path.join(workdir, "jobs.sqlite"),
+    "JOB_DIR": os.path.join(workdir, "jobs"),
+    "SPOOL_DIR": workdir,
+    "MAX_DOWNLOAD_BYTES": str(256 * 1024 * 1024),
+  })
+
+
+# ---------------- synthetic media ----------------
+def synth_rgb(w: int, h: int, seed: int) -> np.ndarray:
+  """Smooth gradients + blocky 'text' + mild noise: compresses like a real screenshot/photo mix."""
+  rng = np.random.default_rng(seed)
+  y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+  phase = rng.uniform(0, 2 * np.pi, 3)
+  img = np.stack([
+    127 + 100 * np.sin(x / (w / rng.uniform(2, 6)) + phase[c]) * np.cos(y / (h / rng.uniform(2, 6)))
+    for c in range(3)
+  ], axis=-1)
+  for _ in range(12):
+    bw, bh = int(rng.integers(w // 20, w // 4)), int(rng.integers(h // 40, h // 12))
+    bx, by = int(rng.integers(0, w - bw)), int(rng.integers(0, h - bh))
+    img[by:by + bh, bx:bx + bw] = rng.integers(0, 255, 3)
+  img += rng.normal(0, 6, img.shape)
+  return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def encode_image(rgb: np.ndarray, fmt: str) -> bytes:
+  buf = io.BytesIO()
+  kwargs = {"quality": 85} if fmt in ("JPEG", "WEBP") else {}
+  Image.fromarray(rgb).save(buf, fmt, **kwargs)
+  return buf.getvalue()
+
+
+def synth_image(w: int, h: int, fmt: str, seed: int) -> bytes:
+  return encode_image(synth_rgb(w, h, seed), fmt)
+
+
+def synth_video(path: str, codec: str, fps: int, seconds: int, seed: int) -> Optional[int]:
+  """Panning background with moving blocks; returns the frame count or None if the codec is unavailable."""
+  import cv2  # type: ignore
+  w, h = VIDEO_SIZE
+  writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, (w, h))
+  if not writer.isOpened():
+    return None
+  base = synth_rgb(w * 2, h, seed)[:, :, ::-1]
+  rng = np.random.default_rng(seed + 1)
+  n = fps * seconds
+  for i in range(n):
+    off = int(i * w / n)
+    frame = np.ascontiguousarray(base[:, off:off + w])
+    cx, cy = int((i * 7) % (w - 40)), int(h / 2 + h / 3 * np.sin(i / fps))
+    frame[max(0, cy - 20):cy + 20, cx:cx + 40] = rng.integers(0, 255, 3)
+    writer.write(frame)
+  writer.release()
+  return n if os.path.getsize(path) > 0 else None
+
+
+# ---------------- measurement ----------------
+def _rss_mb() -> float:
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def summarize(
+  name: str,
+  latencies: Sequence[float],
+  nbytes: int,
+  items: int,
+  frames: int = 0,
+  extra: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+  lat = np.asarray(latencies, dtype=np.float64) * 1000.0
+  total_s = float(lat.sum()) / 1000.0 or 1e-9
+  out: Dict[str, Any] = {
+    "name": name,
+    "iterations": len(latencies),
+    "latency_ms": {
+      "mean": round(float(lat.mean()), 3),
+      "p50": round(float(np.percentile(lat, 50)), 3),
+      "p99": round(float(np.percentile(lat, 99)), 3),
+      "max": round(float(lat.max()), 3),
+    },
+    "throughput": {
+      "items_per_s": round(items / total_s, 2),
+      "bytes_per_s": round(nbytes / total_s, 1),
+    },
+    "peak_rss_mb": _rss_mb(),  # process high-water mark so far (monotonic across cases)
+  }
+  if frames:
+    out["throughput"]["frames_per_s"] = round(frames / total_s, 2)
+  if extra:
+    out.update(extra)
+  return out
+
+
+def timed(fn: Callable[[], Any]) -> Tuple[float, Any]:
+  t0 = time.perf_counter()
+  res = fn()
+  return time.perf_counter() - t0, res
+
+
+# ---------------- in-process workloads ----------------
+def bench_images_inproc(main: Any, sizes, formats, iters: int) -> List[Dict[str, Any]]:
+  results = []
+  for w, h in sizes:
+    for fmt in formats:
+      payloads = [synth_image(w, h, fmt, seed=1000 + i) for i in range(iters)]
+      decode, score, total = [], [], []
+      for raw in payloads:
+        t_dec, img = timed(lambda: main.load_image_from_bytes(raw))
+        t_score, _ = timed(lambda: main.detect_image_stub(img))
+        t_all, _ = timed(lambda: main._detect_image_bytes(raw))
+        decode.append(t_dec)
+        score.append(t_score)
+        total.append(t_all)
+      nbytes = sum(len(p) for p in payloads)
+      results.append(summarize(
+        f"inproc.image.{fmt.lower()}.{w}x{h}", total, nbytes, len(payloads),
+        extra={
+          "decode_full_ms": round(float(np.mean(decode)) * 1000.0, 3),
+          "score_full_ms": round(float(np.mean(score)) * 1000.0, 3),
+          "mean_bytes": nbytes // len(payloads),
+        },
+      ))
+  return results
+
+
+def bench_videos_inproc(main: Any, videos: List[Dict[str, Any]], iters: int) -> List[Dict[str, Any]]:
+  results = []
+  for v in videos:
+    for mode in ("uniform", "adaptive", "scenes"):
+      lat, frames = [], 0
+      for _ in range(iters):
+        t, resp = timed(lambda: main._detect_video_path(v["path"], 32, 2.0, mode=mode))
+        lat.append(t)
+        frames += resp.frames_evaluated
+      results.append(summarize(
+        f"inproc.video.{v['codec']}.{v['fps']}fps.{v['seconds']}s.{mode}",
+        lat, v["bytes"] * iters, iters, frames=frames,
+        extra={"source_frames": v["frames"], "frames_evaluated": frames // iters},
+      ))
+  return results
+
+
+def bench_batch_inproc(main: Any, batch_sizes: Sequence[int], iters: int) -> List[Dict[str, Any]]:
+  import asyncio
+  results = []
+  for n in batch_sizes:
+    lat, nbytes = [], 0
+    for it in range(iters):
+      raws = [synth_image(1280, 720, "JPEG", seed=5000 + it * n + k) for k in range(n)]
+      nbytes += sum(len(r) for r in raws)
+      slots = [
+        main._BatchSlot(kind="image", media_type="image", data_url="data:image/jpeg;base64," + base64.b64encode(r).decode())
+        for r in raws
+      ]
+      t, _ = timed(lambda: asyncio.run(main._run_batch(slots, main.BATCH_CONCURRENCY)))
+      lat.append(t)
+    results.append(summarize(f"inproc.batch_media.{n}x1280x720.jpeg", lat, nbytes, n * iters))
+  return results
+
+
+def bench_ocr_inproc(main: Any, iters: int) -> List[Dict[str, Any]]:
+  if not main.HAS_EASYOCR:
+    return [{"name": "inproc.ocr", "skipped": "easyocr not installed"}]
+  main.OCR_POOL.start(wait=True)
+  lat, nbytes = [], 0
+  detect, recognize = [], []
+  for i in range(iters):
+    rgb = synth_rgb(1280, 720, seed=7000 + i)
+    nbytes += rgb.nbytes
+    t, res = timed(lambda: main.OCR_POOL.submit(rgb, ("en",)).result())
+    lat.append(t)
+    detect.append(res.detect_ms)
+    recognize.append(res.recognize_ms)
+  main.OCR_POOL.close()
+  return [summarize("inproc.ocr.1280x720", lat, nbytes, iters, extra={
+    "detect_ms": round(float(np.mean(detect)), 3), "recognize_ms": round(float(np.mean(recognize)), 3),
+  })]
+
+
+# ---------------- HTTP workloads ----------------
+def bench_http(base: str, sizes, formats, videos, batch_sizes, iters: int, ocr: bool = True) -> List[Dict[str, Any]]:
+  import requests
+  s = requests.Session()
+  base = base.rstrip("/")
+  results = []
+
+  def post(path: str, **kw) -> float:
+    t, r = timed(lambda: s.post(base + path, timeout=600, **kw))
+    r.raise_for_status()
+    return t
+
+  for w, h in sizes:
+    for fmt in formats:
+      payloads = [synth_image(w, h, fmt, seed=2000 + i) for i in range(iters)]
+      lat = [post("/api/detect/image", files={"file": (f"b.{fmt.lower()}", p, f"image/{fmt.lower()}")}) for p in payloads]
+      results.append(summarize(f"http.image.{fmt.lower()}.{w}x{h}", lat, sum(map(len, payloads)), iters))
+
+  for v in videos:
+    lat = []
+    for i in range(iters):
+      with open(v["path"], "rb") as fh:
+        body = fh.read() + os.urandom(16) if i else fh.read()  # trailing bytes defeat the sha cache
+      lat.append(post("/api/detect/video?max_frames=32&sample_fps=2", files={"file": ("v" + v["ext"], body, "video/mp4")}))
+    results.append(summarize(f"http.video.{v['codec']}.{v['fps']}fps.{v['seconds']}s.uniform", lat, v["bytes"] * iters, iters))
+
+  for n in batch_sizes:
+    lat_json, lat_multi, nbytes = [], [], 0
+    for it in range(iters):
+      raws = [synth_image(1280, 720, "JPEG", seed=6000 + it * n + k) for k in range(n)]
+      nbytes += sum(map(len, raws))
+      media = [{"data_url": "data:image/jpeg;base64," + base64.b64encode(r).decode()} for r in raws]
+      lat_json.append(post("/api/detect/batch-media", json={"media": media}))
+      raws = [synth_image(1280, 720, "JPEG", seed=9000 + it * n + k) for k in range(n)]
+      lat_multi.append(post("/api/detect/batch-media-multipart", files=[("files", (f"{k}.jpg", r, "image/jpeg")) for k, r in enumerate(raws)]))
+    results.append(summarize(f"http.batch_media.{n}x1280x720.jpeg", lat_json, nbytes, n * iters))
+    results.append(summarize(f"http.batch_media_multipart.{n}x1280x720.jpeg", lat_multi, nbytes, n * iters))
+
+  if ocr:
+    payloads = [synth_image(1280, 720, "PNG", seed=8000 + i) for i in range(iters)]
+    try:
+      lat = [post("/api/ocr", files={"file": ("o.png", p, "image/png")}) for p in payloads]
+      results.append(summarize("http.ocr.1280x720", lat, sum(map(len, payloads)), iters))
+    except requests.HTTPError as e:
+      results.append({"name": "http.ocr.1280x720", "skipped": str(e)})
+  return results
+
+
+# ---------------- driver ----------------
+def _meta(args: argparse.Namespace, main: Any = None) -> Dict[str, Any]:
+  try:
+    commit = subprocess.run(
+      ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+      cwd=os.path.dirname(os.path.abspath(__file__)),
+    ).stdout.strip() or None
+  except Exception:
+    commit = None
+  meta: Dict[str, Any] = {
+    "commit": commit,
+    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    "python": platform.python_version(),
+    "platform": platform.platform(),
+    "cpu_count": os.cpu_count(),
+    "numpy": np.__version__,
+    "pillow": Image.__version__,
+    "target": args.http or "inproc",
+    "quick": args.quick,
+    "iterations": args.iters,
+  }
+  try:
+    import cv2  # type: ignore
+    meta["opencv"] = cv2.__version__
+  except Exception:
+    meta["opencv"] = None
+  if main is not None:
+    meta.update({
+      "detector": f"{main.DETECTOR_NAME}-{main.DETECTOR_VERSION}",
+      "analysis_size": main.ANALYSIS_SIZE,
+      "batch_workers": main.BATCH_WORKERS,
+    })
+  return meta
+
+
+def compare(old_path: str, new: Dict[str, Any]) -> None:
+  with open(old_path) as fh:
+    old = {r["name"]: r for r in json.load(fh)["results"] if "latency_ms" in r}
+  print(f"{'case':60s} {'p50 old':>10s} {'p50 new':>10s} {'delta':>8s}")
+  for r in new["results"]:
+    if "latency_ms" not in r or r["name"] not in old:
+      continue
+    a, b = old[r["name"]]["latency_ms"]["p50"], r["latency_ms"]["p50"]
+    print(f"{r['name']:60s} {a:10.2f} {b:10.2f} {(b / a - 1) * 100 if a else 0:+7.1f}%")
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description="Benchmark the deepfake service (in-process or over HTTP).")
+  parser.add_argument("--http", default=None, help="base URL of a running service, e.g. http://localhost:8003")
+  parser.add_argument("--quick", action="store_true", help="small matrix (CI / smoke runs)")
+  parser.add_argument("--iters", type=int, default=None, help="iterations per case (default 5, quick 3)")
+  parser.add_argument("--only", default=None, help="comma list: image,video,batch,ocr")
+  parser.add_argument("--out", default=None, help="write JSON results here (default: stdout)")
+  parser.add_argument("--compare", default=None, help="previous JSON results to diff p50 latency against")
+  parser.add_argument("--workdir", default=None,
+                      help="keep synthetic videos and service scratch files here (default: a temp dir, removed afterwards)")
+  args = parser.parse_args()
+  args.iters = args.iters or (3 if args.quick else 5)
+  only = set((args.only or "image,video,batch,ocr").split(","))
+
+  sizes = IMAGE_SIZES[:2] if args.quick else IMAGE_SIZES
+  formats = IMAGE_FORMATS
+  codecs = VIDEO_CODECS[:1] if args.quick else VIDEO_CODECS
+  fps_list = VIDEO_FPS[:1] if args.quick else VIDEO_FPS
+  seconds = VIDEO_SECONDS[:1] if args.quick else VIDEO_SECONDS
+  batch_sizes = [8] if args.quick else [8, 32]
+
+  if args.workdir:
+    os.makedirs(args.workdir, exist_ok=True)
+    workdir = args.workdir
+  else:
+    workdir = tempfile.mkdtemp(prefix="mg-bench-")
+  try:
+    videos: List[Dict[str, Any]] = []
+    if "video" in only:
+      try:
+        for codec, ext in codecs:
+          for fps in fps_list:
+            for secs in seconds:
+              path = os.path.join(workdir, f"{codec}_{fps}_{secs}{ext}")
+              n = synth_video(path, codec, fps, secs, seed=42)
+              if n:
+                videos.append({"path": path, "codec": codec, "ext": ext, "fps": fps, "seconds": secs,
+                               "frames": n, "bytes": os.path.getsize(path)})
+      except ImportError:
+        pass
+
+    mod = None
+    results: List[Dict[str, Any]] = []
+    if args.http:
+      results = bench_http(
+        args.http, sizes if "image" in only else [], formats, videos,
+        batch_sizes if "batch" in only else [], args.iters, ocr="ocr" in only,
+      )
+    else:
+      _isolate_service_state(workdir)
+      sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+      import main as mod  # noqa: E402 (env must be set first)
+      if "image" in only:
+        results += bench_images_inproc(mod, sizes, formats, args.iters)
+      if "video" in only:
+        if mod.HAS_CV2:
+          results += bench_videos_inproc(mod, videos, args.iters)
+        else:
+          results.append({"name": "inproc.video", "skipped": "opencv not installed"})
+      if "batch" in only:
+        results += bench_batch_inproc(mod, batch_sizes, args.iters)
+      if "ocr" in only:
+        results += bench_ocr_inproc(mod, args.iters)
+  finally:
+    if not args.workdir:
+      shutil.rmtree(workdir, ignore_errors=True)
+
+  report = {"meta": _meta(args, mod), "results": results, "peak_rss_mb": _rss_mb()}
+  text = json.dumps(report, indent=2)
+  if args.out:
+    with open(args.out, "w") as fh:
+      fh.write(text + "\n")
+  else:
+    print(text)
+  if args.compare:
+    compare(args.compare, report)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,368 @@
+# http_fetch.py
+# Async media fetching for the deepfake service
+# - One pooled httpx.AsyncClient (keep-alive) + per-host concurrency limits
+# - Bodies stream to a private temp file (sha256 + byte cap enforced per chunk)
+# - On-disk HTTP cache: body files + SQLite index, byte-bound LRU eviction;
+#   the directory is only created by open() (the service calls it at startup)
+# - Honors Cache-Control (no-store / private / no-cache / max-age) and Expires;
+#   stale entries are revalidated with If-None-Match / If-Modified-Since
+# -------------------------------------------------------------
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+
+class FetchError(Exception):
+  pass
+
+
+class FetchTooLarge(FetchError):
+  pass
+
+
+@dataclass
+class Fetched:
+  """A fetched body in a file owned by the caller (delete it when done)."""
+  path: str
+  sha256: str
+  size: int
+  content_type: Optional[str]
+  cache: str  # miss | hit | revalidated | bypass
+
+
+@dataclass
+class _Entry:
+  url: str
+  body: str
+  sha256: str
+  size: int
+  etag: Optional[str]
+  last_modified: Optional[str]
+  content_type: Optional[str]
+  fresh_until: float
+
+
+_MAX_AGE_RE = re.compile(r"(?:^|,)\s*(?:s-maxage|max-age)\s*=\s*\"?(\d+)")
+
+
+def _freshness(headers: Mapping[str, str], now: float) -> Optional[float]:
+  """fresh_until timestamp, or None when the response must not be stored."""
+  cc = headers.get("cache-control", "").lower()
+  if "no-store" in cc or "private" in cc:
+    return None
+  if "no-cache" in cc:
+    return now
+  m = _MAX_AGE_RE.search(cc)
+  if m:
+    return now + int(m.group(1))
+  expires = headers.get("expires")
+  if expires:
+    try:
+      return parsedate_to_datetime(expires).timestamp()
+    except (TypeError, ValueError):
+      return now
+  return now
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+  try:
+    os.link(src, dst)
+  except OSError:
+    shutil.copyfile(src, dst)
+
+
+class HTTPCache:
+  def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+    self.dir = directory
+    self.max_bytes = max(0, max_bytes)
+    self._lock = threading.Lock()
+    self._conn: Optional[sqlite3.Connection] = None
+    self._used = 0
+    self.hits = 0
+    self.revalidated = 0
+    self.misses = 0
+
+  def open(self) -> "HTTPCache":
+    """Create the directory and index; until then every lookup misses and nothing is stored."""
+    with self._lock:
+      if self._conn is None:
+        self._open()
+    return self
+
+  def _open(self) -> None:
+    os.makedirs(self.dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(self.dir, "index.sqlite"), check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(
+      """
+      CREATE TABLE IF NOT EXISTS entries (
+        url TEXT PRIMARY KEY,
+        body TEXT NOT NULL,
+        sha256 TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        content_type TEXT,
+        fresh_until REAL NOT NULL,
+        accessed REAL NOT NULL
+      )
+      """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed)")
+    self._used = int(conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0])
+    self._conn = conn
+
+  def _body_path(self, url: str) -> str:
+    return os.path.join(self.dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".body")
+
+  def lookup(self, url: str) -> Optional[_Entry]:
+    with self._lock:
+      if self._conn is None:
+        return None
+      row = self._conn.execute(
+        "SELECT url, body, sha256, size, etag, last_modified, content_type, fresh_until FROM entries WHERE url = ?",
+        (url,),
+      ).fetchone()
+      if row is None:
+        return None
+      entry = _Entry(*row)
+      if not os.path.exists(entry.body):
+        self._drop(url, entry.size)
+        return None
+      return entry
+
+  def checkout(self, entry: _Entry, dest: str, headers: Optional[Mapping[str, str]] = None) -> bool:
+    """
+    Hard-link (or copy) the body to dest; a 304's headers refresh the entry.
+    False when the body vanished since lookup (evicted by a concurrent store
+    or by another process sharing the directory): the entry is dropped and
+    the caller refetches.
+    """
+    now = time.time()
+    with self._lock:
+      try:
+        _link_or_copy(entry.body, dest)
+      except OSError:
+        try:
+          os.unlink(dest)
+        except OSError:
+          pass
+        row = self._conn.execute("SELECT size FROM entries WHERE url = ?", (entry.url,)).fetchone()
+        if row is not None:
+          self._drop(entry.url, row[0])
+        return False
+      if headers is not None:
+        fresh = _freshness(headers, now)
+        self._conn.execute(
+          "UPDATE entries SET fresh_until = ?, accessed = ?, etag = COALESCE(?, etag) WHERE url = ?",
+          (fresh if fresh is not None else now, now, headers.get("etag"), entry.url),
+        )
+      else:
+        self._conn.execute("UPDATE entries SET accessed = ? WHERE url = ?", (now, entry.url))
+    return True
+
+  def store(self, url: str, src: str, sha: str, size: int, headers: Mapping[str, str]) -> bool:
+    now = time.time()
+    fresh = _freshness(headers, now)
+    etag, last_modified = headers.get("etag"), headers.get("last-modified")
+    if fresh is None or size > self.max_bytes:
+      return False
+    if fresh <= now and not (etag or last_modified):
+      return False  # nothing to revalidate with: every use would be a full refetch
+    body = self._body_path(url)
+    with self._lock:
+      if self._conn is None:
+        return False
+      old = self._conn.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+      tmp = body + ".tmp"
+      _link_or_copy(src, tmp)
+      os.replace(tmp, body)
+      self._conn.execute(
+        "INSERT OR REPLACE INTO entries (url, body, sha256, size, etag, last_modified, content_type, fresh_until, accessed) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (url, body, sha, size, etag, last_modified, headers.get("content-type"), fresh, now),
+      )
+      self._used += size - (old[0] if old else 0)
+      if self._used > self.max_bytes:
+        self._evict()
+    return True
+
+  def _drop(self, url: str, size: int) -> None:
+    self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+    self._used -= size
+
+  def _evict(self) -> None:
+    # Least-recently-used bodies go first until we are ~10% under budget
+    target = int(self.max_bytes * 0.9)
+    doomed = []
+    for url, body, size in self._conn.execute("SELECT url, body, size FROM entries ORDER BY accessed ASC").fetchall():
+      if self._used <= target:
+        break
+      doomed.append((url,))
+      self._used -= size
+      try:
+        os.unlink(body)
+      except OSError:
+        pass
+    self._conn.executemany("DELETE FROM entries WHERE url = ?", doomed)
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      n = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] if self._conn is not None else 0
+    return {
+      "dir": self.dir,
+      "entries": n,
+      "bytes": self._used,
+      "max_bytes": self.max_bytes,
+      "hits": self.hits,
+      "revalidated": self.revalidated,
+      "misses": self.misses,
+    }
+
+
+class AsyncFetcher:
+  def __init__(
+    self,
+    cache: Optional[HTTPCache],
+    max_bytes: int,
+    timeout: float,
+    max_connections: int = 32,
+    per_host: int = 4,
+    chunk_bytes: int = 64 * 1024,
+    spool_dir: Optional[str] = None,
+  ):
+    self.cache = cache
+    self.max_bytes = max_bytes
+    self.timeout = timeout
+    self.max_connections = max_connections
+    self.per_host = max(1, per_host)
+    self.chunk_bytes = chunk_bytes
+    self.spool_dir = spool_dir
+    self._client: Optional[httpx.AsyncClient] = None
+    self._loop: Optional[asyncio.AbstractEventLoop] = None
+    self._hosts: Dict[str, asyncio.Semaphore] = {}
+
+  # ---------------- lifecycle ----------------
+  def _ensure_client(self) -> httpx.AsyncClient:
+    # The client (and its pool) belongs to one event loop; rebuild if the loop changed
+    loop = asyncio.get_running_loop()
+    if self._client is None or self._loop is not loop:
+      self._client = httpx.AsyncClient(
+        timeout=self.timeout,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+      )
+      self._loop = loop
+      self._hosts = {}
+    return self._client
+
+  async def aclose(self) -> None:
+    if self._client is not None:
+      await self._client.aclose()
+    self._client, self._loop, self._hosts = None, None, {}
+
+  def _host_gate(self, url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc.lower()
+    gate = self._hosts.get(host)
+    if gate is None:
+      gate = self._hosts[host] = asyncio.Semaphore(self.per_host)
+    return gate
+
+  # ---------------- fetch ----------------
+  def _tempfile(self, suffix: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=self.spool_dir)
+    os.close(fd)
+    return path
+
+  async def fetch(self, url: str, suffix: str = "") -> Fetched:
+    if urlsplit(url).scheme not in ("http", "https"):
+      raise FetchError("Only http(s) URLs are supported")
+    client = self._ensure_client()
+    dest = self._tempfile(suffix)
+    try:
+      async with self._host_gate(url):
+        return await self._fetch(client, url, dest)
+    except BaseException:
+      try:
+        os.unlink(dest)
+      except OSError:
+        pass
+      raise
+
+  async def _fetch(self, client: httpx.AsyncClient, url: str, dest: str, use_cache: bool = True) -> Fetched:
+    entry = self.cache.lookup(url) if self.cache is not None and use_cache else None
+    if entry is not None and entry.fresh_until > time.time():
+      if self.cache.checkout(entry, dest + ".c"):  # type: ignore[union-attr]
+        os.replace(dest + ".c", dest)
+        self.cache.hits += 1  # type: ignore[union-attr]
+        return Fetched(dest, entry.sha256, entry.size, entry.content_type, "hit")
+      entry = None  # body evicted since lookup: plain GET
+    headers: Dict[str, str] = {}
+    if entry is not None:
+      if entry.etag:
+        headers["If-None-Match"] = entry.etag
+      if entry.last_modified:
+        headers["If-Modified-Since"] = entry.last_modified
+
+    try:
+      async with client.stream("GET", url, headers=headers) as r:
+        if r.status_code == 304 and entry is not None:
+          if not self.cache.checkout(entry, dest + ".c", r.headers):  # type: ignore[union-attr]
+            # Revalidated a body that is no longer on disk; ask again without validators
+            return await self._fetch(client, url, dest, use_cache=False)
+          os.replace(dest + ".c", dest)
+          self.cache.revalidated += 1  # type: ignore[union-attr]
+          return Fetched(dest, entry.sha256, entry.size, entry.content_type, "revalidated")
+        r.raise_for_status()
+        declared = r.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+          raise FetchTooLarge("Remote file too large")
+        h = hashlib.sha256()
+        size = 0
+        with open(dest, "wb") as fh:
+          async for chunk in r.aiter_bytes(self.chunk_bytes):
+            size += len(chunk)
+            if size > self.max_bytes:
+              raise FetchTooLarge("Remote file too large")
+            h.update(chunk)
+            fh.write(chunk)
+        sha = h.hexdigest()
+        resp_headers = r.headers
+        content_type = r.headers.get("content-type")
+    except FetchError:
+      raise
+    except httpx.HTTPStatusError as e:
+      raise FetchError(f"Download failed: HTTP {e.response.status_code}") from e
+    except httpx.HTTPError as e:
+      raise FetchError(f"Download failed: {e}") from e
+
+    cache = "bypass"
+    if self.cache is not None:
+      self.cache.misses += 1
+      if self.cache.store(url, dest, sha, size, resp_headers):
+        cache = "miss"
+    return Fetched(dest, sha, size, content_type, cache)
+
+  def stats(self) -> Dict[str, Any]:
+    return {
+      "max_connections": self.max_connections,
+      "per_host": self.per_host,
+      "hosts": len(self._hosts),
+      "cache": self.cache.stats() if self.cache is not None else None,
+    }
@@ -0,0 +1,332 @@
+# job_queue.py
+# Durable background jobs for the deepfake service
+# - SQLite-backed queue: jobs survive restarts
+# - A fixed pool of worker threads claims jobs oldest-first under a lease
+#   (owner + heartbeat); only jobs whose lease expired are re-queued, so
+#   several service processes can share one queue without running a job twice
+# - Progress, cancellation and results are stored on the job row
+# - Finished jobs (and their media files) expire after a TTL
+# - The database is only opened by open() (the service calls it at startup)
+# -------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+TERMINAL = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+  pass
+
+
+class JobLeaseLost(Exception):
+  """The job's lease expired and it was re-queued; the new owner finishes it."""
+
+
+@dataclass
+class Job:
+  id: str
+  kind: str
+  status: str                    # queued | running | done | failed | cancelled
+  params: Dict[str, Any]
+  media_path: Optional[str]
+  progress: float
+  message: Optional[str]
+  error: Optional[str]
+  attempts: int
+  created: float
+  started: Optional[float]
+  finished: Optional[float]
+  result: Optional[Dict[str, Any]] = None
+
+
+_COLS = "id, kind, status, params, media_path, progress, message, error, attempts, created, started, finished"
+
+
+def _row_to_job(row: Any, result: Optional[str] = None) -> Job:
+  (id_, kind, status, params, media_path, progress, message, error, attempts, created, started, finished) = row
+  return Job(
+    id=id_, kind=kind, status=status, params=json.loads(params), media_path=media_path,
+    progress=progress, message=message, error=error, attempts=attempts,
+    created=created, started=started, finished=finished,
+    result=json.loads(result) if result else None,
+  )
+
+
+class JobQueue:
+  def __init__(self, path: str, result_ttl: float = 24 * 3600, max_attempts: int = 2, lease_sec: float = 30.0):
+    self.path = path
+    self.result_ttl = result_ttl
+    self.max_attempts = max(1, max_attempts)
+    self.lease_sec = max(1.0, lease_sec)
+    self.owner = ""  # set by open(), in the process that will run the workers
+    self._lock = threading.Lock()
+    self.wakeup = threading.Event()
+    self._conn: Optional[sqlite3.Connection] = None
+
+  def open(self) -> "JobQueue":
+    """Open (creating if needed) the job database; required before any other call."""
+    with self._lock:
+      if self._conn is None:
+        self._open()
+    return self
+
+  def _open(self) -> None:
+    self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA busy_timeout = 5000")
+    conn.execute(
+      """
+      CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL,
+        params TEXT NOT NULL,
+        media_path TEXT,
+        progress REAL NOT NULL DEFAULT 0,
+        message TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        cancel INTEGER NOT NULL DEFAULT 0,
+        result TEXT,
+        created REAL NOT NULL,
+        started REAL,
+        finished REAL,
+        owner TEXT,
+        heartbeat REAL
+      )
+      """
+    )
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(jobs)")}
+    for col, typ in (("owner", "TEXT"), ("heartbeat", "REAL")):
+      if col not in cols:
+        conn.execute(f"ALTER TABLE jobs ADD COLUMN {col} {typ}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created)")
+    self._conn = conn
+
+  # ---------------- producer side ----------------
+  def submit(self, kind: str, params: Dict[str, Any], media_path: Optional[str] = None) -> str:
+    job_id = uuid.uuid4().hex
+    with self._lock:
+      self._conn.execute(
+        "INSERT INTO jobs (id, kind, status, params, media_path, created) VALUES (?, ?, 'queued', ?, ?, ?)",
+        (job_id, kind, json.dumps(params), media_path, time.time()),
+      )
+    self.wakeup.set()
+    return job_id
+
+  def get(self, job_id: str, with_result: bool = False) -> Optional[Job]:
+    with self._lock:
+      row = self._conn.execute(
+        f"SELECT {_COLS}{', result' if with_result else ''} FROM jobs WHERE id = ?", (job_id,)
+      ).fetchone()
+    if row is None:
+      return None
+    return _row_to_job(row[:12], row[12] if with_result else None)
+
+  def cancel(self, job_id: str) -> Optional[str]:
+    """Queued jobs are cancelled at once; running ones at their next progress report."""
+    with self._lock:
+      self._conn.execute(
+        "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'", (time.time(), job_id)
+      )
+      self._conn.execute("UPDATE jobs SET cancel = 1 WHERE id = ? AND status = 'running'", (job_id,))
+      row = self._conn.execute("SELECT status, media_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+      return None
+    if row[0] == "cancelled":
+      _unlink(row[1])
+    return row[0]
+
+  def counts(self) -> Dict[str, int]:
+    with self._lock:
+      rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+    return {status: n for status, n in rows}
+
+  def queued(self) -> int:
+    with self._lock:
+      return int(self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0])
+
+  # ---------------- worker side ----------------
+  def _requeue_expired(self, now: float) -> None:
+    # The owner stopped heartbeating (crashed, killed, restarted): retry, unless it used its attempts
+    expired = "status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)"
+    cutoff = now - self.lease_sec
+    self._conn.execute(
+      f"UPDATE jobs SET status = 'failed', error = 'interrupted', finished = ?, owner = NULL "
+      f"WHERE {expired} AND attempts >= ?",
+      (now, cutoff, self.max_attempts),
+    )
+    self._conn.execute(
+      f"UPDATE jobs SET status = 'queued', progress = 0, message = 'requeued after lease expiry', owner = NULL "
+      f"WHERE {expired}",
+      (cutoff,),
+    )
+
+  def claim(self) -> Optional[Job]:
+    with self._lock:
+      self._conn.execute("BEGIN IMMEDIATE")
+      try:
+        now = time.time()
+        self._requeue_expired(now)
+        row = self._conn.execute(
+          f"SELECT {_COLS} FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+        ).fetchone()
+        if row is None:
+          self._conn.execute("COMMIT")
+          return None
+        self._conn.execute(
+          "UPDATE jobs SET status = 'running', started = ?, attempts = attempts + 1, owner = ?, heartbeat = ? "
+          "WHERE id = ?",
+          (now, self.owner, now, row[0]),
+        )
+        self._conn.execute("COMMIT")
+      except BaseException:
+        self._conn.execute("ROLLBACK")
+        raise
+    job = _row_to_job(row)
+    job.status, job.started, job.attempts = "running", now, job.attempts + 1
+    return job
+
+  def heartbeat(self) -> None:
+    """Extend the lease on every job this queue instance is running."""
+    with self._lock:
+      self._conn.execute(
+        "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = 'running'", (time.time(), self.owner)
+      )
+
+  def report(self, job_id: str, progress: float, message: Optional[str] = None) -> None:
+    """
+    Record progress. Raises JobCancelled if the job was cancelled meanwhile,
+    JobLeaseLost if it was re-queued for another owner.
+    """
+    with self._lock:
+      cur = self._conn.execute(
+        "UPDATE jobs SET progress = ?, message = COALESCE(?, message), heartbeat = ? "
+        "WHERE id = ? AND owner = ? AND status = 'running'",
+        (max(0.0, min(1.0, progress)), message, time.time(), job_id, self.owner),
+      )
+      row = self._conn.execute("SELECT cancel FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if cur.rowcount == 0:
+      raise JobLeaseLost()
+    if row is not None and row[0]:
+      raise JobCancelled()
+
+  def finish(self, job: Job, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> bool:
+    """Record the outcome; False (media left for the new owner) if the lease was lost."""
+    with self._lock:
+      cur = self._conn.execute(
+        "UPDATE jobs SET status = ?, result = ?, error = ?, progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END, "
+        "finished = ?, owner = NULL WHERE id = ? AND owner = ? AND status = 'running'",
+        (status, json.dumps(result) if result is not None else None, error, status, time.time(), job.id, self.owner),
+      )
+    if cur.rowcount == 0:
+      return False
+    _unlink(job.media_path)
+    return True
+
+  def purge(self) -> int:
+    """Drop finished jobs past the TTL (and any media they still reference)."""
+    cutoff = time.time() - self.result_ttl
+    with self._lock:
+      rows = self._conn.execute(
+        "SELECT id, media_path FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND finished < ?", (cutoff,)
+      ).fetchall()
+      self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(r[0],) for r in rows])
+    for _id, media in rows:
+      _unlink(media)
+    return len(rows)
+
+
+def _unlink(path: Optional[str]) -> None:
+  if path:
+    try:
+      os.unlink(path)
+    except OSError:
+      pass
+
+
+Handler = Callable[[Job, Callable[[float, Optional[str]], None]], Dict[str, Any]]
+
+
+class JobWorkers:
+  """Fixed pool of threads that claim and run jobs from a JobQueue."""
+
+  def __init__(self, queue: JobQueue, handlers: Dict[str, Handler], workers: int = 2, purge_every: float = 60.0):
+    self.queue = queue
+    self.handlers = handlers
+    self.workers_n = max(1, workers)
+    self.purge_every = purge_every
+    self._threads: List[threading.Thread] = []
+    self._stop = threading.Event()
+    self._last_purge = 0.0
+
+  def start(self) -> None:
+    if self._threads:
+      return
+    self._stop.clear()
+    self._threads = [
+      threading.Thread(target=self._loop, name=f"job-{i}", daemon=True) for i in range(self.workers_n)
+    ]
+    # Progress reports are too irregular (downloads, slow decodes) to hold the lease on their own
+    self._threads.append(threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True))
+    for t in self._threads:
+      t.start()
+
+  def _heartbeat_loop(self) -> None:
+    while not self._stop.wait(self.queue.lease_sec / 3):
+      try:
+        self.queue.heartbeat()
+      except sqlite3.Error:
+        pass  # busy: the next beat is well inside the lease
+
+  def stop(self, timeout: float = 5.0) -> None:
+    self._stop.set()
+    self.queue.wakeup.set()
+    for t in self._threads:
+      t.join(timeout=timeout)
+    self._threads = []
+
+  def _loop(self) -> None:
+    while not self._stop.is_set():
+      now = time.monotonic()
+      if now - self._last_purge > self.purge_every:
+        self._last_purge = now
+        self.queue.purge()
+      job = self.queue.claim()
+      if job is None:
+        self.queue.wakeup.wait(timeout=1.0)
+        self.queue.wakeup.clear()
+        continue
+      self._run(job)
+
+  def _run(self, job: Job) -> None:
+    handler = self.handlers.get(job.kind)
+    if handler is None:
+      self.queue.finish(job, "failed", error=f"unknown job kind: {job.kind}")
+      return
+
+    def report(progress: float, message: Optional[str] = None) -> None:
+      self.queue.report(job.id, progress, message)
+
+    try:
+      result = handler(job, report)
+    except JobLeaseLost:
+      return
+    except JobCancelled:
+      self.queue.finish(job, "cancelled")
+    except Exception as e:
+      self.queue.finish(job, "failed", error=getattr(e, "detail", None) or f"{e.__class__.__name__}: {e}")
+    else:
+      self.queue.finish(job, "done", result=result)
@@ -0,0 +1,270 @@
+# ocr_pool.py
+# Warm OCR worker pool for the deepfake service
+# - N worker threads, each owning its own easyocr readers (no shared reader)
+# - Readers are created per language set on demand, LRU-evicted per worker
+# - Small images queued with the same languages are detected as one batch
+# - Detector (CRAFT) and recognizer time are measured separately
+# -------------------------------------------------------------
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LangKey = Tuple[str, ...]
+
+
+class OCRQueueFull(RuntimeError):
+  pass
+
+
+def normalize_langs(langs: Sequence[str]) -> LangKey:
+  """Lower-case, de-duplicate (order kept: easyocr weights the first language)."""
+  out: List[str] = []
+  for lang in langs:
+    lang = lang.strip().lower()
+    if lang and lang not in out:
+      out.append(lang)
+  return tuple(out) or ("en",)
+
+
+def _easyocr_reader(langs: LangKey, gpu: bool) -> Any:
+  import easyocr  # type: ignore
+  return easyocr.Reader(list(langs), gpu=gpu, verbose=False)
+
+
+@dataclass
+class OCRResult:
+  lines: List[Any]               # easyocr (bbox, text, prob) triples
+  detect_ms: float
+  recognize_ms: float
+  queue_ms: float
+  batch_size: int
+  worker: int
+
+
+@dataclass
+class _Job:
+  image: np.ndarray              # RGB uint8, HxWx3
+  langs: LangKey
+  future: Future
+  submitted: float = field(default_factory=time.perf_counter)
+
+  @property
+  def pixels(self) -> int:
+    return int(self.image.shape[0] * self.image.shape[1])
+
+
+class _Worker(threading.Thread):
+  def __init__(self, pool: "OCRPool", idx: int):
+    super().__init__(name=f"ocr-{idx}", daemon=True)
+    self.pool = pool
+    self.idx = idx
+    self.readers: "OrderedDict[LangKey, Any]" = OrderedDict()
+    self.jobs_done = 0
+    self.batches = 0
+
+  # ---------------- readers ----------------
+  def reader(self, langs: LangKey) -> Any:
+    r = self.readers.get(langs)
+    if r is not None:
+      self.readers.move_to_end(langs)
+      return r
+    r = self.pool.reader_factory(langs, self.pool.gpu)
+    # One tiny pass allocates the model buffers so the first real request is not the slow one
+    blank = np.full((32, 96, 3), 255, dtype=np.uint8)
+    r.readtext(blank)
+    self.readers[langs] = r
+    while len(self.readers) > self.pool.max_readers:
+      self.readers.popitem(last=False)
+    return r
+
+  # ---------------- main loop ----------------
+  def run(self) -> None:
+    try:
+      for langs in self.pool.warm_langs:
+        self.reader(langs)
+    except Exception as e:  # a failed warm-up must not kill the worker
+      self.pool._warm_error = repr(e)
+    self.pool._ready.release()
+
+    while True:
+      batch = self.pool._take()
+      if batch is None:
+        return
+      try:
+        self._run_batch(batch)
+      except Exception as e:
+        for job in batch:
+          if not job.future.done():
+            job.future.set_exception(e)
+
+  def _run_batch(self, batch: List[_Job]) -> None:
+    started = time.perf_counter()
+    reader = self.reader(batch[0].langs)
+    images = [j.image for j in batch]
+    if len(images) == 1:
+      stacked = images[0][None, ...]
+    else:
+      # Pad bottom/right with white to a common canvas; box coordinates stay valid
+      h = max(im.shape[0] for im in images)
+      w = max(im.shape[1] for im in images)
+      stacked = np.full((len(images), h, w, 3), 255, dtype=np.uint8)
+      for i, im in enumerate(images):
+        stacked[i, : im.shape[0], : im.shape[1]] = im
+
+    t0 = time.perf_counter()
+    horizontal, free = reader.detect(stacked, reformat=False)
+    detect_ms = (time.perf_counter() - t0) * 1000.0 / len(batch)
+
+    for i, job in enumerate(batch):
+      grey = _to_grey(job.image)
+      t1 = time.perf_counter()
+      lines = reader.recognize(grey, horizontal[i], free[i], reformat=False)
+      recognize_ms = (time.perf_counter() - t1) * 1000.0
+      self.jobs_done += 1
+      job.future.set_result(OCRResult(
+        lines=lines,
+        detect_ms=round(detect_ms, 2),
+        recognize_ms=round(recognize_ms, 2),
+        queue_ms=round((started - job.submitted) * 1000.0, 2),
+        batch_size=len(batch),
+        worker=self.idx,
+      ))
+    self.batches += 1
+
+
+def _to_grey(rgb: np.ndarray) -> np.ndarray:
+  # ITU-R 601 luma, same weights as cv2.COLOR_RGB2GRAY
+  return (rgb[..., 0] * 0.299 + rgb[..., 1] * 0.587 + rgb[..., 2] * 0.114).astype(np.uint8)
+
+
+class OCRPool:
+  def __init__(
+    self,
+    workers: int = 1,
+    warm_langs: Sequence[LangKey] = (("en",),),
+    max_readers: int = 2,
+    batch_size: int = 8,
+    batch_max_pixels: int = 1_000_000,
+    max_queue: int = 64,
+    threads: int = 0,
+    gpu: bool = True,
+    reader_factory: Callable[[LangKey, bool], Any] = _easyocr_reader,
+  ):
+    self.workers_n = max(1, workers)
+    self.warm_langs = [normalize_langs(l) for l in warm_langs]
+    self.max_readers = max(1, max_readers)
+    self.batch_size = max(1, batch_size)
+    self.batch_max_pixels = batch_max_pixels
+    self.max_queue = max(1, max_queue)
+    self.threads = threads
+    self.gpu = gpu
+    self.reader_factory = reader_factory
+    self._queue: Deque[_Job] = deque()
+    self._cond = threading.Condition()
+    self._ready = threading.Semaphore(0)
+    self._workers: List[_Worker] = []
+    self._closed = False
+    self._warm_error: Optional[str] = None
+
+  # ---------------- lifecycle ----------------
+  def start(self, wait: bool = False) -> None:
+    with self._cond:
+      if self._workers:
+        return
+      self._closed = False
+      self._limit_threads()
+      self._workers = [_Worker(self, i) for i in range(self.workers_n)]
+    for w in self._workers:
+      w.start()
+    if wait:
+      for _ in self._workers:
+        self._ready.acquire()
+
+  def _limit_threads(self) -> None:
+    # torch's intra-op pool is process wide: size it so workers do not oversubscribe the CPU
+    if self.threads <= 0:
+      return
+    try:
+      import torch  # type: ignore
+      torch.set_num_threads(self.threads)
+    except Exception:
+      pass
+    try:
+      import cv2  # type: ignore
+      cv2.setNumThreads(self.threads)
+    except Exception:
+      pass
+
+  def close(self) -> None:
+    with self._cond:
+      self._closed = True
+      pending = list(self._queue)
+      self._queue.clear()
+      self._cond.notify_all()
+    for job in pending:
+      job.future.cancel()
+    for w in self._workers:
+      w.join(timeout=5)
+    self._workers = []
+
+  # ---------------- queue ----------------
+  def submit(self, image: np.ndarray, langs: Sequence[str] = ("en",)) -> "Future[OCRResult]":
+    if not self._workers:
+      self.start()
+    job = _Job(image=image, langs=normalize_langs(langs), future=Future())
+    with self._cond:
+      if len(self._queue) >= self.max_queue:
+        raise OCRQueueFull("OCR queue is full")
+      self._queue.append(job)
+      self._cond.notify()
+    return job.future
+
+  def _small(self, job: _Job) -> bool:
+    return job.pixels <= self.batch_max_pixels
+
+  def _take(self) -> Optional[List[_Job]]:
+    """Pop the oldest job plus any queued small jobs with the same languages."""
+    with self._cond:
+      while not self._queue and not self._closed:
+        self._cond.wait()
+      if self._closed:
+        return None
+      first = self._queue.popleft()
+      batch = [first]
+      if self._small(first) and self.batch_size > 1:
+        keep: Deque[_Job] = deque()
+        while self._queue:
+          job = self._queue.popleft()
+          if len(batch) < self.batch_size and job.langs == first.langs and self._small(job):
+            batch.append(job)
+          else:
+            keep.append(job)
+        self._queue = keep
+      return batch
+
+  def stats(self) -> Dict[str, Any]:
+    with self._cond:
+      depth = len(self._queue)
+    return {
+      "workers": self.workers_n,
+      "started": bool(self._workers),
+      "queue_depth": depth,
+      "max_queue": self.max_queue,
+      "batch_size": self.batch_size,
+      "batch_max_pixels": self.batch_max_pixels,
+      "max_readers": self.max_readers,
+      "warm_langs": ["+".join(l) for l in self.warm_langs],
+      "warm_error": self._warm_error,
+      "per_worker": [
+        {"jobs": w.jobs_done, "batches": w.batches, "readers": ["+".join(k) for k in list(w.readers)]}
+        for w in self._workers
+      ],
+    }
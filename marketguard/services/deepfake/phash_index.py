@@ -0,0 +1,314 @@
+# phash_index.py
+# Perceptual hashes + Hamming-distance index of known media
+# - dHash / pHash (64-bit) computed from grayscale rasters
+# - Multi-index hashing: the 64-bit hash is split into 4 x 16-bit substrings,
+#   each kept as a sorted uint16 array. By pigeonhole, any hash within
+#   distance r shares at least one substring within r // 4, so a query is a
+#   handful of searchsorted calls plus an exact popcount on the candidates.
+# - ~33 bytes per entry, so tens of millions of hashes fit in RAM
+# - Incremental inserts land in a small linear-scan buffer; a full buffer (or
+#   an add_many chunk) is sorted on its own and merged into the existing
+#   tables in one linear pass, so a bulk import never re-sorts what it has
+# - Only save() writes to disk. Single adds stay in memory until the caller
+#   saves (the deepfake service does so at shutdown and after a bulk import)
+#
+# CLI (offline bulk import):
+#   python phash_index.py known.csv --out phash_index.npz
+#   (CSV rows: hash_hex,label[,ref]  with label in {clean,synthetic})
+# -------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+TABLES = 4
+SUB_BITS = HASH_BITS // TABLES
+SUB_MASK = (1 << SUB_BITS) - 1
+
+LABELS: Tuple[str, ...] = ("clean", "synthetic")
+LABEL_IDS: Dict[str, int] = {name: i for i, name in enumerate(LABELS)}
+
+# -------------------------------------------------------------
+# Hashing
+# -------------------------------------------------------------
+def _dct_matrix(n: int) -> np.ndarray:
+  k = np.arange(n)[:, None]
+  i = np.arange(n)[None, :]
+  m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+  m[0, :] /= np.sqrt(2.0)
+  return m
+
+_DCT32 = _dct_matrix(32)
+
+def _bits_to_int(bits: np.ndarray) -> int:
+  return int(np.packbits(bits.astype(np.uint8)).view(">u8")[0])
+
+def _shrink(gray: np.ndarray, w: int, h: int) -> np.ndarray:
+  return np.asarray(Image.fromarray(gray).resize((w, h), Image.BOX), dtype=np.float64)
+
+def phash_gray(gray: np.ndarray) -> int:
+  """DCT hash of a 2-D uint8 raster: sign of the 8x8 low frequencies vs their median."""
+  low = (_DCT32 @ _shrink(gray, 32, 32) @ _DCT32.T)[:8, :8].flatten()
+  return _bits_to_int(low > np.median(low[1:]))
+
+def dhash_gray(gray: np.ndarray) -> int:
+  """Gradient hash of a 2-D uint8 raster: left/right brightness order on a 9x8 grid."""
+  px = _shrink(gray, 9, 8)
+  return _bits_to_int(px[:, 1:] > px[:, :-1])
+
+HASHERS = {"phash": phash_gray, "dhash": dhash_gray}
+
+def hash_hex(h: int) -> str:
+  return f"{h:016x}"
+
+def parse_hash(s: str) -> int:
+  h = int(s.strip().lower().removeprefix("0x"), 16)
+  if h >> HASH_BITS:
+    raise ValueError("hash wider than 64 bits")
+  return h
+
+# -------------------------------------------------------------
+# Bit helpers
+# -------------------------------------------------------------
+_POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def popcount64(a: np.ndarray) -> np.ndarray:
+  if hasattr(np, "bitwise_count"):
+    return np.bitwise_count(a)
+  return _POP8[a.view(np.uint8)].reshape(a.shape + (8,)).sum(axis=-1)
+
+def _substring(hashes: np.ndarray, t: int) -> np.ndarray:
+  return ((hashes >> np.uint64(t * SUB_BITS)) & np.uint64(SUB_MASK)).astype(np.uint16)
+
+_MASKS: Dict[int, np.ndarray] = {}
+
+def _sub_masks(radius: int) -> np.ndarray:
+  """All SUB_BITS-wide XOR masks with popcount <= radius."""
+  m = _MASKS.get(radius)
+  if m is None:
+    allv = np.arange(1 << SUB_BITS, dtype=np.uint64)
+    m = allv[popcount64(allv) <= radius].astype(np.uint16)
+    _MASKS[radius] = m
+  return m
+
+# -------------------------------------------------------------
+# Index
+# -------------------------------------------------------------
+@dataclass
+class KnownMatch:
+  label: str
+  distance: int
+  hash: str
+  ref: Optional[str] = None
+
+class HammingIndex:
+  def __init__(self, algo: str = "phash", buffer_size: int = 4096):
+    if algo not in HASHERS:
+      raise ValueError(f"unknown hash algorithm: {algo}")
+    self.algo = algo
+    self._lock = threading.RLock()
+    self._hashes = np.empty(0, dtype=np.uint64)
+    self._labels = np.empty(0, dtype=np.uint8)
+    self._refs: Dict[int, str] = {}  # sparse: only entries that carry a ref
+    self._keys = [np.empty(0, dtype=np.uint16) for _ in range(TABLES)]
+    self._order = [np.empty(0, dtype=np.uint32) for _ in range(TABLES)]
+    self._buf_h = np.empty(max(1, buffer_size), dtype=np.uint64)
+    self._buf_l = np.empty(max(1, buffer_size), dtype=np.uint8)
+    self._buf_refs: Dict[int, str] = {}
+    self._buf_n = 0
+
+  def __len__(self) -> int:
+    return int(self._hashes.size) + self._buf_n
+
+  # ---------------- writes ----------------
+  def add(self, h: int, label: str, ref: Optional[str] = None) -> None:
+    lid = LABEL_IDS[label]
+    with self._lock:
+      if self._buf_n == self._buf_h.size:
+        self._flush()
+      self._buf_h[self._buf_n] = h
+      self._buf_l[self._buf_n] = lid
+      if ref:
+        self._buf_refs[self._buf_n] = ref
+      self._buf_n += 1
+
+  def add_many(
+    self,
+    hashes: Sequence[int],
+    labels: Sequence[str],
+    refs: Optional[Sequence[Optional[str]]] = None,
+  ) -> int:
+    h = np.asarray(hashes, dtype=np.uint64)
+    lids = np.fromiter((LABEL_IDS[x] for x in labels), dtype=np.uint8, count=len(labels))
+    if h.size != lids.size:
+      raise ValueError("hashes and labels differ in length")
+    with self._lock:
+      self._flush()
+      base = self._hashes.size
+      if refs:
+        self._refs.update({base + i: r for i, r in enumerate(refs) if r})
+      self._append(h, lids)
+    return int(h.size)
+
+  def _flush(self) -> None:
+    n = self._buf_n
+    if n == 0:
+      return
+    base = self._hashes.size
+    self._refs.update({base + i: r for i, r in self._buf_refs.items()})
+    self._append(self._buf_h[:n].copy(), self._buf_l[:n].copy())
+    self._buf_refs = {}
+    self._buf_n = 0
+
+  def _append(self, h: np.ndarray, lids: np.ndarray) -> None:
+    """Add entries at the end and merge their sorted substrings into the tables."""
+    ids = np.arange(self._hashes.size, self._hashes.size + h.size, dtype=np.uint32)
+    self._hashes = np.concatenate([self._hashes, h])
+    self._labels = np.concatenate([self._labels, lids])
+    for t in range(TABLES):
+      sub = _substring(h, t)
+      order = np.argsort(sub, kind="stable")  # radix sort for uint16
+      new_keys = sub[order]
+      # side="right" puts new ids after equal old ones, as a stable sort of everything would
+      at = np.searchsorted(self._keys[t], new_keys, side="right")
+      self._keys[t] = np.insert(self._keys[t], at, new_keys)
+      self._order[t] = np.insert(self._order[t], at, ids[order])
+
+  def _rebuild(self) -> None:
+    for t in range(TABLES):
+      sub = _substring(self._hashes, t)
+      order = np.argsort(sub, kind="stable").astype(np.uint32)
+      self._keys[t] = sub[order]
+      self._order[t] = order
+
+  # ---------------- reads ----------------
+  def query(self, h: int, max_distance: int) -> List[Tuple[int, int, str, Optional[str]]]:
+    """Return (distance, id, label, ref) for every entry within max_distance, nearest first."""
+    hq = np.uint64(h)
+    out: List[Tuple[int, int, str, Optional[str]]] = []
+    with self._lock:
+      if self._hashes.size:
+        masks = _sub_masks(max_distance // TABLES)
+        parts = []
+        for t in range(TABLES):
+          variants = np.uint16((h >> (t * SUB_BITS)) & SUB_MASK) ^ masks
+          keys = self._keys[t]
+          lo = np.searchsorted(keys, variants, side="left")
+          hi = np.searchsorted(keys, variants, side="right")
+          for a, b in zip(lo[hi > lo], hi[hi > lo]):
+            parts.append(self._order[t][a:b])
+        if parts:
+          ids = np.unique(np.concatenate(parts))
+          dist = popcount64(self._hashes[ids] ^ hq)
+          keep = dist <= max_distance
+          for i, d in zip(ids[keep].tolist(), dist[keep].tolist()):
+            out.append((int(d), i, LABELS[self._labels[i]], self._refs.get(i)))
+      if self._buf_n:
+        dist = popcount64(self._buf_h[:self._buf_n] ^ hq)
+        for j in np.nonzero(dist <= max_distance)[0].tolist():
+          out.append((int(dist[j]), self._hashes.size + j, LABELS[self._buf_l[j]], self._buf_refs.get(j)))
+    out.sort(key=lambda x: (x[0], -LABEL_IDS[x[2]]))  # on ties prefer "synthetic"
+    return out
+
+  def best(self, h: int, max_distance: int) -> Optional[KnownMatch]:
+    hits = self.query(h, max_distance)
+    if not hits:
+      return None
+    d, _id, label, ref = hits[0]
+    return KnownMatch(label=label, distance=d, hash=hash_hex(h), ref=ref)
+
+  # ---------------- persistence ----------------
+  def save(self, path: str) -> None:
+    with self._lock:
+      self._flush()
+      ref_ids = np.fromiter(self._refs.keys(), dtype=np.int64, count=len(self._refs))
+      ref_vals = np.array(list(self._refs.values()), dtype=object)
+      tmp = f"{path}.tmp.npz"
+      np.savez(
+        tmp,
+        algo=np.array(self.algo),
+        hashes=self._hashes,
+        labels=self._labels,
+        ref_ids=ref_ids,
+        ref_vals=ref_vals.astype(str) if ref_vals.size else np.empty(0, dtype=str),
+      )
+      os.replace(tmp, path)
+
+  @classmethod
+  def load(cls, path: str, algo: str = "phash") -> "HammingIndex":
+    idx = cls(algo=algo)
+    with np.load(path, allow_pickle=False) as z:
+      if str(z["algo"]) != algo:
+        raise ValueError(f"index at {path} was built with {z['algo']}, expected {algo}")
+      idx._hashes = z["hashes"].astype(np.uint64)
+      idx._labels = z["labels"].astype(np.uint8)
+      idx._refs = dict(zip(z["ref_ids"].tolist(), z["ref_vals"].tolist()))
+    idx._rebuild()
+    return idx
+
+  def stats(self) -> Dict[str, object]:
+    with self._lock:
+      counts = np.bincount(self._labels, minlength=len(LABELS))
+      counts[:] += np.bincount(self._buf_l[:self._buf_n], minlength=len(LABELS))
+      return {
+        "algo": self.algo,
+        "entries": len(self),
+        "pending": self._buf_n,
+        "by_label": {name: int(counts[i]) for i, name in enumerate(LABELS)},
+        "approx_bytes": int(self._hashes.size * (8 + 1 + TABLES * 6)),
+      }
+
+# -------------------------------------------------------------
+# Bulk import helpers
+# -------------------------------------------------------------
+def iter_hash_rows(lines: Iterable[str]) -> Iterable[Tuple[int, str, Optional[str]]]:
+  """Parse `hash_hex,label[,ref]` rows; blank lines, '#' comments and a header row are skipped."""
+  for row in csv.reader(lines):
+    if not row or row[0].lstrip().startswith("#") or row[0].strip().lower() in ("hash", "phash", "dhash"):
+      continue
+    label = row[1].strip().lower() if len(row) > 1 else ""
+    if label not in LABEL_IDS:
+      raise ValueError(f"bad label {label!r} for hash {row[0]!r}")
+    ref = row[2].strip() if len(row) > 2 and row[2].strip() else None
+    yield parse_hash(row[0]), label, ref
+
+def bulk_import(index: HammingIndex, rows: Iterable[Tuple[int, str, Optional[str]]], chunk: int = 200_000) -> int:
+  total = 0
+  hs: List[int] = []; ls: List[str] = []; rs: List[Optional[str]] = []
+  for h, label, ref in rows:
+    hs.append(h); ls.append(label); rs.append(ref)
+    if len(hs) >= chunk:
+      total += index.add_many(hs, ls, rs)
+      hs, ls, rs = [], [], []
+  if hs:
+    total += index.add_many(hs, ls, rs)
+  return total
+
+def main():
+  parser = argparse.ArgumentParser(description="Build a perceptual-hash index of known media.")
+  parser.add_argument("csv", help="Rows of hash_hex,label[,ref]")
+  parser.add_argument("--out", default="phash_index.npz", help="Output .npz (merged if it exists)")
+  parser.add_argument("--algo", default="phash", choices=sorted(HASHERS))
+  args = parser.parse_args()
+
+  index = HammingIndex.load(args.out, algo=args.algo) if os.path.exists(args.out) else HammingIndex(algo=args.algo)
+  t0 = time.time()
+  with open(args.csv, newline="") as fh:
+    n = bulk_import(index, iter_hash_rows(fh))
+  index.save(args.out)
+  dt = time.time() - t0
+  print(f"Imported {n} hashes in {dt:.1f}s ({n / dt if dt else 0:.0f}/s); index now {len(index)} entries")
+
+
+if __name__ == "__main__":
+  main()
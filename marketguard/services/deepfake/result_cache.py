@@ -0,0 +1,184 @@
+# result_cache.py
+# Content-addressed result cache for the deepfake service
+# - Keys are derived from the SHA-256 of the media (+ analysis params)
+# - Tier 1: in-process LRU (item-count bound, TTL)
+# - Tier 2: SQLite file (byte-size bound with LRU eviction, TTL)
+# - Entries written by another detector version are never served
+# - Nothing touches the filesystem until open() (the service calls it at startup)
+# -------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class ResultCache:
+  def __init__(
+    self,
+    version: str,
+    path: Optional[str] = None,
+    mem_items: int = 2048,
+    disk_bytes: int = 256 * 1024 * 1024,
+    ttl_sec: float = 7 * 24 * 3600,
+  ):
+    self.version = version
+    self.path = path or None
+    self.mem_items = max(0, mem_items)
+    self.disk_bytes = max(0, disk_bytes)
+    self.ttl_sec = ttl_sec
+    self._mem: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+    self._lock = threading.Lock()
+    self._conn: Optional[sqlite3.Connection] = None
+    self._disk_used = 0
+    self.hits_mem = 0
+    self.hits_disk = 0
+    self.misses = 0
+
+  def open(self) -> "ResultCache":
+    """Open (creating if needed) the disk tier; until then the cache is memory-only."""
+    with self._lock:
+      if self.path and self._conn is None:
+        self._open_disk()
+    return self
+
+  # ---------------- disk tier ----------------
+  def _open_disk(self) -> None:
+    conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA busy_timeout = 5000")
+    conn.execute(
+      """
+      CREATE TABLE IF NOT EXISTS results (
+        key TEXT PRIMARY KEY,
+        version TEXT NOT NULL,
+        value TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created REAL NOT NULL,
+        accessed REAL NOT NULL
+      )
+      """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed)")
+    # Detector upgrades invalidate everything scored by the old version
+    conn.execute("DELETE FROM results WHERE version != ?", (self.version,))
+    conn.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl_sec,))
+    self._disk_used = int(conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0])
+    self._conn = conn
+
+  def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+    row = self._conn.execute(  # type: ignore[union-attr]
+      "SELECT value, size, created, version FROM results WHERE key = ?", (key,)
+    ).fetchone()
+    if row is None:
+      return None
+    value, size, created, version = row
+    if version != self.version or now - created > self.ttl_sec:
+      self._conn.execute("DELETE FROM results WHERE key = ?", (key,))  # type: ignore[union-attr]
+      self._disk_used -= size
+      return None
+    self._conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))  # type: ignore[union-attr]
+    return created, json.loads(value)
+
+  def _disk_put(self, key: str, value: Dict[str, Any], now: float) -> None:
+    blob = json.dumps(value, separators=(",", ":"))
+    size = len(blob)
+    if size > self.disk_bytes:
+      return
+    conn = self._conn
+    old = conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()  # type: ignore[union-attr]
+    conn.execute(  # type: ignore[union-attr]
+      "INSERT OR REPLACE INTO results (key, version, value, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+      (key, self.version, blob, size, now, now),
+    )
+    self._disk_used += size - (old[0] if old else 0)
+    if self._disk_used > self.disk_bytes:
+      self._evict_disk()
+
+  def _evict_disk(self) -> None:
+    # Drop least-recently-accessed rows until we are ~10% under budget
+    target = int(self.disk_bytes * 0.9)
+    cur = self._conn.execute("SELECT key, size FROM results ORDER BY accessed ASC")  # type: ignore[union-attr]
+    doomed = []
+    for key, size in cur:
+      if self._disk_used <= target:
+        break
+      doomed.append((key,))
+      self._disk_used -= size
+    cur.close()
+    self._conn.executemany("DELETE FROM results WHERE key = ?", doomed)  # type: ignore[union-attr]
+
+  # ---------------- public API ----------------
+  def get(self, key: str) -> Optional[Dict[str, Any]]:
+    now = time.time()
+    with self._lock:
+      hit = self._mem.get(key)
+      if hit is not None:
+        created, value = hit
+        if now - created <= self.ttl_sec:
+          self._mem.move_to_end(key)
+          self.hits_mem += 1
+          return value
+        del self._mem[key]
+      if self._conn is not None:
+        row = self._disk_get(key, now)
+        if row is not None:
+          created, value = row
+          self._mem_put(key, value, created)  # keep the original age so the TTL still holds
+          self.hits_disk += 1
+          return value
+      self.misses += 1
+      return None
+
+  def put(self, key: str, value: Dict[str, Any]) -> None:
+    now = time.time()
+    with self._lock:
+      self._mem_put(key, value, now)
+      if self._conn is not None:
+        self._disk_put(key, value, now)
+
+  def _mem_put(self, key: str, value: Dict[str, Any], created: float) -> None:
+    if self.mem_items == 0:
+      return
+    self._mem[key] = (created, value)
+    self._mem.move_to_end(key)
+    while len(self._mem) > self.mem_items:
+      self._mem.popitem(last=False)
+
+  def clear(self) -> None:
+    with self._lock:
+      self._mem.clear()
+      if self._conn is not None:
+        self._conn.execute("DELETE FROM results")
+        self._disk_used = 0
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      return {
+        "version": self.version,
+        "path": self.path,
+        "mem_items": len(self._mem),
+        "mem_limit": self.mem_items,
+        "disk_bytes": self._disk_used,
+        "disk_limit": self.disk_bytes,
+        "ttl_sec": self.ttl_sec,
+        "hits_mem": self.hits_mem,
+        "hits_disk": self.hits_disk,
+        "misses": self.misses,
+      }
+
+
+def cache_from_env(version: str) -> ResultCache:
+  return ResultCache(
+    version=version,
+    path=os.environ.get("RESULT_CACHE_PATH", "./result_cache.sqlite"),
+    mem_items=int(os.environ.get("RESULT_CACHE_MEM_ITEMS", 2048)),
+    disk_bytes=int(os.environ.get("RESULT_CACHE_DISK_BYTES", 256 * 1024 * 1024)),
+    ttl_sec=float(os.environ.get("RESULT_CACHE_TTL", 7 * 24 * 3600)),
+  )
@@ -0,0 +1,797 @@
+# bench.py
+# Latency/throughput benchmark for the registry verify endpoint
+# - Builds synthetic registry DBs of increasing size (10k .. 10M users) with set-based
+#   SQL: the schema.py tables plus the risk summary table, cached in --workdir by size
+#   and seed (the Faker generator in scripts/sebi_dummy.py is far too slow at 10M)
+# - Replays a seeded mix of reg_no / PAN / UPI / exact-name / fuzzy-name queries, hits
+#   and misses, in-process (calling the verify route) and over HTTP against a local
+#   uvicorn per DB (or a running service with --http) with N concurrent clients
+# - The verify response cache is off unless --verify-cache, so every query does its lookup
+# - Reports latency (mean/p50/p99/max) and QPS per query type and outcome, plus DB file,
+#   page-cache residency and I/O counters, as JSON
+#
+# Usage:
+#   python bench.py --quick --out bench.json
+#   python bench.py --sizes 10000,1000000,10000000 --concurrency 16 --out bench.json
+#   python bench.py --snapshot --targets inproc --out bench_snap.json
+#   python bench.py --http http://localhost:8001 --db sebi_dummy.db --out bench_http.json
+#   python bench.py --quick --compare bench.json
+# ------------------------------------------------------------
+
+import argparse
+import ctypes
+import http.client
+import importlib
+import itertools
+import json
+import mmap
+import os
+import platform
+import random
+import resource
+import socket
+import sqlite3
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote, urlencode, urlsplit
+
+import risk_summary
+import schema
+import snapshot
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GEN_VERSION = 1  # bump when the generated data changes, so cached DBs are rebuilt
+KINDS = ("reg_no", "pan", "upi", "name", "fuzzy")
+DEFAULT_MIX = "reg_no=25,pan=20,upi=25,name=20,fuzzy=10"
+DEFAULT_SIZES = "10000,100000,1000000"
+QUICK_SIZES = "10000,100000"
+
+# One (kind, outcome, value) per query; outcome is "hit" or "miss" by construction
+Query = Tuple[str, str, str]
+
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Aditya", "Akash", "Amit", "Ananya", "Anil", "Anjali", "Arjun", "Bhavna",
+    "Chetan", "Deepa", "Deepak", "Divya", "Gaurav", "Geeta", "Harsh", "Isha", "Jaya", "Karan",
+    "Kavita", "Kiran", "Lakshmi", "Manish", "Meera", "Mohan", "Neha", "Nikhil", "Nisha", "Pooja",
+    "Prakash", "Priya", "Rahul", "Rajesh", "Ramesh", "Ravi", "Rekha", "Rohan", "Sanjay", "Sarita",
+    "Shreya", "Sneha", "Sunil", "Sunita", "Suresh", "Tanvi", "Tarun", "Uma", "Varun", "Vidya",
+    "Vijay", "Vikram", "Vinod", "Yash", "Zoya", "Farhan", "Imran", "Gurpreet", "Harpreet", "Simran",
+]
+LAST_NAMES = [
+    "Agarwal", "Ahmed", "Bajaj", "Banerjee", "Bhat", "Bose", "Chandra", "Chatterjee", "Chopra", "Das",
+    "Desai", "Dubey", "Dutta", "Gandhi", "Ghosh", "Gill", "Goel", "Gupta", "Iyer", "Jain",
+    "Joshi", "Kapoor", "Khan", "Kulkarni", "Kumar", "Mehta", "Menon", "Mishra", "Mukherjee", "Nair",
+    "Naidu", "Pandey", "Patel", "Pillai", "Prasad", "Rao", "Reddy", "Roy", "Saxena", "Sen",
+    "Shah", "Sharma", "Shetty", "Singh", "Sinha", "Srivastava", "Thakur", "Tiwari", "Trivedi", "Verma",
+    "Yadav", "Rajagopalan", "Krishnan", "Subramanian", "Venkatesh", "Mahajan", "Malhotra", "Arora", "Sethi", "Bhatia",
+    "Chauhan", "Rathore", "Shekhawat", "Naik", "Sawant", "Pawar", "Jadhav", "Kamath", "Hegde", "Shenoy",
+    "Fernandes", "DSouza", "Pereira", "Sequeira", "Lobo", "Kohli", "Dhillon", "Sandhu", "Grewal", "Bedi",
+]
+UPI_HANDLES = ["ybl", "oksbi", "axl", "paytm"]
+# 100 buckets -> (type, reg no prefix); same weights as scripts/sebi_dummy.py
+_TYPE_WEIGHTS = [("IA", "INA", 15), ("RA", "INH", 15), ("PMS", "INP", 15), ("BROKER", "INZ", 25), ("NONE", None, 30)]
+
+
+# -------------- Synthetic DBs --------------
+
+def _mix(expr: str, salt: int) -> str:
+    """Deterministic 32-bit scramble of an integer SQL expression (stays clear of float overflow)."""
+    return f"((((({expr}) + {salt}) * 2654435761) % 4294967296) * 40503 % 4294967296)"
+
+
+def _generate(conn: sqlite3.Connection, users: int, seed: int) -> None:
+    conn.execute("CREATE TEMP TABLE first_names (idx INTEGER PRIMARY KEY, name TEXT)")
+    conn.execute("CREATE TEMP TABLE last_names (idx INTEGER PRIMARY KEY, name TEXT)")
+    conn.execute("CREATE TEMP TABLE type_buckets (b INTEGER PRIMARY KEY, type TEXT, prefix TEXT)")
+    conn.executemany("INSERT INTO temp.first_names VALUES (?, ?)", enumerate(FIRST_NAMES))
+    conn.executemany("INSERT INTO temp.last_names VALUES (?, ?)", enumerate(LAST_NAMES))
+    buckets = [(typ, prefix) for typ, prefix, weight in _TYPE_WEIGHTS for _ in range(weight)]
+    conn.executemany("INSERT INTO temp.type_buckets VALUES (?, ?, ?)", [(b, *tp) for b, tp in enumerate(buckets)])
+
+    # p is a bijection of i on 32 bits (odd multiplier), so PANs are unique; reg nos use
+    # the same multiplier mod 10^8 (coprime), so they are unique below 10^8 users
+    conn.execute(f"""
+        WITH RECURSIVE seq(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM seq WHERE i < :n),
+        g AS (
+            SELECT i, {_mix("i", seed)} AS h1, {_mix("i", seed + 1)} AS h2, {_mix("i", seed + 2)} AS h3,
+                   (i * 2654435761) % 4294967296 AS p
+            FROM seq
+        )
+        INSERT INTO users (id, username, password_hash, full_name, email, phone, registration_date,
+                           last_login, account_status, malicious_activity_history, pan_id,
+                           intermediary_type, sebi_reg_no)
+        SELECT i, 'user' || i, '', f.name || ' ' || char(65 + h2 % 26) || '. ' || l.name,
+               'user' || i || '@example.com', printf('9%09d', h3 % 1000000000),
+               date('2024-01-01', '+' || (h1 % 700) || ' days'), NULL,
+               CASE WHEN h2 % 100 < 90 THEN 'active' WHEN h2 % 100 < 96 THEN 'suspended' ELSE 'closed' END,
+               h3 % 100 < 15,
+               char(65 + h2 % 26, 65 + (p / 10000) % 26, 65 + (p / 260000) % 26,
+                    65 + (p / 6760000) % 26, 65 + (p / 175760000) % 26)
+                   || printf('%04d', p % 10000) || char(65 + h1 % 26),
+               t.type,
+               CASE WHEN t.prefix IS NULL THEN NULL ELSE t.prefix || printf('%08d', (i * 2654435761) % 100000000) END
+        FROM g
+        JOIN temp.first_names f ON f.idx = h1 % {len(FIRST_NAMES)}
+        JOIN temp.last_names l ON l.idx = (h1 / 1000) % {len(LAST_NAMES)}
+        JOIN temp.type_buckets t ON t.b = (h3 / 100) % 100
+    """, {"n": users})
+
+    # ~80% of users get one UPI handle (surname + id keeps them unique)
+    h = _mix("id", seed + 3)
+    conn.execute(f"""
+        INSERT INTO upi_accounts (user_id, upi_id, bank_name, account_number, ifsc_code,
+                                  verification_status, created_date)
+        SELECT id, lower(substr(full_name, instr(full_name, '. ') + 2)) || id || '@'
+                   || CASE {h} % 4 WHEN 0 THEN 'ybl' WHEN 1 THEN 'oksbi' WHEN 2 THEN 'axl' ELSE 'paytm' END,
+               'State Bank of India', printf('%012d', {h}), 'SBIN0' || printf('%06d', {h} % 1000000),
+               CASE WHEN ({h} / 100) % 10 < 7 THEN 'verified' WHEN ({h} / 100) % 10 < 9 THEN 'pending' ELSE 'rejected' END,
+               registration_date
+        FROM users WHERE {h} % 100 < 80
+    """)
+
+    # 1-5 activities for the flagged ~15%, ~70% unresolved
+    h = _mix("u.id", seed + 4)
+    conn.execute(f"""
+        WITH RECURSIVE k(j) AS (SELECT 1 UNION ALL SELECT j + 1 FROM k WHERE j < 5)
+        INSERT INTO malicious_activities (user_id, activity_type, activity_date, severity, description, resolved)
+        SELECT u.id, 'Suspicious login attempt', '2025-06-01 10:00:00',
+               CASE WHEN ({h} + k.j) % 10 < 5 THEN 'low' WHEN ({h} + k.j) % 10 < 8 THEN 'medium' ELSE 'high' END,
+               NULL, ({h} / 10 + k.j) % 10 < 3
+        FROM users u JOIN k ON k.j <= 1 + {h} % 5
+        WHERE u.malicious_activity_history = 1
+    """)
+
+
+def build_db(path: str, users: int, seed: int) -> float:
+    """Generate a DB with `users` users at path (atomically); returns the build time."""
+    t0 = time.perf_counter()
+    tmp = f"{path}.build-{os.getpid()}"
+    for p in (tmp, tmp + "-journal"):
+        if os.path.exists(p):
+            os.remove(p)
+    conn = sqlite3.connect(tmp, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -262144")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("BEGIN")
+        schema.create_tables(conn)
+        _generate(conn, users, seed)
+        schema.create_indexes(conn)
+        conn.execute("COMMIT")
+        risk_summary.install(conn)
+        conn.execute("PRAGMA journal_mode = WAL")  # same mode the other writers leave
+    except BaseException:
+        conn.close()
+        os.remove(tmp)
+        raise
+    conn.close()
+    os.replace(tmp, path)
+    return time.perf_counter() - t0
+
+
+def ensure_db(workdir: str, users: int, seed: int, rebuild: bool, with_snapshot: bool) -> Dict[str, Any]:
+    path = os.path.join(workdir, f"registry_{users}_s{seed}_v{GEN_VERSION}.db")
+    info: Dict[str, Any] = {"users": users, "path": path, "build_s": None, "snapshot_build_s": None}
+    if rebuild or not os.path.exists(path):
+        print(f"[bench] building {users} users -> {path}", file=sys.stderr)
+        for p in (path + "-wal", path + "-shm", path + ".snap"):
+            if os.path.exists(p):
+                os.remove(p)
+        info["build_s"] = round(build_db(path, users, seed), 3)
+    if with_snapshot:
+        snap = snapshot.Snapshot(path + ".snap", path)
+        if not snap.usable(0):
+            print(f"[bench] building snapshot for {path} ({snap.state})", file=sys.stderr)
+            info["snapshot_build_s"] = snapshot.build(path, path + ".snap")["build_s"]
+    return info
+
+
+# -------------- Workload --------------
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise ValueError(f"unknown query kind {kind!r} (expected one of {', '.join(KINDS)})")
+        mix[kind] = float(weight or 1)
+    return {k: w for k, w in mix.items() if w > 0}
+
+
+def _ro(path: str) -> sqlite3.Connection:
+    return sqlite3.connect("file:" + quote(os.path.abspath(path)) + "?mode=ro", uri=True)
+
+
+def _sample_hits(conn: sqlite3.Connection, rng: random.Random, need: int) -> Dict[str, List[str]]:
+    """Existing values per kind, from random users."""
+    pools: Dict[str, List[str]] = {k: [] for k in KINDS}
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]
+    if not max_id:
+        return pools
+    sql = (
+        "SELECT u.sebi_reg_no, u.pan_id, (SELECT upi_id FROM upi_accounts a WHERE a.user_id = u.id LIMIT 1), "
+        "u.full_name FROM users u WHERE u.id IN ({})"
+    )
+    for _ in range(50):
+        if all(len(v) >= need for v in pools.values()):
+            break
+        ids = [rng.randint(1, max_id) for _ in range(500)]
+        for reg, pan, upi, full_name in conn.execute(sql.format(",".join("?" * len(ids))), ids):
+            for kind, value in (("reg_no", reg), ("pan", pan), ("upi", upi), ("name", full_name)):
+                if value and len(pools[kind]) < need:
+                    pools[kind].append(value)
+            if full_name and len(pools["fuzzy"]) < need:
+                pools["fuzzy"].append(_typo(full_name, rng))
+    return pools
+
+
+def _typo(name: str, rng: random.Random) -> str:
+    """Drop one letter of the last word (what a user mistyping a name would send)."""
+    head, _, last = name.rpartition(" ")
+    if len(last) < 4:
+        return name
+    i = rng.randrange(1, len(last))
+    return f"{head} {last[:i]}{last[i + 1:]}".strip()
+
+
+def _word(rng: random.Random, n: int) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=n)).capitalize()
+
+
+_ABSENT_SQL = {
+    "reg_no": "SELECT sebi_reg_no FROM users WHERE sebi_reg_no IN ({})",
+    "pan": "SELECT pan_id FROM users WHERE pan_id IN ({})",
+    "upi": "SELECT upi_id FROM upi_accounts WHERE upi_id IN ({})",
+    "name": "SELECT full_name FROM users WHERE full_name IN ({})",
+}
+
+
+def _sample_misses(conn: sqlite3.Connection, rng: random.Random, need: int) -> Dict[str, List[str]]:
+    """Well-formed values that are not in the DB."""
+    make = {
+        "reg_no": lambda: rng.choice(["INA", "INH", "INP", "INZ"]) + "".join(rng.choices(string.digits, k=8)),
+        "pan": lambda: "".join(rng.choices(string.ascii_uppercase, k=5)) + "".join(rng.choices(string.digits, k=4))
+        + rng.choice(string.ascii_uppercase),
+        "upi": lambda: "".join(rng.choices(string.ascii_lowercase, k=9)) + str(rng.randint(1, 99)) + "@" + rng.choice(UPI_HANDLES),
+        "name": lambda: f"{_word(rng, 7)} {_word(rng, 9)}",
+        "fuzzy": lambda: f"{_word(rng, 7)} {_word(rng, 9)}",
+    }
+    pools: Dict[str, List[str]] = {}
+    for kind, gen in make.items():
+        values = list(dict.fromkeys(gen() for _ in range(need)))
+        if kind in _ABSENT_SQL:
+            present = set()
+            for i in range(0, len(values), 500):
+                chunk = values[i:i + 500]
+                present.update(r[0] for r in conn.execute(_ABSENT_SQL[kind].format(",".join("?" * len(chunk))), chunk))
+            values = [v for v in values if v not in present]
+        pools[kind] = values
+    return pools
+
+
+def build_workload(db: str, n: int, mix: Dict[str, float], miss_rate: float, seed: int) -> List[Query]:
+    rng = random.Random(seed)
+    need = min(n, 5000)
+    conn = _ro(db)
+    try:
+        pools = {"hit": _sample_hits(conn, rng, need), "miss": _sample_misses(conn, rng, need)}
+    finally:
+        conn.close()
+    kinds, weights = zip(*mix.items())
+    out: List[Query] = []
+    for _ in range(n):
+        kind = rng.choices(kinds, weights)[0]
+        outcome = "miss" if rng.random() < miss_rate else "hit"
+        pool = pools[outcome][kind]
+        if pool:  # empty only for tiny or empty DBs
+            out.append((kind, outcome, rng.choice(pool)))
+    return out
+
+
+def query_params(kind: str, value: str) -> Dict[str, Any]:
+    if kind == "fuzzy":
+        return {"name": value, "fuzzy": 1}
+    return {kind: value}
+
+
+# -------------- Measurement --------------
+
+def _pct(values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile of already sorted values."""
+    if not values:
+        return 0.0
+    pos = (len(values) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def summarize(name: str, latencies: Sequence[float], wall_s: Optional[float] = None,
+              extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """wall_s given: QPS over that wall time (concurrent runs); else serial QPS (count / summed latency)."""
+    lat = sorted(x * 1000.0 for x in latencies)
+    total_s = (wall_s if wall_s is not None else sum(lat) / 1000.0) or 1e-9
+    out: Dict[str, Any] = {
+        "name": name,
+        "queries": len(lat),
+        "latency_ms": {
+            "mean": round(sum(lat) / len(lat), 4) if lat else 0.0,
+            "p50": round(_pct(lat, 50), 4),
+            "p99": round(_pct(lat, 99), 4),
+            "max": round(lat[-1], 4) if lat else 0.0,
+        },
+        "qps": round(len(lat) / total_s, 1),
+    }
+    if extra:
+        out.update(extra)
+    return out
+
+
+def _proc_io(pid: str = "self") -> Optional[Dict[str, int]]:
+    try:
+        with open(f"/proc/{pid}/io") as fh:
+            fields = dict(line.split(": ") for line in fh.read().splitlines())
+        return {"read_bytes": int(fields["read_bytes"])}  # storage reads (rchar would count our own reads of this file)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _io_now() -> Dict[str, int]:
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    out = {"major_faults": ru.ru_majflt, "minor_faults": ru.ru_minflt, "inblock": ru.ru_inblock}
+    out.update(_proc_io() or {})
+    return out
+
+
+def _io_delta(a: Dict[str, int], b: Dict[str, int]) -> Dict[str, int]:
+    return {k: b[k] - a[k] for k in b if k in a}
+
+
+def resident_bytes(path: str) -> Optional[int]:
+    """Bytes of the file currently in the OS page cache (Linux mincore), or None."""
+    if not sys.platform.startswith("linux") or not os.path.exists(path):
+        return None
+    size = os.path.getsize(path)
+    if size == 0:
+        return 0
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.mmap.restype = ctypes.c_void_p
+        libc.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long]
+        libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+        libc.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.POINTER(ctypes.c_ubyte)]
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            addr = libc.mmap(None, size, mmap.PROT_READ, mmap.MAP_SHARED, fd, 0)
+            if addr is None or addr == ctypes.c_void_p(-1).value:
+                return None
+            try:
+                pages = (size + mmap.PAGESIZE - 1) // mmap.PAGESIZE
+                vec = (ctypes.c_ubyte * pages)()
+                if libc.mincore(addr, size, vec) != 0:
+                    return None
+                return sum(1 for b in bytes(vec) if b & 1) * mmap.PAGESIZE
+            finally:
+                libc.munmap(addr, size)
+        finally:
+            os.close(fd)
+    except (OSError, AttributeError):
+        return None
+
+
+def evict(path: str) -> None:
+    """Drop the file's clean pages from the OS page cache (best effort)."""
+    if not os.path.exists(path) or not hasattr(os, "posix_fadvise"):
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def db_stats(path: str) -> Dict[str, Any]:
+    conn = _ro(path)
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        summary = risk_summary.is_installed(conn)
+        out: Dict[str, Any] = {
+            "file_bytes": os.path.getsize(path),
+            "wal_bytes": os.path.getsize(path + "-wal") if os.path.exists(path + "-wal") else 0,
+            "page_size": page_size,
+            "page_count": page_count,
+            "freelist_count": conn.execute("PRAGMA freelist_count").fetchone()[0],
+            "users": conn.execute("SELECT COUNT(*) FROM users").fetchone()[0],
+            "upi_accounts": conn.execute("SELECT COUNT(*) FROM upi_accounts").fetchone()[0],
+            "summary_rows": conn.execute(f"SELECT COUNT(*) FROM {risk_summary.TABLE}").fetchone()[0] if summary else None,
+        }
+    finally:
+        conn.close()
+    snap = path + ".snap"
+    out["snapshot_bytes"] = os.path.getsize(snap) if os.path.exists(snap) else None
+    return out
+
+
+def _cases(target: str, label: str, records: Dict[Tuple[str, str], Dict[str, Any]],
+           wall_s: Optional[float]) -> List[Dict[str, Any]]:
+    results = []
+    everything: List[float] = []
+    for (kind, outcome), rec in sorted(records.items()):
+        everything += rec["lat"]
+        extra: Dict[str, Any] = {
+            "target": target, "size": label, "kind": kind, "outcome": outcome,
+            "matched_ratio": round(rec["matched"] / max(1, len(rec["lat"])), 3),
+            "errors": rec["errors"],
+        }
+        if rec.get("io"):
+            extra["io"] = rec["io"]
+        results.append(summarize(f"{target}.{label}.{kind}.{outcome}", rec["lat"], wall_s, extra))
+    results.append(summarize(f"{target}.{label}.mix", everything, wall_s, {"target": target, "size": label, "kind": "mix"}))
+    return results
+
+
+# -------------- In-process --------------
+
+def load_service(db: str, env: Dict[str, str]) -> Any:
+    """(Re)import main.py against db and run its startup hooks; returns the module."""
+    os.environ.update(env)
+    os.environ["SEBI_DB"] = db
+    mod = sys.modules.get("main")
+    if mod is not None:
+        for fn in mod.app.router.on_shutdown:
+            fn()
+        mod = importlib.reload(mod)
+    else:
+        import main as mod  # noqa: E402 (env must be set first)
+    for fn in mod.app.router.on_startup:
+        fn()
+    return mod
+
+
+def run_inproc(mod: Any, workload: List[Query]) -> Tuple[Dict[Tuple[str, str], Dict[str, Any]], float]:
+    from starlette.requests import Request
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+    blank = {"reg_no": None, "pan": None, "upi": None, "name": None, "type": None, "fuzzy": 0}
+    records: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    t_run = time.perf_counter()
+    for kind, outcome, value in workload:
+        rec = records.setdefault((kind, outcome), {"lat": [], "matched": 0, "errors": 0, "io": {}})
+        params = dict(blank, **query_params(kind, value))
+        io0 = _io_now()
+        t0 = time.perf_counter()
+        try:
+            resp = mod.verify(request, **params)
+        except Exception:
+            rec["errors"] += 1
+            continue
+        rec["lat"].append(time.perf_counter() - t0)
+        for k, v in _io_delta(io0, _io_now()).items():  # outside the timed span
+            rec["io"][k] = rec["io"].get(k, 0) + v
+        if json.loads(resp.body)["count"]:
+            rec["matched"] += 1
+    return records, time.perf_counter() - t_run
+
+
+# -------------- HTTP --------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _service_pids(pid: int) -> List[int]:
+    pids = [pid]
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as fh:
+                pids += [int(p) for p in fh.read().split()]
+    except OSError:
+        pass
+    return pids
+
+
+def _service_io(pids: Sequence[int]) -> Optional[Dict[str, int]]:
+    total: Dict[str, int] = {}
+    for pid in pids:
+        io = _proc_io(str(pid))
+        if io is None:
+            return None
+        for k, v in io.items():
+            total[k] = total.get(k, 0) + v
+    return total
+
+
+@contextmanager
+def serve(db: str, env: Dict[str, str], workers: int, timeout: float) -> Iterator[Tuple[str, int]]:
+    """A uvicorn for main.py on db; yields (base URL, pid)."""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=HERE, env=dict(os.environ, **env, SEBI_DB=db),
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+            try:
+                if _get_json(base, "/healthz") is not None:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"service on {base} not healthy after {timeout}s")
+            time.sleep(0.25)
+        yield base, proc.pid
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def _get_json(base: str, path: str) -> Optional[Dict[str, Any]]:
+    u = urlsplit(base)
+    conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=10)
+    try:
+        conn.request("GET", path)
+        r = conn.getresponse()
+        body = r.read()
+        return json.loads(body) if r.status == 200 else None
+    finally:
+        conn.close()
+
+
+def run_http(base: str, workload: List[Query], concurrency: int) -> Tuple[Dict[Tuple[str, str], Dict[str, Any]], float]:
+    u = urlsplit(base)
+    prefix = (u.path or "").rstrip("/") + "/api/registry/v1/verify?"
+    records: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    lock = threading.Lock()
+    cursor = itertools.count()
+
+    def client() -> None:
+        conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=60)
+        local: List[Tuple[Tuple[str, str], Optional[float], bool]] = []
+        while True:
+            i = next(cursor)
+            if i >= len(workload):
+                break
+            kind, outcome, value = workload[i]
+            path = prefix + urlencode(query_params(kind, value))
+            t0 = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                r = conn.getresponse()
+                body = r.read()
+                dt = time.perf_counter() - t0
+                ok = r.status == 200
+                local.append(((kind, outcome), dt if ok else None, ok and json.loads(body)["count"] > 0))
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=60)
+                local.append(((kind, outcome), None, False))
+        conn.close()
+        with lock:
+            for key, dt, matched in local:
+                rec = records.setdefault(key, {"lat": [], "matched": 0, "errors": 0})
+                if dt is None:
+                    rec["errors"] += 1
+                else:
+                    rec["lat"].append(dt)
+                    rec["matched"] += matched
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(max(1, concurrency))]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return records, time.perf_counter() - t0
+
+
+# -------------- Driver --------------
+
+def _size_label(n: int) -> str:
+    for unit, div in (("M", 1_000_000), ("k", 1_000)):
+        if n >= div and n % div == 0:
+            return f"{n // div}{unit}"
+    return str(n)
+
+
+def _service_env(args: argparse.Namespace, db: str) -> Dict[str, str]:
+    return {
+        "VERIFY_CACHE_ITEMS": os.environ.get("VERIFY_CACHE_ITEMS", "50000") if args.verify_cache else "0",
+        "REGISTRY_SNAPSHOT": db + ".snap" if args.snapshot else "",
+    }
+
+
+def _meta(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, cwd=HERE,
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    knobs = [
+        "KEY_FILTER_FP_RATE", "REGISTRY_CACHE_KB", "REGISTRY_MMAP_BYTES", "REGISTRY_POOL_SIZE",
+        "REGISTRY_CACHED_STATEMENTS", "FUZZY_MIN_SCORE", "FUZZY_MAX_CANDIDATES",
+    ]
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "targets": sorted(args.targets),
+        "sizes": args.sizes if not args.http else None,
+        "queries": args.queries,
+        "warmup": args.warmup,
+        "mix": args.mix,
+        "miss_rate": args.miss_rate,
+        "seed": args.seed,
+        "concurrency": args.concurrency,
+        "http_workers": args.http_workers,
+        "snapshot": args.snapshot,
+        "verify_cache": args.verify_cache,
+        "cold": args.cold,
+        "env": {k: os.environ.get(k) for k in knobs},  # unset = service default
+    }
+
+
+def bench_db(args: argparse.Namespace, db: str, label: str, mix: Dict[str, float]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    workload = build_workload(db, args.queries, mix, args.miss_rate, args.seed)
+    warmup = build_workload(db, args.warmup, mix, args.miss_rate, args.seed + 1) if args.warmup else []
+    env = _service_env(args, db)
+    results: List[Dict[str, Any]] = []
+    runs: Dict[str, Any] = {}
+
+    def before() -> Dict[str, Any]:
+        if args.cold:
+            for p in (db, db + ".snap"):
+                evict(p)
+        return {"db": resident_bytes(db), "snapshot": resident_bytes(db + ".snap")}
+
+    if "inproc" in args.targets:
+        t = time.perf_counter()
+        mod = load_service(db, env)
+        startup_s = time.perf_counter() - t
+        t = time.perf_counter()
+        run_inproc(mod, warmup)
+        warmup_s = time.perf_counter() - t
+        cache_before = before()
+        records, wall = run_inproc(mod, workload)
+        results += _cases("inproc", label, records, None)
+        runs["inproc"] = {
+            "startup_s": round(startup_s, 3),
+            "warmup_s": round(warmup_s, 3),
+            "wall_s": round(wall, 3),
+            "page_cache_before": cache_before,
+            "page_cache_after": {"db": resident_bytes(db), "snapshot": resident_bytes(db + ".snap")},
+            "service": {
+                "pool": mod.POOL.stats(),
+                "name_index": mod.NAME_INDEX.stats(),
+                "verify_cache": mod.VERIFY_CACHE.stats(),
+                "key_filters": mod.KEY_FILTERS.stats() if mod.KEY_FILTER_FP_RATE > 0 else None,
+                "snapshot": mod.SNAPSHOT.stats() if mod.SNAPSHOT is not None else None,
+            },
+        }
+        for fn in mod.app.router.on_shutdown:
+            fn()
+
+    if "http" in args.targets:
+        t = time.perf_counter()
+        with serve(db, env, args.http_workers, args.startup_timeout) as (base, pid):
+            startup_s = time.perf_counter() - t
+            run_http(base, warmup, args.concurrency)
+            cache_before = before()
+            pids = _service_pids(pid)
+            io0 = _service_io(pids)
+            records, wall = run_http(base, workload, args.concurrency)
+            io1 = _service_io(pids)
+            results += _cases("http", label, records, wall)
+            runs["http"] = {
+                "startup_s": round(startup_s, 3),
+                "wall_s": round(wall, 3),
+                "page_cache_before": cache_before,
+                "page_cache_after": {"db": resident_bytes(db), "snapshot": resident_bytes(db + ".snap")},
+                "service_io": _io_delta(io0, io1) if io0 and io1 else None,
+                "service": _get_json(base, "/healthz"),
+            }
+    return results, runs
+
+
+def compare(old_path: str, new: Dict[str, Any]) -> None:
+    with open(old_path) as fh:
+        old = {r["name"]: r for r in json.load(fh)["results"] if "latency_ms" in r}
+    print(f"{'case':40s} {'p50 old':>9s} {'p50 new':>9s} {'delta':>8s} {'p99 old':>9s} {'p99 new':>9s} {'delta':>8s}")
+    for r in new["results"]:
+        if "latency_ms" not in r or r["name"] not in old:
+            continue
+        line = f"{r['name']:40s}"
+        for q in ("p50", "p99"):
+            a, b = old[r["name"]]["latency_ms"][q], r["latency_ms"][q]
+            line += f" {a:9.3f} {b:9.3f} {(b / a - 1) * 100 if a else 0:+7.1f}%"
+        print(line)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark registry verify lookups across query types and DB sizes.")
+    parser.add_argument("--sizes", default=None, help=f"comma list of user counts (default {DEFAULT_SIZES}; quick {QUICK_SIZES})")
+    parser.add_argument("--quick", action="store_true", help="small DBs and fewer queries (CI / smoke runs)")
+    parser.add_argument("--queries", type=int, default=None, help="timed queries per DB and target (default 5000, quick 1000)")
+    parser.add_argument("--warmup", type=int, default=None, help="untimed queries first (default 500, quick 200)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"query weights (default {DEFAULT_MIX})")
+    parser.add_argument("--miss-rate", type=float, default=0.2, help="share of queries for absent values")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--targets", default="inproc,http", help="comma list: inproc,http")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent HTTP clients")
+    parser.add_argument("--http-workers", type=int, default=1, help="uvicorn worker processes per DB")
+    parser.add_argument("--startup-timeout", type=float, default=600.0, help="seconds to wait for a local service")
+    parser.add_argument("--http", default=None, help="benchmark a running service instead, e.g. http://localhost:8001")
+    parser.add_argument("--db", default="sebi_dummy.db", help="with --http: the DB it serves (to sample query values)")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "mg-registry-bench"),
+                        help="where generated DBs are kept between runs")
+    parser.add_argument("--rebuild", action="store_true", help="regenerate DBs even if cached")
+    parser.add_argument("--snapshot", action="store_true", help="build and serve the mmap snapshot (snapshot.py)")
+    parser.add_argument("--verify-cache", action="store_true", help="keep the verify response cache on")
+    parser.add_argument("--cold", action="store_true", help="evict the DB from the OS page cache before each timed run (best effort: pages the service still maps stay)")
+    parser.add_argument("--out", default=None, help="write JSON results here (default: stdout)")
+    parser.add_argument("--compare", default=None, help="previous JSON results to diff p50/p99 latency against")
+    args = parser.parse_args(argv)
+    args.sizes = [int(s) for s in (args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)).split(",")]
+    args.queries = args.queries or (1000 if args.quick else 5000)
+    args.warmup = args.warmup if args.warmup is not None else (200 if args.quick else 500)
+    args.targets = {t.strip() for t in args.targets.split(",") if t.strip()}
+    mix = parse_mix(args.mix)
+
+    results: List[Dict[str, Any]] = []
+    dbs: List[Dict[str, Any]] = []
+    if args.http:
+        workload = build_workload(args.db, args.queries, mix, args.miss_rate, args.seed)
+        warmup = build_workload(args.db, args.warmup, mix, args.miss_rate, args.seed + 1) if args.warmup else []
+        run_http(args.http, warmup, args.concurrency)
+        records, wall = run_http(args.http, workload, args.concurrency)
+        results += _cases("http", "external", records, wall)
+        dbs.append({"path": args.db, "stats": db_stats(args.db), "runs": {"http": {
+            "wall_s": round(wall, 3), "service": _get_json(args.http, "/healthz"),
+        }}})
+    else:
+        os.makedirs(args.workdir, exist_ok=True)
+        sys.path.insert(0, HERE)
+        for n in args.sizes:
+            info = ensure_db(args.workdir, n, args.seed, args.rebuild, args.snapshot)
+            label = _size_label(n)
+            print(f"[bench] {label}: {', '.join(sorted(args.targets))}", file=sys.stderr)
+            cases, runs = bench_db(args, info["path"], label, mix)
+            results += cases
+            dbs.append(dict(info, size=label, stats=db_stats(info["path"]), runs=runs))
+
+    report = {"meta": _meta(args), "dbs": dbs, "results": results}
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        compare(args.compare, report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
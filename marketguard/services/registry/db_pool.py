@@ -0,0 +1,155 @@
+# db_pool.py
+# Long-lived read-only SQLite connections for the registry service
+# - Connections (URI mode=ro + PRAGMA query_only) are checked out per request and
+#   returned to a LIFO idle list, so the page cache and mmap survive across requests
+#   independently of which worker thread serves them
+# - sqlite3's per-connection statement cache reuses prepared queries (stable SQL text)
+# - The DB file's identity (device, inode) is checked on checkout; when the file is
+#   replaced (e.g. os.replace of a freshly built DB) stale connections are dropped.
+#   Writes and WAL checkpoints keep the inode, so pooled connections survive them
+# - data_stamp() adds PRAGMA data_version from a watcher connection, so caches built
+#   on top can tell when any connection (in any process) committed
+# ------------------------------------------------------------
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+FileIdent = Tuple[int, int]
+
+
+class ReadOnlyPool:
+    def __init__(
+        self,
+        path: str,
+        cache_kb: int = 64 * 1024,
+        mmap_bytes: int = 256 * 1024 * 1024,
+        statements: int = 256,
+        max_idle: int = 16,
+        busy_timeout_ms: int = 5000,
+    ):
+        self.path = path
+        self.cache_kb = max(0, cache_kb)
+        self.mmap_bytes = max(0, mmap_bytes)
+        self.statements = max(0, statements)
+        self.max_idle = max(1, max_idle)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.generation = 0
+        self.opened = 0
+        self._ident: Optional[FileIdent] = None
+        self._lock = threading.Lock()
+        self._idle: List[Tuple[sqlite3.Connection, int]] = []
+        self._busy = 0
+        self._watch: Optional[Tuple[sqlite3.Connection, int]] = None
+        self._watch_lock = threading.Lock()
+
+    # ---------------- file identity ----------------
+    def _stat(self) -> FileIdent:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"SQLite DB not found at {self.path}. Set SEBI_DB env var.")
+        return (st.st_dev, st.st_ino)
+
+    def check(self) -> int:
+        """Current file generation; bumped whenever the DB file is replaced (content changes: data_stamp)."""
+        ident = self._stat()
+        if ident != self._ident:
+            with self._lock:
+                if ident != self._ident:
+                    self._ident = ident
+                    self.generation += 1
+        return self.generation
+
+    def data_stamp(self) -> Tuple[int, int]:
+        """(file generation, data_version): moves on file replacement and on every commit."""
+        generation = self.check()
+        with self._watch_lock:
+            if self._watch is None or self._watch[1] != generation:
+                if self._watch is not None:
+                    self._watch[0].close()
+                self._watch = (self._open(), generation)
+            # data_version changes whenever another connection commits to the file
+            version = int(self._watch[0].execute("PRAGMA data_version").fetchone()[0])
+        return (generation, version)
+
+    # ---------------- connections ----------------
+    def _open(self) -> sqlite3.Connection:
+        uri = "file:" + quote(os.path.abspath(self.path)) + "?mode=ro"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            check_same_thread=False,  # checked out by whichever worker thread serves the request
+            isolation_level=None,     # autocommit: each read sees the latest commit
+            cached_statements=self.statements,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_kb)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_bytes)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Check out a connection opened on the current DB file; returned to the pool on exit."""
+        generation = self.check()
+        conn: Optional[sqlite3.Connection] = None
+        stale: List[sqlite3.Connection] = []
+        with self._lock:
+            while self._idle:
+                c, gen = self._idle.pop()  # most recently used first: warmest cache
+                if gen == generation:
+                    conn = c
+                    break
+                stale.append(c)
+            self._busy += 1
+        for c in stale:
+            c.close()
+        try:
+            if conn is None:
+                conn = self._open()
+                with self._lock:
+                    self.opened += 1
+            yield conn
+        finally:
+            keep = conn is not None and not conn.in_transaction
+            with self._lock:
+                self._busy -= 1
+                if keep and generation == self.generation and len(self._idle) < self.max_idle:
+                    self._idle.append((conn, generation))  # type: ignore[arg-type]
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self) -> None:
+        with self._watch_lock:
+            if self._watch is not None:
+                self._watch[0].close()
+                self._watch = None
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _gen in idle:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            idle, busy = len(self._idle), self._busy
+        return {
+            "path": self.path,
+            "generation": self.generation,
+            "idle": idle,
+            "busy": busy,
+            "max_idle": self.max_idle,
+            "opened": self.opened,
+            "cache_kb": self.cache_kb,
+            "mmap_bytes": self.mmap_bytes,
+            "cached_statements": self.statements,
+        }
@@ -0,0 +1,349 @@
+# ingest.py
+# Bulk load of official registry CSVs (name,type,reg_no,status,member,link) into the
+# SQLite file the registry service reads
+# - CSV rows are normalized in batches and streamed into an unindexed staging DB with
+#   executemany in large transactions; repeated reg_nos resolve to the last row seen
+# - Full load: fresh DB, users inserted in one set-based pass, indexes built afterwards,
+#   then the risk summary table (risk_summary.install)
+# - --delta: starts from an online-backup copy of the current DB and upserts by reg_no
+#   (the summary triggers keep user_risk_summary current for the touched rows)
+# - Always builds a new file next to the target and os.replace()s it over the target;
+#   the service's pool sees the new inode on its next checkout and reopens, so there
+#   is no restart and no window where readers see a half-written DB
+# - The new file goes in with a rollback journal and is switched to WAL only once it
+#   is the target, after the old -wal/-shm names are unlinked: connections still on
+#   the old file keep their open (unlinked) WAL files, and none are paired with the new one
+# - --snapshot: also builds the mmap lookup snapshot (snapshot.py) for the swapped-in
+#   file and puts it in place as <target>.snap
+#
+# Usage:
+#   python ingest.py ../../data/registry_sample.csv --db sebi_dummy.db          # full rebuild
+#   python ingest.py updates.csv --db sebi_dummy.db --delta                     # upsert by reg_no
+#   python ingest.py updates.csv --db sebi_dummy.db --delta --snapshot          # + sebi_dummy.db.snap
+# ------------------------------------------------------------
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import risk_summary
+import schema
+import snapshot
+
+REQUIRED_COLUMNS = ("name", "reg_no")
+STAGE_COLUMNS = ("reg_no", "name", "type", "status", "member", "link")
+
+StageRow = Tuple[str, str, Optional[str], str, Optional[str], Optional[str]]
+
+_STAGE_DDL = [
+    "CREATE TABLE stage.files (id INTEGER PRIMARY KEY, name TEXT NOT NULL)",
+    """
+    CREATE TABLE stage.rows (
+        seq INTEGER PRIMARY KEY,
+        file_id INTEGER NOT NULL,
+        reg_no TEXT NOT NULL,
+        name TEXT NOT NULL,
+        type TEXT,
+        status TEXT NOT NULL,
+        member TEXT,
+        link TEXT
+    )
+    """,
+]
+
+# Last row per reg_no wins (SQLite takes bare columns from the MAX(seq) row)
+_RESOLVE = """
+    CREATE TABLE stage.latest AS
+    SELECT MAX(r.seq) AS seq, r.reg_no, r.name, r.type, r.status, r.member, r.link, f.name AS source
+    FROM stage.rows r JOIN stage.files f ON f.id = r.file_id
+    GROUP BY r.reg_no
+"""
+
+_USER_COLUMNS = "username, password_hash, full_name, email, registration_date, account_status, intermediary_type, sebi_reg_no"
+_USER_VALUES = "l.reg_no, '', l.name, '', :today, l.status, l.type, l.reg_no"
+
+_INSERT_USERS = f"INSERT INTO users ({_USER_COLUMNS}) SELECT {_USER_VALUES} FROM stage.latest l ORDER BY l.seq"
+
+_UPDATE_USERS = """
+    UPDATE users
+    SET full_name = l.name,
+        account_status = l.status,
+        intermediary_type = COALESCE(l.type, users.intermediary_type)
+    FROM stage.latest l
+    WHERE users.sebi_reg_no = l.reg_no
+      AND (users.full_name IS NOT l.name
+           OR users.account_status IS NOT l.status
+           OR users.intermediary_type IS NOT COALESCE(l.type, users.intermediary_type))
+"""
+
+_INSERT_NEW_USERS = f"""
+    INSERT INTO users ({_USER_COLUMNS})
+    SELECT {_USER_VALUES} FROM stage.latest l
+    WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.sebi_reg_no = l.reg_no)
+    ORDER BY l.seq
+"""
+
+_UPSERT_ENTRIES = """
+    INSERT INTO registry_entries (reg_no, user_id, member, link, status, source, ingested_at)
+    SELECT l.reg_no, (SELECT MIN(u.id) FROM users u WHERE u.sebi_reg_no = l.reg_no),
+           l.member, l.link, l.status, l.source, :now
+    FROM stage.latest l WHERE true
+    ON CONFLICT(reg_no) DO UPDATE SET
+        user_id = excluded.user_id, member = excluded.member, link = excluded.link,
+        status = excluded.status, source = excluded.source, ingested_at = excluded.ingested_at
+"""
+
+
+# -------------- CSV reading --------------
+
+def read_batches(path: str, batch: int) -> Iterator[Tuple[int, List[StageRow]]]:
+    """(rows read, normalized rows) per chunk of one CSV; rows without a name or reg_no are dropped."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [h.strip().lower() for h in next(reader, [])]
+        missing = [c for c in REQUIRED_COLUMNS if c not in header]
+        if missing:
+            raise ValueError(f"{path}: missing column(s) {', '.join(missing)} (header: {', '.join(header)})")
+        # Absent optional columns read the padding cell past the end of the row
+        width = len(header)
+        pick = itemgetter(*[header.index(c) if c in header else width for c in STAGE_COLUMNS])
+        pad = [""] * (width + 1)
+        always_pad = any(c not in header for c in STAGE_COLUMNS)
+        while True:
+            chunk = list(islice(reader, batch))
+            if not chunk:
+                return
+            if always_pad:
+                picked = [pick(rec + pad) for rec in chunk]
+            else:
+                try:
+                    picked = list(map(pick, chunk))
+                except IndexError:  # short rows
+                    picked = [pick(rec + pad) for rec in chunk]
+            rows = [
+                (reg.strip().upper(), name.strip(), typ.strip().upper() or None, status.strip().lower() or "active",
+                 member.strip() or None, link.strip() or None)
+                for reg, name, typ, status, member, link in picked
+            ]
+            yield len(chunk), [r for r in rows if r[0] and r[1]]
+
+
+# -------------- Build --------------
+
+def _connect(path: str, cache_mb: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None)
+    # The file is private until the swap: no journal, no fsync per commit
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute(f"PRAGMA cache_size = -{int(cache_mb) * 1024}")
+    conn.execute("PRAGMA temp_store = FILE")
+    return conn
+
+
+def _copy_db(src: str, dst: str) -> None:
+    """Consistent snapshot of a live DB (online backup; readers and writers keep going)."""
+    source = sqlite3.connect("file:" + quote(os.path.abspath(src)) + "?mode=ro", uri=True)
+    target = sqlite3.connect(dst)
+    try:
+        source.backup(target, pages=16384)
+    finally:
+        target.close()
+        source.close()
+
+
+def _fsync(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _remove(path: str) -> None:
+    for p in (path, path + "-journal", path + "-wal", path + "-shm"):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+
+
+def swap_in(tmp: str, target: str) -> None:
+    """Atomically replace target with tmp (same directory, not in WAL mode), then enable WAL."""
+    # SQLite finds -wal/-shm by name and opens any -wal it sees in WAL mode, whatever the
+    # header says. Unlinking the old pair first leaves it to the connections that have it
+    # open (SQLite never checkpoints or deletes WAL files of a moved DB on close), and
+    # the new file gets its own once it is in place.
+    for p in (target + "-wal", target + "-shm"):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+    os.replace(tmp, target)
+    _fsync(os.path.dirname(os.path.abspath(target)))
+    conn = sqlite3.connect(target)
+    try:
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.execute("PRAGMA journal_mode = WAL")  # same mode scripts/sebi_dummy.py leaves
+    finally:
+        conn.close()
+
+
+def ingest(
+    csv_paths: Sequence[str],
+    db: str,
+    out: Optional[str] = None,
+    delta: bool = False,
+    batch: int = 50000,
+    commit_every: int = 1000000,
+    cache_mb: int = 256,
+    build_snapshot: bool = False,
+) -> Dict[str, float]:
+    """Build the new DB and swap it over out (default: db). Returns counters and timings."""
+    out = out or db
+    if delta and not os.path.exists(db):
+        raise FileNotFoundError(f"--delta needs an existing DB at {db}")
+    out_dir = os.path.dirname(os.path.abspath(out))
+    tmp = os.path.join(out_dir, f".{os.path.basename(out)}.ingest-{os.getpid()}")
+    stage = tmp + ".stage"
+    tmp_snap = tmp + ".snap"
+    _remove(tmp)
+    _remove(stage)
+
+    stats: Dict[str, int] = {"read": 0, "skipped": 0}
+    timings: Dict[str, float] = {}
+    today = datetime.now().strftime("%Y-%m-%d")
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    t0 = time.perf_counter()
+    try:
+        if delta:
+            _copy_db(db, tmp)
+        timings["copy_s"] = time.perf_counter() - t0
+
+        conn = _connect(tmp, cache_mb)
+        try:
+            conn.execute("ATTACH DATABASE ? AS stage", (stage,))
+            conn.execute("PRAGMA stage.journal_mode = OFF")
+            conn.execute("PRAGMA stage.synchronous = OFF")
+            for ddl in _STAGE_DDL:
+                conn.execute(ddl)
+
+            # 1) Stream CSVs into staging
+            t = time.perf_counter()
+            pending = 0
+            conn.execute("BEGIN")
+            for file_id, path in enumerate(csv_paths, 1):
+                conn.execute("INSERT INTO stage.files (id, name) VALUES (?, ?)", (file_id, os.path.basename(path)))
+                insert = f"INSERT INTO stage.rows (file_id, {', '.join(STAGE_COLUMNS)}) VALUES ({file_id}, ?, ?, ?, ?, ?, ?)"
+                for read, rows in read_batches(path, batch):
+                    conn.executemany(insert, rows)
+                    stats["read"] += read
+                    stats["skipped"] += read - len(rows)
+                    pending += len(rows)
+                    if pending >= commit_every:
+                        conn.execute("COMMIT")
+                        conn.execute("BEGIN")
+                        pending = 0
+            conn.execute("COMMIT")
+            conn.execute(_RESOLVE)
+            stats["distinct_reg_nos"] = int(conn.execute("SELECT COUNT(*) FROM stage.latest").fetchone()[0])
+            timings["stage_s"] = time.perf_counter() - t
+
+            # 2) Apply to users + registry_entries
+            t = time.perf_counter()
+            conn.execute("BEGIN")
+            schema.create_tables(conn)  # fresh DB, or registry_entries on DBs that predate it
+            if delta:
+                stats["updated"] = conn.execute(_UPDATE_USERS).rowcount
+                stats["inserted"] = conn.execute(_INSERT_NEW_USERS, {"today": today}).rowcount
+            else:
+                stats["updated"] = 0
+                stats["inserted"] = conn.execute(_INSERT_USERS, {"today": today}).rowcount
+            conn.execute("COMMIT")
+            timings["load_s"] = time.perf_counter() - t
+
+            # 3) Indexes after the load, then the lookup table
+            t = time.perf_counter()
+            conn.execute("BEGIN")
+            schema.create_indexes(conn)
+            conn.execute(_UPSERT_ENTRIES, {"now": now})
+            conn.execute("COMMIT")
+            timings["index_s"] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            stats["summary_rows"] = risk_summary.install(conn, rebuild=not delta or not risk_summary.is_installed(conn))
+            timings["summary_s"] = time.perf_counter() - t
+
+            conn.execute("DETACH DATABASE stage")
+            conn.execute("PRAGMA journal_mode = DELETE")  # WAL is switched on by swap_in
+        finally:
+            conn.close()
+        _remove(stage)
+
+        # 4) Durable, then atomically visible
+        t = time.perf_counter()
+        _fsync(tmp)
+        swap_in(tmp, out)
+        timings["swap_s"] = time.perf_counter() - t
+
+        # 5) Snapshot of the file now in place (it records the inode/mtime swap_in left)
+        t = time.perf_counter()
+        if build_snapshot:
+            stats["snapshot_bytes"] = snapshot.build(out, tmp_snap)["bytes"]
+            os.replace(tmp_snap, out + ".snap")
+            _fsync(out_dir)
+        timings["snapshot_s"] = time.perf_counter() - t
+    except BaseException:
+        _remove(tmp)
+        _remove(stage)
+        if os.path.exists(tmp_snap):
+            os.remove(tmp_snap)
+        raise
+
+    total = time.perf_counter() - t0
+    result: Dict[str, float] = {k: float(v) for k, v in stats.items()}
+    result.update({k: round(v, 3) for k, v in timings.items()})
+    result["total_s"] = round(total, 3)
+    result["stage_rows_per_s"] = round(stats["read"] / timings["stage_s"]) if timings["stage_s"] > 0 else 0.0
+    result["rows_per_s"] = round(stats["read"] / total) if total > 0 else 0.0
+    return result
+
+
+# -------------- CLI --------------
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load registry CSVs into the registry SQLite DB.")
+    parser.add_argument("csv", nargs="+", help="CSV file(s) with name,type,reg_no,status,member,link")
+    parser.add_argument("--db", default="sebi_dummy.db", help="Target SQLite file (source too for --delta)")
+    parser.add_argument("--out", default=None, help="Write here instead of replacing --db")
+    parser.add_argument("--delta", action="store_true", help="Upsert by reg_no into a copy of --db")
+    parser.add_argument("--batch", type=int, default=50000, help="Rows per executemany call")
+    parser.add_argument("--commit-every", type=int, default=1000000, help="Rows per staging transaction")
+    parser.add_argument("--cache-mb", type=int, default=256, help="SQLite page cache for the build")
+    parser.add_argument("--snapshot", action="store_true", help="Also build <target>.snap (see snapshot.py)")
+    args = parser.parse_args(argv)
+
+    r = ingest(
+        args.csv, args.db, out=args.out, delta=args.delta,
+        batch=args.batch, commit_every=args.commit_every, cache_mb=args.cache_mb,
+        build_snapshot=args.snapshot,
+    )
+    print(f"read {int(r['read'])} rows ({int(r['skipped'])} skipped), {int(r['distinct_reg_nos'])} distinct reg_nos")
+    print(f"users: {int(r['inserted'])} inserted, {int(r['updated'])} updated; {int(r['summary_rows'])} summary rows")
+    print(
+        f"copy {r['copy_s']}s, stage {r['stage_s']}s ({int(r['stage_rows_per_s'])} rows/s), load {r['load_s']}s, "
+        f"index {r['index_s']}s, summary {r['summary_s']}s, swap {r['swap_s']}s, snapshot {r['snapshot_s']}s"
+    )
+    print(f"total {r['total_s']}s, {int(r['rows_per_s'])} rows/s -> {args.out or args.db}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
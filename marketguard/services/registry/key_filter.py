@@ -0,0 +1,152 @@
+# key_filter.py
+# Bloom filters over the registry's exact-match keys (reg_no, PAN, UPI)
+# - One filter per key kind, sized for a target false-positive rate
+# - A "no" is definite: verify answers it without touching SQLite
+# - Filters are only trusted for the data version they were built from; a stale
+#   set falls through to the DB and is rebuilt on a background thread
+# ------------------------------------------------------------
+
+import hashlib
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+
+class BloomFilter:
+    def __init__(self, expected: int, fp_rate: float = 0.001):
+        self.n_expected = max(1, expected)
+        self.fp_rate = min(max(fp_rate, 1e-9), 0.5)
+        self.m = max(64, int(math.ceil(-self.n_expected * math.log(self.fp_rate) / (math.log(2) ** 2))))
+        self.k = max(1, int(round(self.m / self.n_expected * math.log(2))))
+        self.bits = bytearray((self.m + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # Kirsch-Mitzenmacher double hashing off one 128-bit digest
+        d = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(d[:8], "little")
+        h2 = int.from_bytes(d[8:], "little") | 1
+        m = self.m
+        return ((h1 + i * h2) % m for i in range(self.k))
+
+    def add(self, key: str) -> None:
+        bits = self.bits
+        for p in self._positions(key):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        for p in self._positions(key):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def estimated_fp_rate(self) -> float:
+        return (1.0 - math.exp(-self.k * self.count / self.m)) ** self.k
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": self.count,
+            "bits": self.m,
+            "bytes": len(self.bits),
+            "hashes": self.k,
+            "target_fp_rate": self.fp_rate,
+            "estimated_fp_rate": round(self.estimated_fp_rate(), 6),
+        }
+
+
+# Returns kind -> normalized keys present in the DB
+Loader = Callable[[], Dict[str, Iterable[str]]]
+
+
+class KeyFilters:
+    def __init__(self, fp_rate: float = 0.001, min_rebuild_interval: float = 2.0):
+        self.fp_rate = fp_rate
+        self.min_rebuild_interval = min_rebuild_interval
+        self.stamp: Optional[Hashable] = None
+        self._filters: Dict[str, BloomFilter] = {}
+        self._lock = threading.Lock()
+        self._building = False
+        self._last_build = 0.0
+        self.builds = 0
+        self.build_ms = 0.0
+        self.build_error: Optional[str] = None
+        self.short_circuits: Dict[str, int] = {}
+        self.passed = 0
+        self.stale = 0
+
+    # ---------------- build ----------------
+    def build(self, stamp: Hashable, load: Loader) -> None:
+        """Build every filter from load(); the result is labelled with stamp (taken before loading)."""
+        t0 = time.perf_counter()
+        filters: Dict[str, BloomFilter] = {}
+        for kind, keys in load().items():
+            keys = list(keys)
+            bf = BloomFilter(len(keys), self.fp_rate)
+            for key in keys:
+                bf.add(key)
+            filters[kind] = bf
+        with self._lock:
+            self._filters = filters
+            self.stamp = stamp
+            self.builds += 1
+            self.build_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+            self.build_error = None
+
+    def start(self, stamp_fn: Callable[[], Hashable], load: Loader) -> None:
+        """Begin the first build on a background thread; until it lands, lookups go to the DB."""
+        self._rebuild_async(stamp_fn, load, force=True)
+
+    def _rebuild_async(self, stamp_fn: Callable[[], Hashable], load: Loader, force: bool = False) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if self._building or (not force and now - self._last_build < self.min_rebuild_interval):
+                return
+            self._building = True
+            self._last_build = now
+
+        def run() -> None:
+            try:
+                self.build(stamp_fn(), load)
+            except Exception as e:
+                self.build_error = repr(e)
+            finally:
+                with self._lock:
+                    self._building = False
+
+        threading.Thread(target=run, name="key-filter-build", daemon=True).start()
+
+    # ---------------- queries ----------------
+    def definitely_absent(
+        self, kind: str, key: str, stamp: Hashable, stamp_fn: Callable[[], Hashable], load: Loader
+    ) -> bool:
+        """True only if the filter for the current data version rules the key out."""
+        with self._lock:
+            bf = self._filters.get(kind) if self.stamp == stamp else None
+        if bf is None:
+            self.stale += 1
+            self._rebuild_async(stamp_fn, load)
+            return False
+        if key in bf:
+            self.passed += 1
+            return False
+        self.short_circuits[kind] = self.short_circuits.get(kind, 0) + 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            filters = dict(self._filters)
+            building = self._building
+        return {
+            "filters": {kind: bf.stats() for kind, bf in filters.items()},
+            "bytes": sum(len(bf.bits) for bf in filters.values()),
+            "builds": self.builds,
+            "build_ms": self.build_ms,
+            "building": building,
+            "build_error": self.build_error,
+            "short_circuits": dict(self.short_circuits),
+            "passed_to_db": self.passed,
+            "stale_skips": self.stale,
+        }
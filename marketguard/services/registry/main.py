@@ -1,12 +1,23 @@
 # app.py
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional, List, Dict, Any
-from difflib import get_close_matches
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Literal, Set, Tuple
+import logging
 import os
 import sqlite3
+import time
+
+import risk_summary
+from db_pool import ReadOnlyPool
+from key_filter import KeyFilters
+from name_index import NameIndex, normalize_name
+from snapshot import Snapshot
+import text_scan
+from verify_cache import VerifyCache, make_entry
 
 app = FastAPI(title="SEBI-Shield Registry Service (SQLite)")
+log = logging.getLogger("registry")
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,27 +25,165 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 DB_PATH = os.environ.get("SEBI_DB", "./sebi_dummy.db")
+DB_CACHE_KB = int(os.environ.get("REGISTRY_CACHE_KB", str(64 * 1024)))
+DB_MMAP_BYTES = int(os.environ.get("REGISTRY_MMAP_BYTES", str(256 * 1024 * 1024)))
+DB_CACHED_STATEMENTS = int(os.environ.get("REGISTRY_CACHED_STATEMENTS", "256"))
+DB_POOL_SIZE = int(os.environ.get("REGISTRY_POOL_SIZE", "16"))
+# Weighted trigram Dice, not difflib's ratio: 0.5 here is already stricter than the old
+# difflib cutoff of 0.6 (see WARP.md), so the default is not raised to match the number
+FUZZY_MIN_SCORE = float(os.environ.get("FUZZY_MIN_SCORE", "0.5"))
+FUZZY_MAX_CANDIDATES = int(os.environ.get("FUZZY_MAX_CANDIDATES", "20000"))
+FUZZY_LIMIT = 20
+BULK_MAX_ITEMS = int(os.environ.get("BULK_MAX_ITEMS", "1000"))
+VERIFY_CACHE_ITEMS = int(os.environ.get("VERIFY_CACHE_ITEMS", "50000"))
+VERIFY_MAX_AGE = int(os.environ.get("VERIFY_MAX_AGE", "60"))
+SCAN_MAX_CHARS = int(os.environ.get("SCAN_MAX_CHARS", str(1024 * 1024)))
+KEY_FILTER_FP_RATE = float(os.environ.get("KEY_FILTER_FP_RATE", "0.001"))  # 0 disables the filters
+REGISTRY_SNAPSHOT = os.environ.get("REGISTRY_SNAPSHOT", "")  # snapshot.py output; unset disables it
+INTERMEDIARY_TYPE_PATTERN = "^(IA|RA|PMS|BROKER|NONE)$"
 
 # -------------- DB Utilities --------------
 
-def get_conn() -> sqlite3.Connection:
-    if not os.path.exists(DB_PATH):
-        raise FileNotFoundError(f"SQLite DB not found at {DB_PATH}. Set SEBI_DB env var.")
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA busy_timeout = 5000")
-    conn.execute("PRAGMA journal_mode = WAL")
-    return conn
+# Long-lived read-only connections, checked out per request; queries keep their
+# SQL text stable per shape so sqlite3's statement cache reuses them.
+POOL = ReadOnlyPool(
+    DB_PATH,
+    cache_kb=DB_CACHE_KB,
+    mmap_bytes=DB_MMAP_BYTES,
+    statements=DB_CACHED_STATEMENTS,
+    max_idle=DB_POOL_SIZE,
+)
+
+# Trigram/phonetic name index, re-synced from the users table when the DB changes
+# (in the background once built: requests search the previous index meanwhile)
+NAME_INDEX = NameIndex(max_candidates=FUZZY_MAX_CANDIDATES)
+
+def load_name_rows() -> List[Tuple[int, str, Optional[str]]]:
+    # Own connection: background refreshes run after the request's one is returned
+    with POOL.connection() as conn:
+        return conn.execute("SELECT id, full_name, intermediary_type FROM users").fetchall()
+
+def ensure_name_index() -> None:
+    NAME_INDEX.ensure(POOL.data_stamp(), load_name_rows)
 
 def row_to_dict(r: sqlite3.Row) -> Dict[str, Any]:
     return {k: r[k] for k in r.keys()}
 
+# Verify responses per normalized query, dropped whenever the data version moves
+VERIFY_CACHE = VerifyCache(max_items=VERIFY_CACHE_ITEMS)
+
+def verify_cache_key(
+    reg_no: Optional[str], pan: Optional[str], upi: Optional[str], name: Optional[str], typ: Optional[str], fuzzy: int
+) -> Tuple[Any, ...]:
+    # Mirrors how the fetchers normalize each field, so equivalent queries share an entry
+    if reg_no:
+        return ("reg_no", reg_no.strip().upper(), typ)
+    if pan:
+        return ("pan", pan.strip().upper(), typ)
+    if upi:
+        return ("upi", upi.strip().lower(), typ)
+    if fuzzy:
+        return ("name~", normalize_name(name or ""), typ)
+    return ("name", (name or "").strip(), typ)
+
+# -------------- Negative lookup filters --------------
+
+# Bloom filters over the exact-match keys: a key they rule out cannot match, so verify
+# answers it without a DB round trip. Only trusted for the data version they were
+# built from; after a write, lookups go to SQLite until the background rebuild lands.
+KEY_FILTERS = KeyFilters(fp_rate=KEY_FILTER_FP_RATE or 0.001)
+FILTER_KEY_COLS = {"reg_no": "reg_key", "pan": "pan_key", "upi": "upi_key"}
+_LEGACY_KEY_SQL = {
+    "reg_key": "SELECT upper(trim(sebi_reg_no)) FROM users WHERE sebi_reg_no IS NOT NULL",
+    "pan_key": "SELECT upper(trim(pan_id)) FROM users WHERE pan_id IS NOT NULL",
+    "upi_key": "SELECT lower(trim(upi_id)) FROM upi_accounts WHERE upi_id IS NOT NULL",
+}
+EMPTY_VERIFY = make_entry([])
+
+def load_filter_keys() -> Dict[str, List[str]]:
+    with POOL.connection() as conn:
+        summary = risk_summary.is_installed(conn)
+        keys: Dict[str, List[str]] = {}
+        for col in FILTER_KEY_COLS.values():
+            sql = (
+                f"SELECT DISTINCT {col} FROM {risk_summary.TABLE} WHERE {col} IS NOT NULL"
+                if summary else _LEGACY_KEY_SQL[col]
+            )
+            keys[col] = [r[0] for r in conn.execute(sql)]
+        return keys
+
+def key_absent(col: str, key: str, stamp: Tuple[int, int]) -> bool:
+    """True if the normalized key is definitely not in the registry at data version stamp."""
+    if KEY_FILTER_FP_RATE <= 0 or col not in FILTER_KEY_COLS.values():
+        return False
+    return KEY_FILTERS.definitely_absent(col, key, stamp, POOL.data_stamp, load_filter_keys)
+
+# -------------- Exact-key snapshot --------------
+
+# Optional mmap'd snapshot (snapshot.py) answering reg_no/PAN/UPI lookups without SQLite.
+# It is only used while the DB file is the one it was built from and has no pending WAL
+# frames; re-checked whenever the data version moves, otherwise lookups go to SQLite.
+SNAPSHOT = Snapshot(REGISTRY_SNAPSHOT, DB_PATH) if REGISTRY_SNAPSHOT else None
+
+def snapshot_ready(version: Tuple[int, int]) -> bool:
+    return SNAPSHOT is not None and SNAPSHOT.usable(version)
+
+def take_snapshot_keys(
+    wanted: Dict[str, Dict[str, str]], version: Tuple[int, int]
+) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    """Rows for every exact key the snapshot can answer; those keys are removed from wanted."""
+    found: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    if not snapshot_ready(version):
+        return found
+    for col in FILTER_KEY_COLS.values():
+        keys = wanted.get(col)
+        if keys:
+            found[col] = {k: SNAPSHOT.lookup(col, k, None, limit=None) for k in keys}
+            keys.clear()
+    return found
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag == etag or tag == "W/" + etag:
+            return True
+    return False
+
+# -------------- Summary table lookups --------------
+
+# DBs built with risk_summary.py carry a pre-aggregated user_risk_summary table;
+# each lookup is then one indexed read. Older DBs fall back to the join queries.
+SUMMARY_SQL = {
+    (col, typed): risk_summary.lookup_sql(col, typed)
+    for col in risk_summary.KEY_INDEXES
+    for typed in (False, True)
+}
+SUMMARY_BY_IDS_SQL = risk_summary.by_ids_sql(FUZZY_LIMIT)
+_summary_state: Dict[str, Any] = {"stamp": None, "present": False}
+
+def has_summary(conn: sqlite3.Connection) -> bool:
+    stamp = POOL.data_stamp()
+    if _summary_state["stamp"] != stamp:
+        _summary_state["present"] = risk_summary.is_installed(conn)
+        _summary_state["stamp"] = stamp
+    return _summary_state["present"]
+
+def fetch_summary(conn: sqlite3.Connection, col: str, value: str, typ: Optional[str]) -> List[Dict[str, Any]]:
+    key = risk_summary.normalize_key(col, value)
+    params = (key, typ) if typ else (key,)
+    return [row_to_dict(r) for r in conn.execute(SUMMARY_SQL[(col, bool(typ))], params).fetchall()]
+
 # -------------- Core Queries --------------
 
 def fetch_by_reg_no(conn: sqlite3.Connection, reg_no: str, typ: Optional[str]) -> List[Dict[str, Any]]:
+    if has_summary(conn):
+        return fetch_summary(conn, "reg_key", reg_no, typ)
     reg_no = reg_no.strip().upper()
     q = """
         SELECT u.id, u.full_name, u.username, u.email, u.phone,
@@ -54,6 +203,8 @@ def fetch_by_reg_no(conn: sqlite3.Connection, reg_no: str, typ: Optional[str]) -
     return [row_to_dict(r) for r in cur.fetchall()]
 
 def fetch_by_pan(conn: sqlite3.Connection, pan: str, typ: Optional[str]) -> List[Dict[str, Any]]:
+    if has_summary(conn):
+        return fetch_summary(conn, "pan_key", pan, typ)
     pan = pan.strip().upper()
     q = """
         SELECT u.id, u.full_name, u.username, u.email, u.phone,
@@ -73,6 +224,8 @@ def fetch_by_pan(conn: sqlite3.Connection, pan: str, typ: Optional[str]) -> List
     return [row_to_dict(r) for r in cur.fetchall()]
 
 def fetch_by_upi(conn: sqlite3.Connection, upi: str, typ: Optional[str]) -> List[Dict[str, Any]]:
+    if has_summary(conn):
+        return fetch_summary(conn, "upi_key", upi, typ)
     upi = upi.strip().lower()
     q = """
         SELECT u.id, u.full_name, u.username, u.email, u.phone,
@@ -92,6 +245,8 @@ def fetch_by_upi(conn: sqlite3.Connection, upi: str, typ: Optional[str]) -> List
     return [row_to_dict(r) for r in cur.fetchall()]
 
 def fetch_by_name_exact(conn: sqlite3.Connection, name: str, typ: Optional[str]) -> List[Dict[str, Any]]:
+    if has_summary(conn):
+        return fetch_summary(conn, "name_key", name, typ)
     name = name.strip()
     q = """
         SELECT u.id, u.full_name, u.username, u.email, u.phone,
@@ -111,19 +266,15 @@ def fetch_by_name_exact(conn: sqlite3.Connection, name: str, typ: Optional[str])
     return [row_to_dict(r) for r in cur.fetchall()]
 
 def fetch_by_name_fuzzy(conn: sqlite3.Connection, name: str, typ: Optional[str]) -> List[Dict[str, Any]]:
-    # Get a candidate list of names (optionally filtered by type)
-    name = name.strip()
-    base_q = "SELECT id, full_name FROM users" + (" WHERE intermediary_type = ?" if typ else "")
-    cur = conn.execute(base_q, (typ,)) if typ else conn.execute(base_q)
-    rows = cur.fetchall()
-    names = [r["full_name"] for r in rows]
-
-    # Fuzzy match to top 8 names
-    best = get_close_matches(name, names, n=8, cutoff=0.6)
-    if not best:
+    # Ranked candidates from the in-memory index (type filter applied there)
+    ensure_name_index()
+    hits = NAME_INDEX.search(name, typ=typ, limit=FUZZY_LIMIT, min_score=FUZZY_MIN_SCORE)
+    if not hits:
         return []
+    scores = dict(hits)
 
-    q = """
+    # Fixed placeholder count (unused slots are NULL) keeps one cached statement
+    q = SUMMARY_BY_IDS_SQL if has_summary(conn) else """
         SELECT u.id, u.full_name, u.username, u.email, u.phone,
                u.intermediary_type, u.sebi_reg_no, u.pan_id, u.account_status,
                COALESCE(SUM(CASE WHEN m.id IS NOT NULL THEN 1 ELSE 0 END),0) AS mal_count,
@@ -132,21 +283,16 @@ def fetch_by_name_fuzzy(conn: sqlite3.Connection, name: str, typ: Optional[str])
         FROM users u
         LEFT JOIN malicious_activities m ON m.user_id = u.id
         LEFT JOIN upi_accounts upi ON upi.user_id = u.id
-        WHERE u.full_name IN ({placeholders})
-        {typ_filter}
+        WHERE u.id IN ({placeholders})
         GROUP BY u.id
-        LIMIT 20
-    """.format(
-        placeholders=",".join(["?"] * len(best)),
-        typ_filter="AND u.intermediary_type = ?" if typ else "",
-    )
-
-    params: List[Any] = list(best)
-    if typ:
-        params.append(typ)
+    """.format(placeholders=",".join(["?"] * FUZZY_LIMIT))
 
-    cur2 = conn.execute(q, params)
-    return [row_to_dict(r) for r in cur2.fetchall()]
+    params: List[Any] = list(scores) + [None] * (FUZZY_LIMIT - len(scores))
+    rows = [row_to_dict(r) for r in conn.execute(q, params).fetchall()]
+    for r in rows:
+        r["match_score"] = round(scores[r["id"]], 3)
+    rows.sort(key=lambda r: -r["match_score"])
+    return rows
 
 # -------------- Risk summarizer --------------
 
@@ -183,55 +329,339 @@ def summarize_risk(row: Dict[str, Any]) -> Dict[str, Any]:
 
 # -------------- API Routes --------------
 
+@app.on_event("startup")
+def _warm_name_index():
+    # Build the fuzzy index up front so the first fuzzy query does not pay for it
+    try:
+        ensure_name_index()
+    except Exception as e:
+        log.warning("name index not built at startup: %s", e)
+
+@app.on_event("startup")
+def _build_key_filters():
+    # Built off the startup path; verify answers from SQLite until the filters land
+    # (progress and failures show up under key_filters in /healthz)
+    if KEY_FILTER_FP_RATE > 0:
+        KEY_FILTERS.start(POOL.data_stamp, load_filter_keys)
+
+@app.on_event("startup")
+def _load_snapshot():
+    if SNAPSHOT is not None:
+        SNAPSHOT.usable(POOL.data_stamp())
+        log.info("snapshot %s: %s", SNAPSHOT.path, SNAPSHOT.state)
+
+@app.on_event("shutdown")
+def _close_pool():
+    POOL.close()
+
 @app.get("/healthz")
 def health():
     try:
-        conn = get_conn()
-        conn.execute("SELECT 1")
-        conn.close()
-        return {"status": "ok", "db": DB_PATH}
+        with POOL.connection() as conn:
+            conn.execute("SELECT 1")
+        snapshot_ready(POOL.data_stamp())  # refreshes the snapshot's state
+        return {
+            "status": "ok",
+            "db": DB_PATH,
+            "data_version": list(POOL.data_stamp()),
+            "pool": POOL.stats(),
+            "name_index": NAME_INDEX.stats(),
+            "verify_cache": VERIFY_CACHE.stats(),
+            "key_filters": KEY_FILTERS.stats() if KEY_FILTER_FP_RATE > 0 else None,
+            "snapshot": SNAPSHOT.stats() if SNAPSHOT is not None else None,
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/registry/v1/verify")
 def verify(
+    request: Request,
     reg_no: Optional[str] = Query(None, description="SEBI reg no e.g., INA00012345 / INH / INP / INZ"),
     pan: Optional[str] = Query(None, min_length=10, max_length=10, description="PAN-like ID"),
     upi: Optional[str] = Query(None, description="UPI ID e.g., lastname@ybl"),
     name: Optional[str] = Query(None, min_length=2, description="Full name"),
-    type: Optional[str] = Query(None, regex="^(IA|RA|PMS|BROKER|NONE)$"),
+    type: Optional[str] = Query(None, regex=INTERMEDIARY_TYPE_PATTERN),
     fuzzy: int = Query(0, ge=0, le=1, description="Set to 1 for fuzzy name match"),
 ):
     """
     Verify existence/validity of registry IDs against the generated SQLite DB.
     Provide **one** of: reg_no | pan | upi | name
     Optional filter: type in {IA,RA,PMS,BROKER,NONE}
+    Responses carry an ETag; send it back as If-None-Match to get a 304 while the data is unchanged.
     """
     if not any([reg_no, pan, upi, name]):
         raise HTTPException(status_code=400, detail="Provide one of: reg_no | pan | upi | name")
 
     try:
-        conn = get_conn()
-        if reg_no:
-            rows = fetch_by_reg_no(conn, reg_no, type)
-        elif pan:
-            rows = fetch_by_pan(conn, pan, type)
-        elif upi:
-            rows = fetch_by_upi(conn, upi, type)
+        version = POOL.data_stamp()
+        key = verify_cache_key(reg_no, pan, upi, name, type, fuzzy)
+        col = FILTER_KEY_COLS.get(key[0])
+        if col and key_absent(col, key[1], version):
+            entry = EMPTY_VERIFY
         else:
-            rows = fetch_by_name_fuzzy(conn, name, type) if fuzzy else fetch_by_name_exact(conn, name, type)
-        conn.close()
+            entry = VERIFY_CACHE.get(key, version)
+        if entry is None and col and snapshot_ready(version):
+            rows = SNAPSHOT.lookup(col, key[1], type)
+            for r in rows:
+                r["risk"] = summarize_risk(r)
+            entry = make_entry(rows)
+            VERIFY_CACHE.put(key, version, entry)
+        if entry is None:
+            with POOL.connection() as conn:
+                if reg_no:
+                    rows = fetch_by_reg_no(conn, reg_no, type)
+                elif pan:
+                    rows = fetch_by_pan(conn, pan, type)
+                elif upi:
+                    rows = fetch_by_upi(conn, upi, type)
+                else:
+                    rows = fetch_by_name_fuzzy(conn, name, type) if fuzzy else fetch_by_name_exact(conn, name, type)
+
+            # Attach compact risk summary per row
+            for r in rows:
+                r["risk"] = summarize_risk(r)
+            entry = make_entry(rows)
+            # Fuzzy hits from an index still catching up must not outlive the refresh
+            if not (key[0] == "name~" and NAME_INDEX.stamp != version):
+                VERIFY_CACHE.put(key, version, entry)
     except FileNotFoundError as fe:
         raise HTTPException(status_code=500, detail=str(fe))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    # Attach compact risk summary per row
-    for r in rows:
-        r["risk"] = summarize_risk(r)
+    query = {"reg_no": reg_no, "pan": pan, "upi": upi, "name": name, "type": type, "fuzzy": bool(fuzzy)}
+    etag = entry.etag(query)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={VERIFY_MAX_AGE}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body(query), media_type="application/json", headers=headers)
+
+# -------------- Bulk verify --------------
+
+BULK_KEY_COLS = {"reg_no": "reg_key", "pan": "pan_key", "upi": "upi_key", "name": "name_key"}
+BULK_SQL = {col: risk_summary.bulk_sql(col, risk_summary.BULK_SLOTS) for col in risk_summary.KEY_INDEXES}
+
+class BulkVerifyItem(BaseModel):
+    kind: Literal["reg_no", "pan", "upi", "name"]
+    value: str = Field(..., min_length=1, max_length=256)
+    type: Optional[str] = Field(None, pattern=INTERMEDIARY_TYPE_PATTERN)
+    fuzzy: bool = False  # names only
+
+class BulkVerifyRequest(BaseModel):
+    items: List[BulkVerifyItem] = Field(..., min_length=1)
+
+def _bulk_lookup(conn: sqlite3.Connection, col: str, keys: Dict[str, str]) -> Tuple[Dict[str, List[Dict[str, Any]]], int]:
+    """All summary rows for many keys of one kind, in fixed-size IN batches."""
+    found: Dict[str, List[Dict[str, Any]]] = {k: [] for k in keys}
+    ordered = sorted(keys)
+    slots = risk_summary.BULK_SLOTS
+    batches = 0
+    for i in range(0, len(ordered), slots):
+        chunk: List[Any] = ordered[i:i + slots]
+        for r in conn.execute(BULK_SQL[col], chunk + [None] * (slots - len(chunk))):
+            d = row_to_dict(r)
+            found[d.pop("lookup_key")].append(d)
+        batches += 1
+    return found, batches
+
+def _legacy_lookup(conn: sqlite3.Connection, col: str, keys: Dict[str, str]) -> Tuple[Dict[str, List[Dict[str, Any]]], int]:
+    # One query per key; the join queries normalize the raw value themselves
+    fetch = {
+        "reg_key": fetch_by_reg_no,
+        "pan_key": fetch_by_pan,
+        "upi_key": fetch_by_upi,
+        "name_key": fetch_by_name_exact,
+    }[col]
+    return {k: fetch(conn, raw, None) for k, raw in keys.items()}, len(keys)
+
+def drop_absent_keys(wanted: Dict[str, Dict[str, str]], version: Tuple[int, int]) -> int:
+    """Remove keys the filters rule out from wanted (col -> {key: raw}); returns how many."""
+    dropped = 0
+    for col in FILTER_KEY_COLS.values():
+        absent = [k for k in wanted.get(col, ()) if key_absent(col, k, version)]
+        for k in absent:
+            del wanted[col][k]
+        dropped += len(absent)
+    return dropped
+
+def lookup_exact_keys(
+    conn: sqlite3.Connection, wanted: Dict[str, Dict[str, str]]
+) -> Tuple[Dict[str, Dict[str, List[Dict[str, Any]]]], int]:
+    """Rows for every wanted key, per column, on one connection; also returns the query count."""
+    lookup = _bulk_lookup if has_summary(conn) else _legacy_lookup
+    found: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    queries = 0
+    for col, keys in wanted.items():
+        if keys:
+            found[col], n = lookup(conn, col, keys)
+            queries += n
+    return found, queries
+
+@app.post("/api/registry/v1/verify-bulk")
+def verify_bulk(req: BulkVerifyRequest):
+    """
+    Verify many identifiers at once. Each item is {kind: reg_no|pan|upi|name, value,
+    type?, fuzzy?}; results come back in input order with a risk summary per match.
+    """
+    items = req.items
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per request")
+    t0 = time.perf_counter()
+
+    # One DB key per distinct normalized value (-> first raw value); type filters are applied afterwards
+    wanted: Dict[str, Dict[str, str]] = {col: {} for col in risk_summary.KEY_INDEXES}
+    fuzzy_names: Set[Tuple[str, Optional[str]]] = set()
+    for it in items:
+        if it.kind == "name" and it.fuzzy:
+            fuzzy_names.add((it.value.strip(), it.type))
+        else:
+            col = BULK_KEY_COLS[it.kind]
+            wanted[col].setdefault(risk_summary.normalize_key(col, it.value), it.value)
+
+    queries = filtered = from_snapshot = 0
+    found: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    fuzzy_rows: Dict[Tuple[str, Optional[str]], List[Dict[str, Any]]] = {}
+    try:
+        # Keys the filters rule out never reach the DB; the snapshot answers what it can
+        version = POOL.data_stamp()
+        filtered = drop_absent_keys(wanted, version)
+        t1 = time.perf_counter()
+        found = take_snapshot_keys(wanted, version)
+        from_snapshot = sum(len(v) for v in found.values())
+        t2 = t3 = time.perf_counter()
+        if any(wanted.values()) or fuzzy_names:
+            with POOL.connection() as conn:
+                db_found, queries = lookup_exact_keys(conn, wanted)
+                found.update(db_found)
+                t2 = time.perf_counter()
+                for nm, typ in fuzzy_names:
+                    fuzzy_rows[(nm, typ)] = fetch_by_name_fuzzy(conn, nm, typ)
+                    queries += 1
+                t3 = time.perf_counter()
+    except FileNotFoundError as fe:
+        raise HTTPException(status_code=500, detail=str(fe))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    results: List[Dict[str, Any]] = []
+    for i, it in enumerate(items):
+        if it.kind == "name" and it.fuzzy:
+            rows = fuzzy_rows[(it.value.strip(), it.type)]
+        else:
+            col = BULK_KEY_COLS[it.kind]
+            rows = found.get(col, {}).get(risk_summary.normalize_key(col, it.value), [])
+            if it.type:
+                rows = [r for r in rows if r.get("intermediary_type") == it.type]
+            rows = rows[:risk_summary.LOOKUP_LIMIT]
+        for r in rows:
+            if "risk" not in r:
+                r["risk"] = summarize_risk(r)
+        results.append({
+            "index": i,
+            "kind": it.kind,
+            "value": it.value,
+            "type": it.type,
+            "fuzzy": bool(it.fuzzy and it.kind == "name"),
+            "count": len(rows),
+            "matches": rows,
+        })
+    t4 = time.perf_counter()
+
+    return {
+        "count": len(results),
+        "results": results,
+        "distinct_keys": sum(len(v) for v in wanted.values()) + filtered + from_snapshot + len(fuzzy_names),
+        "queries": queries,
+        "filtered_keys": filtered,
+        "snapshot_keys": from_snapshot,
+        "timings": {
+            "normalize_ms": round((t1 - t0) * 1000.0, 3),
+            "db_ms": round((t2 - t1) * 1000.0, 3),
+            "fuzzy_ms": round((t3 - t2) * 1000.0, 3),
+            "assemble_ms": round((t4 - t3) * 1000.0, 3),
+            "total_ms": round((t4 - t0) * 1000.0, 3),
+        },
+    }
+
+# -------------- Text scan --------------
+
+class ScanTextRequest(BaseModel):
+    text: str = Field(..., max_length=SCAN_MAX_CHARS)
+    type: Optional[str] = Field(None, pattern=INTERMEDIARY_TYPE_PATTERN)
+
+def verdict(rows: List[Dict[str, Any]]) -> str:
+    if not rows:
+        return "NOT FOUND"
+    return max((r["risk"] for r in rows), key=lambda k: k["score"])["level"]
+
+@app.post("/api/registry/v1/scan-text")
+def scan_text(req: ScanTextRequest):
+    """
+    Find every SEBI reg no, PAN and UPI handle in raw page text and verify them in one
+    batched lookup. hits carry char offsets into text and point (ref) at their entry in
+    identifiers, which holds the matches and a verdict: NOT FOUND or the worst risk level.
+    """
+    t0 = time.perf_counter()
+    hits = list(text_scan.scan(req.text))
+    groups = text_scan.group_hits(hits)
+    wanted: Dict[str, Dict[str, str]] = {col: {} for col in FILTER_KEY_COLS.values()}
+    for kind, key in groups:
+        wanted[FILTER_KEY_COLS[kind]][key] = key
+    t1 = time.perf_counter()
+
+    queries = filtered = from_snapshot = 0
+    found: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    try:
+        version = POOL.data_stamp()
+        filtered = drop_absent_keys(wanted, version)
+        found = take_snapshot_keys(wanted, version)
+        from_snapshot = sum(len(v) for v in found.values())
+        if any(wanted.values()):
+            with POOL.connection() as conn:
+                db_found, queries = lookup_exact_keys(conn, wanted)
+                found.update(db_found)
+    except FileNotFoundError as fe:
+        raise HTTPException(status_code=500, detail=str(fe))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    t2 = time.perf_counter()
+
+    identifiers: List[Dict[str, Any]] = []
+    refs: Dict[Tuple[str, str], int] = {}
+    for (kind, key), occurrences in groups.items():
+        rows = found.get(FILTER_KEY_COLS[kind], {}).get(key, [])
+        if req.type:
+            rows = [r for r in rows if r.get("intermediary_type") == req.type]
+        rows = rows[:risk_summary.LOOKUP_LIMIT]
+        for r in rows:
+            r["risk"] = summarize_risk(r)
+        refs[(kind, key)] = len(identifiers)
+        identifiers.append({
+            "kind": kind,
+            "key": key,
+            "occurrences": len(occurrences),
+            "verdict": verdict(rows),
+            "count": len(rows),
+            "matches": rows,
+        })
+    out_hits = [
+        {"kind": h.kind, "value": h.value, "start": h.start, "end": h.end, "ref": refs[(h.kind, h.key)]}
+        for h in hits
+    ]
+    t3 = time.perf_counter()
 
     return {
-        "query": {"reg_no": reg_no, "pan": pan, "upi": upi, "name": name, "type": type, "fuzzy": bool(fuzzy)},
-        "count": len(rows),
-        "matches": rows,
+        "chars": len(req.text),
+        "count": len(out_hits),
+        "hits": out_hits,
+        "identifiers": identifiers,
+        "queries": queries,
+        "filtered_keys": filtered,
+        "snapshot_keys": from_snapshot,
+        "timings": {
+            "scan_ms": round((t1 - t0) * 1000.0, 3),
+            "db_ms": round((t2 - t1) * 1000.0, 3),
+            "assemble_ms": round((t3 - t2) * 1000.0, 3),
+            "total_ms": round((t3 - t0) * 1000.0, 3),
+        },
     }
@@ -0,0 +1,309 @@
+# name_index.py
+# In-memory fuzzy name index for the registry service
+# - Names are normalized (accents, honorifics, punctuation, token order) and reduced
+#   to a phonetic key for romanized Indian names (aa/a, ee/i, bh/b, sh/s, w/v, ...)
+# - Inverted index: trigram of the phonetic key -> user ids
+# - Queries count trigram overlaps from the posting lists (exact phonetic Dice without
+#   touching the names), drop candidates below the overlap/length bounds, then verify
+#   the rest in upper-bound order and stop once no remaining one can enter the top-k
+# - Prefix filtering: a name needing `need` of the query's |Q| trigrams must contain one
+#   of its |Q|-need+1 rarest, so only those posting lists are scanned; the most common
+#   trigrams (" ku", "kum", "ar ", postings near N) are checked per candidate instead
+# - sync() diffs (id, full_name, intermediary_type) rows against the indexed ones and
+#   re-indexes only the rows that were added, changed or deleted. The O(N) diff and the
+#   rebuilt posting lists are prepared off the query lock; queries only wait for the
+#   changed entries to be swapped in
+# - ensure() runs the first build inline and later ones on a background thread, so
+#   requests keep searching the previous index while the new rows are read
+# ------------------------------------------------------------
+
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple
+
+HONORIFICS = frozenset({"mr", "mrs", "ms", "miss", "dr", "prof", "shri", "sri", "shree", "smt", "kumari", "km"})
+
+# Applied in order to each token; digraphs first so "sh" is not split by later rules
+_PHONETIC_RULES = [
+    ("aa", "a"), ("ee", "i"), ("ii", "i"), ("oo", "u"), ("uu", "u"), ("ou", "u"),
+    ("ph", "f"), ("bh", "b"), ("kh", "k"), ("gh", "g"), ("th", "t"), ("dh", "d"),
+    ("jh", "j"), ("sh", "s"), ("ch", "c"), ("ck", "k"),
+    ("w", "v"), ("z", "j"), ("q", "k"), ("x", "ks"), ("y", "i"),
+]
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_REPEAT_RE = re.compile(r"(.)\1+")
+
+# Final score = PHONETIC_WEIGHT * dice(phonetic) + (1 - PHONETIC_WEIGHT) * dice(normalized)
+PHONETIC_WEIGHT = 0.75
+# Rarest query trigrams scanned to seed the top-k before the prefix is sized
+SEED_PROBES = 2
+
+
+def normalize_name(name: str) -> str:
+    """Lower-case ASCII tokens without honorifics, sorted so word order does not matter."""
+    s = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii").lower()
+    tokens = [t for t in _NON_ALNUM_RE.split(s) if t and t not in HONORIFICS]
+    return " ".join(sorted(tokens))
+
+
+def _phonetic_token(tok: str) -> str:
+    for a, b in _PHONETIC_RULES:
+        tok = tok.replace(a, b)
+    tok = _REPEAT_RE.sub(r"\1", tok)
+    if len(tok) > 3 and tok.endswith("a"):  # Rama/Ram, Krishna/Krishn
+        tok = tok[:-1]
+    return tok
+
+
+def phonetic_key(normalized: str) -> str:
+    return " ".join(sorted(_phonetic_token(t) for t in normalized.split()))
+
+
+def trigrams(key: str) -> FrozenSet[str]:
+    """Trigrams of each space-padded token (token order does not change the set)."""
+    grams: Set[str] = set()
+    for tok in key.split():
+        padded = f" {tok} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def _dice(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+class NameIndex:
+    def __init__(self, max_candidates: int = 20000):
+        self.max_candidates = max(1, max_candidates)
+        self.stamp: Optional[Hashable] = None
+        self.syncs = 0
+        self.last_sync: Dict[str, int] = {}
+        self.refresh_errors = 0
+        self._lock = threading.RLock()  # queries and the swap
+        self._sync_lock = threading.Lock()  # one sync at a time; only syncs mutate the index
+        self._refresher: Optional[threading.Thread] = None
+        # user id -> (full_name, intermediary_type, normalized, phonetic, phonetic trigram count)
+        self._docs: Dict[int, Tuple[str, Optional[str], str, str, int]] = {}
+        self._postings: Dict[str, array] = {}
+
+    # ---------------- maintenance ----------------
+    def ensure(
+        self,
+        stamp: Hashable,
+        load_rows: Callable[[], Iterable[Tuple[int, str, Optional[str]]]],
+        wait: bool = False,
+    ) -> bool:
+        """
+        Sync from load_rows() when the data stamp moved; True if this call ran the sync.
+        Only the first build (or wait=True) runs inline; otherwise the sync runs on a
+        background thread, load_rows() included, and this call returns at once.
+        """
+        if stamp == self.stamp:
+            return False
+        if self.stamp is None or wait:
+            with self._sync_lock:
+                if stamp == self.stamp:
+                    return False
+                self._sync(load_rows())
+                self.stamp = stamp
+                return True
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return False  # the running refresh is followed by another if the stamp moved again
+            self._refresher = threading.Thread(
+                target=self._refresh, args=(stamp, load_rows), name="name-index-refresh", daemon=True
+            )
+            self._refresher.start()
+        return False
+
+    def _refresh(self, stamp: Hashable, load_rows: Callable[[], Iterable[Tuple[int, str, Optional[str]]]]) -> None:
+        try:
+            with self._sync_lock:
+                if stamp != self.stamp:
+                    self._sync(load_rows())
+                    self.stamp = stamp
+        except Exception:
+            self.refresh_errors += 1  # keep serving the current index; the next request retries
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until a background refresh (if any) has finished."""
+        t = self._refresher
+        if t is not None:
+            t.join(timeout)
+
+    def sync(self, rows: Iterable[Tuple[int, str, Optional[str]]]) -> Dict[str, int]:
+        with self._sync_lock:
+            return self._sync(rows)
+
+    def _sync(self, rows: Iterable[Tuple[int, str, Optional[str]]]) -> Dict[str, int]:
+        # Caller holds _sync_lock, so _docs/_postings only change in the swap below and
+        # can be read here without blocking queries
+        docs = self._docs
+        seen: Set[int] = set()
+        upserts: Dict[int, Tuple[str, Optional[str], str, str, int]] = {}
+        new_grams: Dict[int, FrozenSet[str]] = {}
+        for uid, name, typ in rows:
+            seen.add(uid)
+            old = docs.get(uid)
+            if old is None or old[0] != name or old[1] != typ:
+                name = name or ""
+                norm = normalize_name(name)
+                phon = phonetic_key(norm)
+                grams = new_grams[uid] = trigrams(phon)
+                upserts[uid] = (name, typ, norm, phon, len(grams))
+        removed = [uid for uid in docs if uid not in seen]
+        changed = [uid for uid in upserts if uid in docs]
+
+        # New posting list for every touched trigram: stale ids dropped, new ids appended
+        doomed: Dict[str, Set[int]] = {}
+        for uid in removed + changed:
+            for g in trigrams(docs[uid][3]):
+                doomed.setdefault(g, set()).add(uid)
+        postings: Dict[str, array] = {}
+        for g, ids in doomed.items():
+            postings[g] = array("q", (i for i in self._postings.get(g, ()) if i not in ids))
+        for uid, grams in new_grams.items():
+            for g in grams:
+                post = postings.get(g)
+                if post is None:
+                    post = postings[g] = array("q", self._postings.get(g, ()))
+                post.append(uid)
+
+        with self._lock:
+            for g, post in postings.items():
+                if post:
+                    self._postings[g] = post
+                else:
+                    self._postings.pop(g, None)
+            for uid in removed:
+                del docs[uid]
+            docs.update(upserts)
+            self.syncs += 1
+            self.last_sync = {
+                "added": len(upserts) - len(changed),
+                "changed": len(changed),
+                "removed": len(removed),
+            }
+            return self.last_sync
+
+    # ---------------- queries ----------------
+    def search(
+        self,
+        query: str,
+        typ: Optional[str] = None,
+        limit: int = 20,
+        min_score: float = 0.5,
+    ) -> List[Tuple[int, float]]:
+        """Best (user id, score) pairs, highest score first."""
+        norm = normalize_name(query)
+        phon = phonetic_key(norm)
+        q_phon, q_norm = trigrams(phon), trigrams(norm)
+        if not q_phon:
+            return []
+        # score >= min_score needs dice(phonetic) >= floor; Dice >= t in turn needs an
+        # overlap of at least t*|Q|/(2-t) trigrams
+        norm_weight = 1.0 - PHONETIC_WEIGHT
+        floor = max(0.0, (min_score - norm_weight) / PHONETIC_WEIGHT)
+        qn = len(q_phon)
+        need = max(1, math.ceil(floor * qn / (2.0 - floor) - 1e-9))
+
+        with self._lock:
+            docs = self._docs
+            by_rarity = sorted(q_phon, key=lambda g: len(self._postings.get(g, ())))
+            counts: Counter = Counter()  # overlaps with the probed (rarest) trigrams only
+            probed = 0
+            skipped: FrozenSet[str] = frozenset(by_rarity)
+            best: List[Tuple[float, int]] = []  # min-heap of the current top `limit`
+            seeded: Set[int] = set()
+
+            def probe(upto: int) -> None:
+                nonlocal probed, skipped
+                for g in by_rarity[probed:upto]:
+                    post = self._postings.get(g)
+                    if post is not None:
+                        counts.update(post)
+                probed = max(probed, upto)
+                skipped = frozenset(by_rarity[probed:])
+
+            def overlap(uid: int, c: int) -> int:
+                # Exact: the probed count plus whichever skipped trigrams the name has
+                return c + len(skipped & trigrams(docs[uid][3])) if skipped else c
+
+            def consider(uid: int, dp: float) -> None:
+                _name, d_typ, d_norm, _phon, _n = docs[uid]
+                if typ and d_typ != typ:
+                    return
+                score = PHONETIC_WEIGHT * dp + norm_weight * _dice(q_norm, trigrams(d_norm))
+                if score < min_score:
+                    return
+                if len(best) < limit:
+                    heapq.heappush(best, (score, -uid))
+                elif (score, -uid) > best[0]:
+                    heapq.heapreplace(best, (score, -uid))
+
+            def seed() -> None:
+                # Verify the largest overlaps so far, then raise the bounds to the k-th score
+                nonlocal floor, need
+                for uid, c in counts.most_common(limit * 4 + len(seeded)):
+                    if uid not in seeded:
+                        seeded.add(uid)
+                        dp = 2.0 * overlap(uid, c) / (qn + docs[uid][4])
+                        if dp >= floor:
+                            consider(uid, dp)
+                if len(best) >= limit:
+                    floor = max(floor, (best[0][0] - norm_weight) / PHONETIC_WEIGHT)
+                    need = max(need, math.ceil(floor * qn / (2.0 - floor) - 1e-9))
+
+            # Seed from the rarest lists alone first: when they already hold strong matches
+            # the k-th score shrinks the prefix before the common lists are scanned. Then
+            # only verify candidates that could still beat the k-th score; until verified,
+            # a candidate is assumed to have every skipped trigram (normalized Dice <= 1)
+            probe(min(qn - need + 1, SEED_PROBES))
+            seed()
+            if qn - need + 1 > probed:
+                probe(qn - need + 1)
+                seed()
+
+            extra = len(skipped)
+            bounds: List[Tuple[float, int, int]] = []  # (bound, -uid, c): ties in id order
+            for uid, c in counts.items():
+                if c + extra < need or uid in seeded:
+                    continue
+                dp_max = 2.0 * (c + extra) / (qn + docs[uid][4])
+                if dp_max >= floor:
+                    bounds.append((PHONETIC_WEIGHT * dp_max + norm_weight, -uid, c))
+            if len(bounds) > self.max_candidates:
+                bounds = heapq.nlargest(self.max_candidates, bounds)
+            else:
+                bounds.sort(reverse=True)
+            for bound, neg_uid, c in bounds:
+                if len(best) >= limit and (bound, neg_uid) < best[0]:
+                    break  # neither this one nor any later one can displace the k-th
+                uid = -neg_uid
+                dp = 2.0 * overlap(uid, c) / (qn + docs[uid][4])
+                if dp >= floor:
+                    consider(uid, dp)
+            scored = [(-neg_uid, score) for score, neg_uid in best]
+
+        scored.sort(key=lambda x: (-x[1], x[0]))
+        return scored[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "names": len(self._docs),
+                "trigrams": len(self._postings),
+                "postings": sum(len(p) for p in self._postings.values()),
+                "syncs": self.syncs,
+                "last_sync": self.last_sync,
+                "refreshing": self._refresher is not None and self._refresher.is_alive(),
+                "refresh_errors": self.refresh_errors,
+                "max_candidates": self.max_candidates,
+            }
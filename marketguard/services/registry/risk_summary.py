@@ -0,0 +1,252 @@
+# risk_summary.py
+# Pre-aggregated lookup table for the registry service
+# - user_risk_summary: one row per (user, UPI account) with mal_count / unresolved
+#   already counted and normalized key columns (reg_key, pan_key, upi_key, name_key)
+# - Partial (key, intermediary_type) indexes make every verify a single indexed read
+# - Triggers keep it current: user/UPI changes re-derive that user's rows, malicious
+#   activity changes adjust the counters in place
+# - check_plans() runs EXPLAIN QUERY PLAN over the lookup shapes and reports any
+#   that stopped using their index
+#
+# Usage (writes to the DB; the service itself only reads it):
+#   python risk_summary.py --db sebi_dummy.db          # create/rebuild + triggers
+#   python risk_summary.py --db sebi_dummy.db --check  # plan regression check only
+# ------------------------------------------------------------
+
+import argparse
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+TABLE = "user_risk_summary"
+LOOKUP_LIMIT = 20
+BULK_SLOTS = 64  # keys per bulk IN (...) query; short batches are padded with NULL
+
+# Lookup key column -> the index that must serve it
+KEY_INDEXES = {
+    "reg_key": "idx_urs_reg",
+    "pan_key": "idx_urs_pan",
+    "upi_key": "idx_urs_upi",
+    "name_key": "idx_urs_name",
+}
+
+_COLUMNS = (
+    "user_id, full_name, username, email, phone, intermediary_type, sebi_reg_no, pan_id, account_status, "
+    "mal_count, unresolved, upi_id, verification_status, reg_key, pan_key, upi_key, name_key"
+)
+
+# Same normalization the service applies to query values (see normalize_key). Names
+# are stored as-is: exact name match stays case- and space-sensitive on the stored
+# side, like the users.full_name = ? lookup it replaces (fuzzy=1 is the lenient one)
+_KEY_EXPRS = (
+    "upper(trim(u.sebi_reg_no)), upper(trim(u.pan_id)), lower(trim(upi.upi_id)), u.full_name"
+)
+
+_USER_FIELDS = (
+    "u.id, u.full_name, u.username, u.email, u.phone, u.intermediary_type, u.sebi_reg_no, u.pan_id, u.account_status"
+)
+
+# Rows for a set of users (used by the triggers; counts via idx_mal_user)
+_REFRESH_SELECT = f"""
+    SELECT {_USER_FIELDS},
+           (SELECT COUNT(*) FROM malicious_activities m WHERE m.user_id = u.id),
+           (SELECT COUNT(*) FROM malicious_activities m WHERE m.user_id = u.id AND m.resolved = 0),
+           upi.upi_id, upi.verification_status,
+           {_KEY_EXPRS}
+    FROM users u
+    LEFT JOIN upi_accounts upi ON upi.user_id = u.id
+"""
+
+# Whole-table backfill: one aggregate pass instead of per-user subqueries
+_BACKFILL = f"""
+    INSERT INTO {TABLE} ({_COLUMNS})
+    SELECT {_USER_FIELDS},
+           COALESCE(agg.mal_count, 0), COALESCE(agg.unresolved, 0),
+           upi.upi_id, upi.verification_status,
+           {_KEY_EXPRS}
+    FROM users u
+    LEFT JOIN upi_accounts upi ON upi.user_id = u.id
+    LEFT JOIN (
+        SELECT user_id, COUNT(*) AS mal_count, SUM(CASE WHEN resolved = 0 THEN 1 ELSE 0 END) AS unresolved
+        FROM malicious_activities GROUP BY user_id
+    ) agg ON agg.user_id = u.id
+"""
+
+_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        full_name TEXT NOT NULL,
+        username TEXT,
+        email TEXT,
+        phone TEXT,
+        intermediary_type TEXT,
+        sebi_reg_no TEXT,
+        pan_id TEXT,
+        account_status TEXT,
+        mal_count INTEGER NOT NULL DEFAULT 0,
+        unresolved INTEGER NOT NULL DEFAULT 0,
+        upi_id TEXT,
+        verification_status TEXT,
+        reg_key TEXT,
+        pan_key TEXT,
+        upi_key TEXT,
+        name_key TEXT
+    )
+    """,
+    f"CREATE INDEX IF NOT EXISTS idx_urs_user ON {TABLE}(user_id)",
+] + [
+    f"CREATE INDEX IF NOT EXISTS {idx} ON {TABLE}({col}, intermediary_type) WHERE {col} IS NOT NULL"
+    for col, idx in KEY_INDEXES.items()
+]
+
+
+def _refresh(ids: str) -> str:
+    return (
+        f"DELETE FROM {TABLE} WHERE user_id IN ({ids});\n"
+        f"INSERT INTO {TABLE} ({_COLUMNS}) {_REFRESH_SELECT} WHERE u.id IN ({ids});"
+    )
+
+
+def _mal_delta(sign: str, row: str) -> str:
+    return (
+        f"UPDATE {TABLE} SET mal_count = mal_count {sign} 1, "
+        f"unresolved = unresolved {sign} (CASE WHEN {row}.resolved = 0 THEN 1 ELSE 0 END) "
+        f"WHERE user_id = {row}.user_id;"
+    )
+
+
+_TRIGGERS: Dict[str, str] = {
+    "trg_urs_users_ins": f"AFTER INSERT ON users BEGIN {_refresh('NEW.id')} END",
+    "trg_urs_users_upd": (
+        "AFTER UPDATE OF id, full_name, username, email, phone, intermediary_type, sebi_reg_no, pan_id, "
+        f"account_status ON users BEGIN {_refresh('OLD.id, NEW.id')} END"
+    ),
+    "trg_urs_users_del": f"AFTER DELETE ON users BEGIN DELETE FROM {TABLE} WHERE user_id = OLD.id; END",
+    "trg_urs_upi_ins": f"AFTER INSERT ON upi_accounts BEGIN {_refresh('NEW.user_id')} END",
+    "trg_urs_upi_upd": (
+        "AFTER UPDATE OF user_id, upi_id, verification_status ON upi_accounts "
+        f"BEGIN {_refresh('OLD.user_id, NEW.user_id')} END"
+    ),
+    "trg_urs_upi_del": f"AFTER DELETE ON upi_accounts BEGIN {_refresh('OLD.user_id')} END",
+    "trg_urs_mal_ins": f"AFTER INSERT ON malicious_activities BEGIN {_mal_delta('+', 'NEW')} END",
+    "trg_urs_mal_upd": (
+        f"AFTER UPDATE OF user_id, resolved ON malicious_activities BEGIN "
+        f"{_mal_delta('-', 'OLD')} {_mal_delta('+', 'NEW')} END"
+    ),
+    "trg_urs_mal_del": f"AFTER DELETE ON malicious_activities BEGIN {_mal_delta('-', 'OLD')} END",
+}
+
+
+# -------------- Schema maintenance (writers only) --------------
+
+def install(conn: sqlite3.Connection, rebuild: bool = True) -> int:
+    """Create the table, indexes and triggers; rebuild the contents. Returns the row count."""
+    with conn:
+        for stmt in _DDL:
+            conn.execute(stmt)
+        for name, body in _TRIGGERS.items():
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(f"CREATE TRIGGER {name} {body}")
+        if rebuild:
+            conn.execute(f"DELETE FROM {TABLE}")
+            conn.execute(_BACKFILL)
+    # No ANALYZE: every lookup shape has exactly one usable index, and on small DBs
+    # statistics would tip the planner into scans
+    return int(conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0])
+
+
+def is_installed(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLE,)).fetchone()
+    return row is not None
+
+
+# -------------- Lookups (service side) --------------
+
+SUMMARY_SELECT = (
+    "SELECT user_id AS id, full_name, username, email, phone, intermediary_type, sebi_reg_no, pan_id, "
+    f"account_status, mal_count, unresolved, upi_id, verification_status FROM {TABLE}"
+)
+
+
+def normalize_key(col: str, value: str) -> str:
+    value = value.strip()
+    if col == "name_key":
+        return value
+    return value.upper() if col in ("reg_key", "pan_key") else value.lower()
+
+
+def lookup_sql(col: str, typed: bool) -> str:
+    if col not in KEY_INDEXES:
+        raise ValueError(f"unknown lookup key: {col}")
+    typ_filter = " AND intermediary_type = ?" if typed else ""
+    return f"{SUMMARY_SELECT} WHERE {col} = ?{typ_filter} LIMIT {LOOKUP_LIMIT}"
+
+
+def by_ids_sql(slots: int) -> str:
+    return f"{SUMMARY_SELECT} WHERE user_id IN ({','.join(['?'] * slots)})"
+
+
+def bulk_sql(col: str, slots: int) -> str:
+    """Many keys of one kind at once; lookup_key says which key each row matched."""
+    if col not in KEY_INDEXES:
+        raise ValueError(f"unknown lookup key: {col}")
+    select = SUMMARY_SELECT.replace("SELECT ", f"SELECT {col} AS lookup_key, ", 1)
+    return f"{select} WHERE {col} IN ({','.join(['?'] * slots)})"
+
+
+# -------------- Plan regression check --------------
+
+def _plan(conn: sqlite3.Connection, sql: str, params: Sequence[object]) -> List[str]:
+    return [str(r[3]) for r in conn.execute("EXPLAIN QUERY PLAN " + sql, tuple(params)).fetchall()]
+
+
+def check_plans(
+    conn: sqlite3.Connection, id_slots: int = LOOKUP_LIMIT, bulk_slots: int = BULK_SLOTS
+) -> List[Tuple[str, List[str]]]:
+    """(sql, plan) for every lookup shape that does not search its expected index."""
+    shapes: List[Tuple[str, Sequence[object], str]] = []
+    for col, idx in KEY_INDEXES.items():
+        shapes.append((lookup_sql(col, False), ("x",), idx))
+        shapes.append((lookup_sql(col, True), ("x", "IA"), idx))
+        shapes.append((bulk_sql(col, bulk_slots), ["x"] * bulk_slots, idx))
+    shapes.append((by_ids_sql(id_slots), [0] * id_slots, "idx_urs_user"))
+
+    bad: List[Tuple[str, List[str]]] = []
+    for sql, params, idx in shapes:
+        plan = _plan(conn, sql, params)
+        if any(d.startswith("SCAN") for d in plan) or not any(f"USING INDEX {idx}" in d for d in plan):
+            bad.append((sql, plan))
+    return bad
+
+
+# -------------- CLI --------------
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build/check the registry risk summary table.")
+    parser.add_argument("--db", default="sebi_dummy.db", help="SQLite file")
+    parser.add_argument("--check", action="store_true", help="Only run the query-plan regression check")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA busy_timeout = 5000")
+    try:
+        if not args.check:
+            t0 = time.time()
+            n = install(conn)
+            print(f"{TABLE}: {n} rows in {time.time() - t0:.1f}s")
+        bad = check_plans(conn)
+    finally:
+        conn.close()
+
+    for sql, plan in bad:
+        print(f"PLAN REGRESSION: {sql}\n  " + "\n  ".join(plan))
+    if not bad:
+        print("query plans OK")
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
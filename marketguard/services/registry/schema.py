@@ -0,0 +1,96 @@
+# schema.py
+# Base tables of the registry database
+# - Owned here so every writer builds the same file: scripts/sebi_dummy.py (synthetic
+#   data) and ingest.py (official registry CSVs); risk_summary.py adds its lookup table
+# - Tables and indexes are separate steps, so bulk loaders can index after the load
+# ------------------------------------------------------------
+
+import sqlite3
+from typing import Dict, List
+
+TABLES: Dict[str, str] = {
+    "users": """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            full_name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            phone TEXT,
+            registration_date TEXT NOT NULL,   -- YYYY-MM-DD
+            last_login TEXT,                   -- YYYY-MM-DD
+            account_status TEXT DEFAULT 'active',
+            malicious_activity_history INTEGER DEFAULT 0,
+            -- Enrichment fields:
+            pan_id TEXT,
+            intermediary_type TEXT,            -- IA/RA/PMS/BROKER/NONE
+            sebi_reg_no TEXT                   -- INA/INH/INP/INZ + 8 digits
+        )
+    """,
+    "upi_accounts": """
+        CREATE TABLE IF NOT EXISTS upi_accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            upi_id TEXT UNIQUE NOT NULL,
+            bank_name TEXT NOT NULL,
+            account_number TEXT NOT NULL,
+            ifsc_code TEXT NOT NULL,
+            verification_status TEXT DEFAULT 'pending',
+            created_date TEXT NOT NULL,        -- YYYY-MM-DD
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """,
+    "login_attempts": """
+        CREATE TABLE IF NOT EXISTS login_attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            attempt_time TEXT NOT NULL,        -- YYYY-MM-DD HH:MM:SS
+            success INTEGER NOT NULL,
+            ip_address TEXT
+        )
+    """,
+    "malicious_activities": """
+        CREATE TABLE IF NOT EXISTS malicious_activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            activity_type TEXT NOT NULL,
+            activity_date TEXT NOT NULL,       -- YYYY-MM-DD HH:MM:SS
+            severity TEXT CHECK(severity IN ('low','medium','high')),
+            description TEXT,
+            resolved INTEGER DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """,
+    # Provenance of users loaded from official registry CSVs (ingest.py)
+    "registry_entries": """
+        CREATE TABLE IF NOT EXISTS registry_entries (
+            reg_no TEXT PRIMARY KEY,
+            user_id INTEGER,
+            member TEXT,
+            link TEXT,
+            status TEXT,
+            source TEXT,                       -- CSV file name
+            ingested_at TEXT NOT NULL,         -- YYYY-MM-DD HH:MM:SS
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """,
+}
+
+INDEXES: List[str] = [
+    "CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)",
+    "CREATE INDEX IF NOT EXISTS idx_users_sebi ON users(sebi_reg_no)",
+    "CREATE INDEX IF NOT EXISTS idx_upi_user ON upi_accounts(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_upi_upi_id ON upi_accounts(upi_id)",
+    "CREATE INDEX IF NOT EXISTS idx_mal_user ON malicious_activities(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_login_username ON login_attempts(username)",
+]
+
+
+def create_tables(conn: sqlite3.Connection) -> None:
+    for ddl in TABLES.values():
+        conn.execute(ddl)
+
+
+def create_indexes(conn: sqlite3.Connection) -> None:
+    for ddl in INDEXES:
+        conn.execute(ddl)
@@ -0,0 +1,308 @@
+# snapshot.py
+# Compact read-only binary snapshot of user_risk_summary for exact lookups
+# - One file: a header (with the record field names), a packed record blob (one JSON
+#   array of values per summary row) with a u64 offset table, and one sorted fixed-width
+#   key array per lookup kind (reg_key, pan_key, upi_key), each entry = null-padded key +
+#   u32 record number
+# - The service mmaps it read-only, so worker processes share the pages through the
+#   page cache; a lookup bisects a small in-memory fence list (every FENCE_EVERY-th key),
+#   binary-searches one block of the mapped array, then decodes the matching records
+# - Entries are ordered like the (key, intermediary_type) indexes, so results come
+#   back in the same order as the SQLite lookups
+# - The header records the identity (device, inode, size, mtime) of the DB file it was
+#   built from; the snapshot is only used while that file is unchanged and its WAL is
+#   empty, otherwise lookups go to SQLite
+#
+# Usage (reads the DB; checkpoints its WAL first):
+#   python snapshot.py --db sebi_dummy.db                 # writes sebi_dummy.db.snap
+#   python snapshot.py --db sebi_dummy.db --out /tmp/x.snap
+# ------------------------------------------------------------
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import risk_summary
+
+MAGIC = b"MGSNAP01"
+VERSION = 1
+KEY_COLS = ("reg_key", "pan_key", "upi_key")
+HEADER_SIZE = 1024
+FENCE_EVERY = 128
+
+# magic, version, records, db dev/ino/size/mtime_ns, created, offsets table, blob
+_HEAD = struct.Struct("<8sIIQQQQdQQ")
+# per key kind: key width, entries, array offset
+_INDEX = struct.Struct("<IIQ")
+_U32 = struct.Struct("<I")
+_U64 = struct.Struct("<Q")
+_SPAN = struct.Struct("<QQ")  # two neighbouring record offsets
+_decode = json.JSONDecoder().raw_decode  # skips json.loads' encoding sniffing
+
+FileIdent = Tuple[int, int, int, int]
+
+
+def db_ident(path: str) -> FileIdent:
+    st = os.stat(path)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def wal_empty(path: str) -> bool:
+    try:
+        return os.path.getsize(path + "-wal") == 0
+    except FileNotFoundError:
+        return True
+
+
+# -------------- Build --------------
+
+def build(db_path: str, out_path: str) -> Dict[str, Any]:
+    """Write a snapshot of db_path's user_risk_summary to out_path (atomically)."""
+    if not wal_empty(db_path):
+        raise RuntimeError(f"{db_path} has un-checkpointed WAL frames; checkpoint it first")
+    ident = db_ident(db_path)
+    conn = sqlite3.connect("file:" + quote(os.path.abspath(db_path)) + "?mode=ro", uri=True)
+    tmp = f"{out_path}.tmp-{os.getpid()}"
+    t0 = time.perf_counter()
+    try:
+        if not risk_summary.is_installed(conn):
+            raise RuntimeError(f"{db_path} has no {risk_summary.TABLE}; run risk_summary.py first")
+        conn.execute("BEGIN")  # one read transaction: every section sees the same data
+        n = int(conn.execute(f"SELECT COUNT(*) FROM {risk_summary.TABLE}").fetchone()[0])
+        widths = {
+            col: int(conn.execute(f"SELECT COALESCE(MAX(length(CAST({col} AS BLOB))), 1) FROM {risk_summary.TABLE}").fetchone()[0])
+            for col in KEY_COLS
+        }
+        with open(tmp, "wb") as f:
+            f.write(b"\0" * HEADER_SIZE)
+
+            # Records in summary rowid order; record number = position
+            offsets_at = f.tell()
+            f.write(b"\0" * (_U64.size * (n + 1)))
+            blob_at = f.tell()
+            offsets = bytearray()
+            pos = 0
+            cur = conn.execute(f"{risk_summary.SUMMARY_SELECT} ORDER BY rowid")
+            fields = [d[0] for d in cur.description]
+            encoded_fields = json.dumps(fields).encode("utf-8")
+            while True:
+                rows = cur.fetchmany(10000)
+                if not rows:
+                    break
+                chunk = []
+                for r in rows:
+                    rec = json.dumps(r, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                    offsets += _U64.pack(pos)
+                    pos += len(rec)
+                    chunk.append(rec)
+                f.write(b"".join(chunk))
+            offsets += _U64.pack(pos)
+            if len(offsets) != _U64.size * (n + 1):
+                raise RuntimeError("summary table changed during the build")
+
+            # Sorted key arrays (same order as the partial (key, intermediary_type) indexes)
+            indexes = []
+            for col in KEY_COLS:
+                width = widths[col]
+                at = f.tell()
+                count = 0
+                cur = conn.execute(
+                    f"SELECT {col}, rec FROM ("
+                    f"  SELECT {col}, intermediary_type, rowid AS rid, row_number() OVER (ORDER BY rowid) - 1 AS rec"
+                    f"  FROM {risk_summary.TABLE}"
+                    f") WHERE {col} IS NOT NULL ORDER BY {col}, intermediary_type, rid"
+                )
+                while True:
+                    rows = cur.fetchmany(10000)
+                    if not rows:
+                        break
+                    f.write(b"".join(k.encode("utf-8").ljust(width, b"\0") + _U32.pack(rec) for k, rec in rows))
+                    count += len(rows)
+                indexes.append((width, count, at))
+
+            f.seek(offsets_at)
+            f.write(offsets)
+            f.seek(0)
+            head = _HEAD.pack(MAGIC, VERSION, n, *ident, time.time(), offsets_at, blob_at)
+            head += b"".join(_INDEX.pack(*ix) for ix in indexes)
+            head += _U32.pack(len(encoded_fields)) + encoded_fields
+            if len(head) > HEADER_SIZE:
+                raise RuntimeError("snapshot header overflow")
+            f.write(head.ljust(HEADER_SIZE, b"\0"))
+            f.flush()
+            os.fsync(f.fileno())
+        conn.execute("COMMIT")
+        os.replace(tmp, out_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        conn.close()
+    return {
+        "records": n,
+        "bytes": os.path.getsize(out_path),
+        "key_widths": widths,
+        "build_s": round(time.perf_counter() - t0, 3),
+    }
+
+
+# -------------- Read --------------
+
+class _Mapped:
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            st = os.fstat(f.fileno())
+        self.file = (st.st_ino, st.st_mtime_ns)
+        magic, version, self.records, dev, ino, size, mtime, self.created, self.offsets_at, self.blob_at = \
+            _HEAD.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a registry snapshot (v{VERSION})")
+        self.db: FileIdent = (dev, ino, size, mtime)
+        self.indexes: Dict[str, Tuple[int, int, int]] = {}
+        self.fences: Dict[str, List[bytes]] = {}
+        at = _HEAD.size
+        for col in KEY_COLS:
+            width, count, off = self.indexes[col] = _INDEX.unpack_from(self.mm, at)
+            stride = width + _U32.size
+            self.fences[col] = [
+                self.mm[off + i * stride:off + i * stride + width] for i in range(0, count, FENCE_EVERY)
+            ]
+            at += _INDEX.size
+        (n,) = _U32.unpack_from(self.mm, at)
+        self.fields: List[str] = json.loads(self.mm[at + _U32.size:at + _U32.size + n])
+
+    def record(self, rec: int) -> Dict[str, Any]:
+        start, end = _SPAN.unpack_from(self.mm, self.offsets_at + rec * _U64.size)
+        return dict(zip(self.fields, _decode(self.mm[self.blob_at + start:self.blob_at + end].decode("utf-8"))[0]))
+
+    def lookup(self, col: str, key: str, typ: Optional[str], limit: Optional[int]) -> List[Dict[str, Any]]:
+        width, count, at = self.indexes[col]
+        k = key.encode("utf-8")
+        if len(k) > width:
+            return []
+        k = k.ljust(width, b"\0")
+        mm = self.mm
+        stride = width + _U32.size
+        # The fences narrow the search to one block: key(lo) < k <= key(hi)
+        j = bisect.bisect_left(self.fences[col], k)
+        lo, hi = max(0, (j - 1) * FENCE_EVERY), min(count, j * FENCE_EVERY)
+        while lo < hi:  # lower bound
+            mid = (lo + hi) >> 1
+            p = at + mid * stride
+            if mm[p:p + width] < k:
+                lo = mid + 1
+            else:
+                hi = mid
+        rows: List[Dict[str, Any]] = []
+        p = at + lo * stride
+        end = at + count * stride
+        while p < end and (limit is None or len(rows) < limit) and mm[p:p + width] == k:
+            row = self.record(_U32.unpack_from(mm, p + width)[0])
+            if not typ or row["intermediary_type"] == typ:
+                rows.append(row)
+            p += stride
+        return rows
+
+
+class Snapshot:
+    """The snapshot at path, used only while it matches the DB file it was built from."""
+
+    def __init__(self, path: str, db_path: str):
+        self.path = path
+        self.db_path = db_path
+        self.stamp: Optional[Hashable] = None
+        self.state = "not loaded"
+        self.lookups = 0
+        self.loads = 0
+        self._mapped: Optional[_Mapped] = None
+        self._usable = False
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._mapped, self._usable, self.state = None, False, "missing"
+            return
+        mapped = self._mapped
+        if mapped is None or mapped.file != (st.st_ino, st.st_mtime_ns):
+            # Old maps are left to the GC: a lookup in flight may still hold one
+            mapped = self._mapped = _Mapped(self.path)
+            self.loads += 1
+        if mapped.db != db_ident(self.db_path):
+            self._usable, self.state = False, "stale (DB file changed)"
+        elif not wal_empty(self.db_path):
+            self._usable, self.state = False, "stale (DB has WAL frames)"
+        else:
+            self._usable, self.state = True, "ok"
+
+    def usable(self, stamp: Hashable) -> bool:
+        """Re-checked whenever the DB's data stamp moves (cheap stat calls)."""
+        if stamp != self.stamp:
+            with self._lock:
+                if stamp != self.stamp:
+                    try:
+                        self._refresh()
+                    except (OSError, ValueError, struct.error) as e:
+                        self._mapped, self._usable, self.state = None, False, f"error: {e}"
+                    self.stamp = stamp
+        return self._usable
+
+    def lookup(
+        self, col: str, key: str, typ: Optional[str] = None, limit: Optional[int] = risk_summary.LOOKUP_LIMIT
+    ) -> List[Dict[str, Any]]:
+        """Summary rows for a normalized key (limit=None: every row, like the bulk queries)."""
+        mapped = self._mapped
+        if mapped is None:
+            raise RuntimeError("snapshot not loaded")
+        self.lookups += 1
+        return mapped.lookup(col, key, typ, limit)
+
+    def stats(self) -> Dict[str, Any]:
+        mapped = self._mapped
+        return {
+            "path": self.path,
+            "state": self.state,
+            "records": mapped.records if mapped else 0,
+            "bytes": len(mapped.mm) if mapped else 0,
+            "entries": {col: ix[1] for col, ix in mapped.indexes.items()} if mapped else {},
+            "built_at": mapped.created if mapped else None,
+            "loads": self.loads,
+            "lookups": self.lookups,
+        }
+
+
+# -------------- CLI --------------
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build the registry's mmap lookup snapshot.")
+    parser.add_argument("--db", default="sebi_dummy.db", help="SQLite file (with user_risk_summary)")
+    parser.add_argument("--out", default=None, help="Snapshot file (default: <db>.snap)")
+    args = parser.parse_args(argv)
+
+    # Fold the WAL into the DB file, so the file identity describes all of the data
+    conn = sqlite3.connect(args.db)
+    try:
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    out = args.out or args.db + ".snap"
+    r = build(args.db, out)
+    print(f"{out}: {r['records']} records, {r['bytes']} bytes in {r['build_s']}s (key widths {r['key_widths']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
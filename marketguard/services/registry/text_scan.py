@@ -0,0 +1,52 @@
+# text_scan.py
+# Registry identifier extraction from raw page text
+# - One compiled alternation finds SEBI reg nos (INA/INH/INP/INZ + 8 digits), PANs and
+#   UPI handles (handle@psp) in a single left-to-right pass; attempts only start at
+#   token boundaries and are bounded in length, so the scan is linear in the text size
+# - UPI wins over the other two at the same offset ("INA12345678@ybl" is a UPI handle);
+#   e-mail addresses are not UPI handles (the psp may not continue with ".tld")
+# - Hits keep char offsets; group_hits() collapses them to one entry per normalized key
+# ------------------------------------------------------------
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple
+
+# Same shapes the extension uses (scripts/new/registry.js). Every alternative starts at a
+# token start (the shared lookbehind) and UPI handles never right after "." or "-", so
+# each char begins at most one attempt, and every attempt is bounded in length.
+IDENTIFIER_RE = re.compile(
+    r"(?<![\w@])(?:"
+    r"(?<![.\-])(?P<upi>[A-Za-z0-9_.\-]{2,256}@[A-Za-z][A-Za-z0-9]{1,63})(?![\w@]|[.\-][A-Za-z0-9])"
+    r"|(?P<reg_no>[Ii][Nn][AaHhPpZz][0-9]{8})\b"
+    r"|(?P<pan>[A-Za-z]{5}[0-9]{4}[A-Za-z])\b"
+    r")"
+)
+
+
+@dataclass
+class Hit:
+    kind: str   # reg_no | pan | upi
+    value: str  # as written in the text
+    key: str    # normalized lookup key (reg/PAN upper-case, UPI lower-case)
+    start: int  # char offsets into the scanned text
+    end: int
+
+
+def normalize(kind: str, value: str) -> str:
+    return value.lower() if kind == "upi" else value.upper()
+
+
+def scan(text: str) -> Iterator[Hit]:
+    for m in IDENTIFIER_RE.finditer(text):
+        kind = m.lastgroup or ""
+        value = m.group(kind)
+        yield Hit(kind, value, normalize(kind, value), m.start(), m.end())
+
+
+def group_hits(hits: List[Hit]) -> Dict[Tuple[str, str], List[Hit]]:
+    """(kind, key) -> its hits, in first-seen order."""
+    groups: Dict[Tuple[str, str], List[Hit]] = {}
+    for h in hits:
+        groups.setdefault((h.kind, h.key), []).append(h)
+    return groups
@@ -0,0 +1,91 @@
+# verify_cache.py
+# Versioned in-memory cache for registry verify responses
+# - LRU keyed by the normalized query (field, value, type, fuzzy); misses are cached too
+# - Every entry belongs to one data version (file generation + PRAGMA data_version);
+#   the first lookup under a new version drops the whole cache
+# - Entries keep the serialized matches and an ETag digest, so hits cost no JSON work
+# ------------------------------------------------------------
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional
+
+
+def dump_json(obj: Any) -> bytes:
+    # Same encoding as starlette's JSONResponse
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+@dataclass
+class CachedVerify:
+    count: int
+    matches_json: bytes
+    digest: str  # of matches_json; combined with the query echo into the ETag
+
+    def body(self, query: Dict[str, Any]) -> bytes:
+        return b'{"query":' + dump_json(query) + b',"count":' + str(self.count).encode() + \
+            b',"matches":' + self.matches_json + b"}"
+
+    def etag(self, query: Dict[str, Any]) -> str:
+        h = hashlib.blake2b(self.digest.encode(), digest_size=12)
+        h.update(dump_json(query))
+        return '"' + h.hexdigest() + '"'
+
+
+def make_entry(matches: List[Dict[str, Any]]) -> CachedVerify:
+    blob = dump_json(matches)
+    return CachedVerify(len(matches), blob, hashlib.blake2b(blob, digest_size=16).hexdigest())
+
+
+class VerifyCache:
+    def __init__(self, max_items: int = 50000):
+        self.max_items = max(0, max_items)
+        self.version: Optional[Hashable] = None
+        self._items: "OrderedDict[Hashable, CachedVerify]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _sync_version(self, version: Hashable) -> None:
+        if version != self.version:
+            if self._items:
+                self.invalidations += 1
+            self._items.clear()
+            self.version = version
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[CachedVerify]:
+        with self._lock:
+            self._sync_version(version)
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, version: Hashable, entry: CachedVerify) -> None:
+        if self.max_items == 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return  # computed against data that is already stale
+            self._items[key] = entry
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._items)
+        return {
+            "items": size,
+            "max_items": self.max_items,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
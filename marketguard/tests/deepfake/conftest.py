@@ -0,0 +1,8 @@
+# Deepfake service modules import their siblings directly (uvicorn runs main:app
+# from the service directory), so tests see them the same way.
+import os
+import sys
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "services", "deepfake"))
+if SERVICE_DIR not in sys.path:
+  sys.path.insert(0, SERVICE_DIR)
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+main = pytest.importorskip("main")
+
+
+def _write_clip(path, n_frames, splice=(), fps=30.0, size=(320, 240)):
+  """Smooth panning gradient; frames in `splice` are replaced with uniform noise."""
+  w, h = size
+  out = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (w, h))
+  assert out.isOpened()
+  rng = np.random.default_rng(7)
+  x = np.linspace(0, 255, w, dtype=np.float32)
+  for i in range(n_frames):
+    if i in splice:
+      frame = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    else:
+      row = ((x + 2 * i) % 256).astype(np.uint8)
+      frame = np.repeat(np.repeat(row[None, :, None], h, axis=0), 3, axis=2)
+    out.write(frame)
+  out.release()
+  return str(path)
+
+
+def test_adaptive_does_not_call_spliced_clip_clean(tmp_path):
+  # 16 s at 30 fps; ten noise frames at 6 s. Uniform 1 fps sampling lands on frame 180.
+  clip = _write_clip(tmp_path / "splice.avi", 480, splice=range(180, 190))
+  uniform = main._detect_video_path(clip, 16, 1.0, mode="uniform")
+  adaptive = main._detect_video_path(clip, 16, 1.0, mode="adaptive")
+  assert uniform.aggregate.level != "SAFE"
+  assert adaptive.stop_reason != "confident_clean"
+  assert adaptive.aggregate.score >= uniform.aggregate.score
+  assert adaptive.aggregate.level == uniform.aggregate.level
+
+
+def test_adaptive_exits_early_on_clean_clip(tmp_path):
+  # The 1 fps grid (16 frames) fits the budget; clean is called before the last round
+  clip = _write_clip(tmp_path / "clean.avi", 480)
+  uniform = main._detect_video_path(clip, 16, 1.0, mode="uniform")
+  adaptive = main._detect_video_path(clip, 16, 1.0, mode="adaptive")
+  assert adaptive.stop_reason == "confident_clean"
+  assert adaptive.frames_evaluated < uniform.frames_evaluated == 16
+  assert adaptive.aggregate.level == uniform.aggregate.level == "SAFE"
+
+
+def test_strict_clean_waits_for_the_full_grid(tmp_path, monkeypatch):
+  monkeypatch.setattr(main, "ADAPTIVE_CLEAN_STRICT", True)
+  clip = _write_clip(tmp_path / "clean.avi", 480)
+  adaptive = main._detect_video_path(clip, 16, 1.0, mode="adaptive")
+  assert (adaptive.stop_reason, adaptive.frames_evaluated) == ("confident_clean", 16)
+
+
+def test_long_clip_exits_after_the_sparse_pass(tmp_path):
+  # 64 s at 1 fps is 64 grid frames for a budget of 16: one sparse pass, then stop
+  clip = _write_clip(tmp_path / "long.avi", 1920, size=(160, 120))
+  adaptive = main._detect_video_path(clip, 16, 1.0, mode="adaptive")
+  assert adaptive.stop_reason == "confident_clean"
+  assert adaptive.frames_evaluated == main.ADAPTIVE_CLEAN_MIN_FRAMES
+  spread = [f.index for f in adaptive.frame_results]
+  assert spread[0] == 0 and spread[-1] == 1919
+
+
+def test_long_clip_finds_a_fake_segment(tmp_path):
+  clip = _write_clip(tmp_path / "long.avi", 960, splice=range(300, 420), size=(160, 120))
+  adaptive = main._detect_video_path(clip, 16, 1.0, mode="adaptive")
+  assert adaptive.stop_reason == "confident_fake"
+  assert adaptive.aggregate.level != "SAFE"
+  assert adaptive.frames_evaluated < 16
@@ -0,0 +1,51 @@
+import hashlib
+import sqlite3
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+main = pytest.importorskip("main")
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+def _png():
+  ok, buf = cv2.imencode(".png", np.random.default_rng(1).integers(0, 256, (48, 64, 3), dtype=np.uint8))
+  return buf.tobytes()
+
+
+def _cache(monkeypatch, path, detector_version):
+  """The service's result cache as a process running detector_version would open it."""
+  monkeypatch.setenv("RESULT_CACHE_PATH", path)
+  cache = main.cache_from_env(version=f"{main.DETECTOR_NAME}-{detector_version}").open()
+  monkeypatch.setattr(main, "RESULT_CACHE", cache)
+  return cache
+
+
+def test_detector_version_bump_invalidates_cached_results(tmp_path, monkeypatch):
+  path = str(tmp_path / "results.sqlite")
+  png = _png()
+  sha = hashlib.sha256(png).hexdigest()
+  client = TestClient(main.app)
+  lookup = f"/api/detect/lookup/{sha}"
+
+  old = _cache(monkeypatch, path, main.DETECTOR_VERSION)
+  assert client.post("/api/detect/image", files={"file": ("a.png", png, "image/png")}).status_code == 200
+  assert client.get(lookup).status_code == 200
+
+  # Restart on a newer detector: the old rows are purged and nothing is served from them
+  new = _cache(monkeypatch, path, main.DETECTOR_VERSION + ".1")
+  assert client.get(lookup).status_code == 404
+  conn = sqlite3.connect(path)
+  assert conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 0
+
+  # An old process still running during a rollout keeps writing; the new one ignores its rows
+  old.put(main.image_cache_key(sha), {"width": 1, "height": 1, "phash": None, "risk": {}})
+  assert client.get(lookup).status_code == 404
+  assert new.stats()["misses"] >= 2
+
+  assert client.post("/api/detect/image", files={"file": ("a.png", png, "image/png")}).status_code == 200
+  assert client.get(lookup).status_code == 200
+  versions = {v for (v,) in conn.execute("SELECT version FROM results")}
+  assert versions == {f"{main.DETECTOR_NAME}-{main.DETECTOR_VERSION}.1"}
+  conn.close()
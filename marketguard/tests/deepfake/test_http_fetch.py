@@ -0,0 +1,141 @@
+import asyncio
+import http.server
+import os
+import threading
+import time
+
+import pytest
+
+from http_fetch import AsyncFetcher, FetchError, HTTPCache
+
+BODY = b"\x89PNG not really, but bytes are bytes" * 64
+ETAG = '"v1"'
+
+
+class _Origin(http.server.BaseHTTPRequestHandler):
+  """Stand-in origin: /fresh (max-age), /stale (etag, must revalidate), /slow (for the per-host gate)."""
+  protocol_version = "HTTP/1.1"
+  hits = {}
+  in_flight = 0
+  peak = 0
+  gate = threading.Lock()
+
+  def log_message(self, *args):
+    pass
+
+  def do_GET(self):
+    cls = type(self)
+    path = self.path.split("?")[0]
+    cls.hits[path] = cls.hits.get(path, 0) + 1
+    if path == "/slow":
+      with cls.gate:
+        cls.in_flight += 1
+        cls.peak = max(cls.peak, cls.in_flight)
+      time.sleep(0.1)
+      with cls.gate:
+        cls.in_flight -= 1
+      return self._send(200, BODY, {"Cache-Control": "no-store"})
+    if path == "/fresh":
+      return self._send(200, BODY, {"Cache-Control": "max-age=3600"})
+    if path == "/stale":
+      if self.headers.get("If-None-Match") == ETAG:
+        return self._send(304, b"", {"ETag": ETAG, "Cache-Control": "no-cache"})
+      return self._send(200, BODY, {"ETag": ETAG, "Cache-Control": "no-cache"})
+    self._send(404, b"", {})
+
+  def _send(self, status, body, headers):
+    self.send_response(status)
+    for k, v in headers.items():
+      self.send_header(k, v)
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    if body:
+      self.wfile.write(body)
+
+
+@pytest.fixture
+def origin():
+  _Origin.hits, _Origin.in_flight, _Origin.peak = {}, 0, 0
+  srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Origin)
+  threading.Thread(target=srv.serve_forever, daemon=True).start()
+  yield f"http://127.0.0.1:{srv.server_address[1]}"
+  srv.shutdown()
+  srv.server_close()
+
+
+def _fetcher(tmp_path, per_host=4):
+  return AsyncFetcher(
+    cache=HTTPCache(str(tmp_path / "cache")).open(), max_bytes=1 << 20, timeout=5.0,
+    per_host=per_host, spool_dir=str(tmp_path),
+  )
+
+
+def _run(fetcher, *urls):
+  async def go():
+    try:
+      return await asyncio.gather(*(fetcher.fetch(u) for u in urls))
+    finally:
+      await fetcher.aclose()
+  return asyncio.run(go())
+
+
+def _read(f):
+  with open(f.path, "rb") as fh:
+    data = fh.read()
+  os.unlink(f.path)
+  return data
+
+
+def test_200_then_fresh_hit(origin, tmp_path):
+  fetcher = _fetcher(tmp_path)
+  first, = _run(fetcher, origin + "/fresh")
+  second, = _run(fetcher, origin + "/fresh")
+  assert (first.cache, second.cache) == ("miss", "hit")
+  assert _read(first) == _read(second) == BODY
+  assert first.sha256 == second.sha256
+  assert _Origin.hits["/fresh"] == 1
+
+
+def test_304_revalidation(origin, tmp_path):
+  fetcher = _fetcher(tmp_path)
+  first, = _run(fetcher, origin + "/stale")
+  second, = _run(fetcher, origin + "/stale")
+  assert (first.cache, second.cache) == ("miss", "revalidated")
+  assert _read(second) == BODY
+  assert _Origin.hits["/stale"] == 2
+  assert fetcher.cache.revalidated == 1
+
+
+def test_per_host_limit(origin, tmp_path):
+  fetcher = _fetcher(tmp_path, per_host=2)
+  results = _run(fetcher, *[origin + "/slow"] * 6)
+  assert [r.cache for r in results] == ["bypass"] * 6
+  assert _Origin.peak == 2
+  for r in results:
+    _read(r)
+
+
+@pytest.mark.parametrize("path,expect", [("/fresh", "miss"), ("/stale", "miss")])
+def test_body_evicted_between_lookup_and_checkout(origin, tmp_path, path, expect):
+  fetcher = _fetcher(tmp_path)
+  _read(_run(fetcher, origin + path)[0])
+  cache = fetcher.cache
+  lookup = cache.lookup
+
+  def lookup_then_evict(url):
+    entry = lookup(url)
+    if entry is not None:
+      os.unlink(entry.body)  # another request's eviction wins the race
+    return entry
+
+  cache.lookup = lookup_then_evict
+  again, = _run(fetcher, origin + path)
+  cache.lookup = lookup
+  assert again.cache == expect
+  assert _read(again) == BODY
+  assert cache.stats()["entries"] == 1  # dropped, then stored again by the refetch
+
+
+def test_http_error(origin, tmp_path):
+  with pytest.raises(FetchError):
+    _run(_fetcher(tmp_path), origin + "/missing")
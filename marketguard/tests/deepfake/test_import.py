@@ -0,0 +1,15 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "services", "deepfake"))
+
+
+def test_import_has_no_filesystem_side_effects(tmp_path):
+  pytest.importorskip("fastapi")
+  env = {k: v for k, v in os.environ.items() if not k.startswith(("RESULT_CACHE_", "HTTP_CACHE_", "JOB_"))}
+  env["PYTHONPATH"] = SERVICE_DIR
+  subprocess.run([sys.executable, "-c", "import main"], cwd=tmp_path, env=env, check=True, timeout=120)
+  assert sorted(os.listdir(tmp_path)) == []
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+import job_queue
+from job_queue import JobLeaseLost, JobQueue
+
+
+@pytest.fixture
+def clock(monkeypatch):
+  t = [1000.0]
+  monkeypatch.setattr(job_queue.time, "time", lambda: t[0])
+  return t
+
+
+def _media(tmp_path):
+  path = tmp_path / "clip.mp4"
+  path.write_bytes(b"\0" * 16)
+  return str(path)
+
+
+def test_running_job_is_not_requeued_by_another_process(tmp_path, clock):
+  db = str(tmp_path / "jobs.sqlite")
+  a = JobQueue(db, lease_sec=30).open()
+  job_id = a.submit("video", {}, media_path=_media(tmp_path))
+  assert a.claim().id == job_id
+
+  # A second worker process starting up (or polling) leaves a live lease alone
+  b = JobQueue(db, lease_sec=30).open()
+  clock[0] += 20
+  assert b.claim() is None
+  a.heartbeat()
+  clock[0] += 20
+  assert b.claim() is None
+  assert b.get(job_id).status == "running"
+
+
+def test_expired_lease_is_requeued_once(tmp_path, clock):
+  db = str(tmp_path / "jobs.sqlite")
+  media = _media(tmp_path)
+  a = JobQueue(db, lease_sec=30).open()
+  job_id = a.submit("video", {}, media_path=media)
+  job_a = a.claim()
+
+  clock[0] += 31  # owner stopped heartbeating
+  b = JobQueue(db, lease_sec=30).open()
+  job_b = b.claim()
+  assert job_b.id == job_id and job_b.attempts == 2
+
+  # The old owner finds out at its next report and must not finish the job or delete its media
+  with pytest.raises(JobLeaseLost):
+    a.report(job_id, 0.5)
+  assert a.finish(job_a, "done", result={}) is False
+  assert os.path.exists(media)
+
+  assert b.finish(job_b, "done", result={"ok": True}) is True
+  assert b.get(job_id, with_result=True).result == {"ok": True}
+  assert not os.path.exists(media)
+
+
+def test_expired_lease_fails_after_max_attempts(tmp_path, clock):
+  q = JobQueue(str(tmp_path / "jobs.sqlite"), lease_sec=30, max_attempts=1).open()
+  job_id = q.submit("video", {})
+  q.claim()
+  clock[0] += 31
+  assert q.claim() is None
+  job = q.get(job_id)
+  assert (job.status, job.error) == ("failed", "interrupted")
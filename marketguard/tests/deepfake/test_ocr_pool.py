@@ -0,0 +1,94 @@
+import threading
+
+import numpy as np
+
+from ocr_pool import OCRPool, _to_grey
+
+
+class _FakeReader:
+  """easyocr-shaped reader: one box around the dark pixels, "text" read from the crop."""
+
+  def __init__(self, gate=None):
+    self.gate = gate
+    self.detect_calls = []
+
+  def detect(self, images, reformat=False):
+    self.detect_calls.append(len(images))
+    horizontal, free = [], []
+    for im in images:
+      ys, xs = np.nonzero(im.min(axis=2) < 128)
+      horizontal.append([[int(xs.min()), int(xs.max()) + 1, int(ys.min()), int(ys.max()) + 1]] if xs.size else [])
+      free.append([])
+    return horizontal, free
+
+  def recognize(self, grey, horizontal, free, reformat=False):
+    out = []
+    for x0, x1, y0, y1 in horizontal:
+      crop = grey[y0:y1, x0:x1]
+      box = [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+      out.append((box, f"{crop.shape[0]}x{crop.shape[1]}:{int(crop.sum())}", 0.9))
+    return out
+
+  def readtext(self, image):
+    if self.gate is not None:
+      self.gate.wait(10)
+    h, f = self.detect(image[None, ...])
+    return self.recognize(_to_grey(image), h[0], f[0])
+
+
+def _image(h, w, box, shade):
+  im = np.full((h, w, 3), 255, dtype=np.uint8)
+  y0, x0, y1, x1 = box
+  im[y0:y1, x0:x1] = shade
+  im[y0, x0:x1] = (shade[0] // 2, shade[1], shade[2])  # some structure inside the box
+  return im
+
+
+def test_batched_ocr_matches_per_image_ocr():
+  rng = np.random.default_rng(3)
+  images = []
+  for i in range(5):
+    h, w = int(rng.integers(40, 120)), int(rng.integers(60, 200))
+    y0, x0 = int(rng.integers(0, h // 2)), int(rng.integers(0, w // 2))
+    shade = tuple(int(v) for v in rng.integers(0, 100, 3))
+    images.append(_image(h, w, (y0, x0, y0 + h // 3, x0 + w // 3), shade))
+  expected = [_FakeReader().readtext(im) for im in images]
+
+  gate = threading.Event()
+  readers = []
+
+  def factory(langs, gpu):
+    readers.append(_FakeReader(gate))
+    return readers[-1]
+
+  pool = OCRPool(workers=1, batch_size=8, reader_factory=factory)
+  pool.start()
+  futures = [pool.submit(im, ["en"]) for im in images]  # queued behind the warm-up
+  gate.set()
+  try:
+    results = [f.result(timeout=10) for f in futures]
+  finally:
+    pool.close()
+
+  assert [r.lines for r in results] == expected
+  assert {r.batch_size for r in results} == {len(images)}
+  assert readers[0].detect_calls == [1, len(images)]  # warm-up, then one batched detect
+
+
+def test_large_images_are_not_batched():
+  gate = threading.Event()
+  pool = OCRPool(workers=1, batch_size=8, batch_max_pixels=50 * 50, reader_factory=lambda langs, gpu: _FakeReader(gate))
+  images = [
+    _image(80, 80, (10, 10, 30, 40), (0, 0, 0)),
+    _image(30, 30, (5, 5, 15, 20), (20, 20, 20)),
+    _image(40, 45, (2, 8, 30, 20), (60, 10, 0)),
+  ]
+  pool.start()
+  futures = [pool.submit(im) for im in images]
+  gate.set()
+  try:
+    results = [f.result(timeout=10) for f in futures]
+  finally:
+    pool.close()
+  assert [r.lines for r in results] == [_FakeReader().readtext(im) for im in images]
+  assert [r.batch_size for r in results] == [1, 2, 2]
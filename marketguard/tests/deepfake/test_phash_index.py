@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+phash_index = pytest.importorskip("phash_index")
+
+
+def _random_hashes(n, seed):
+  return np.random.default_rng(seed).integers(0, 2**63, n, dtype=np.int64).astype(np.uint64) * np.uint64(2)
+
+
+def test_chunked_adds_match_a_full_rebuild():
+  idx = phash_index.HammingIndex(buffer_size=64)
+  chunks = [_random_hashes(n, seed) for seed, n in enumerate((500, 1, 300, 1200))]
+  for i, h in enumerate(chunks):
+    idx.add_many(h.tolist(), ["synthetic" if i % 2 else "clean"] * h.size)
+  # Trickle in enough single adds to flush the buffer a few times
+  for h in _random_hashes(200, 9).tolist():
+    idx.add(h, "clean")
+  idx._flush()
+
+  rebuilt = phash_index.HammingIndex()
+  rebuilt._hashes, rebuilt._labels = idx._hashes, idx._labels
+  rebuilt._rebuild()
+  for t in range(phash_index.TABLES):
+    assert np.array_equal(idx._keys[t], rebuilt._keys[t])
+    assert np.array_equal(idx._order[t], rebuilt._order[t])
+
+
+def test_merged_tables_find_near_duplicates():
+  idx = phash_index.HammingIndex(buffer_size=16)
+  base = _random_hashes(2000, 1)
+  idx.add_many(base[:1000].tolist(), ["clean"] * 1000)
+  idx.add_many(base[1000:].tolist(), ["synthetic"] * 1000)
+  for probe in (3, 1500):
+    near = int(base[probe]) ^ 0b101  # two bits off
+    hits = idx.query(near, 6)
+    assert hits[0][:2] == (2, probe)
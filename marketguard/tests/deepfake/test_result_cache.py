@@ -0,0 +1,29 @@
+import result_cache
+from result_cache import ResultCache
+
+
+def _clock(monkeypatch, t):
+  monkeypatch.setattr(result_cache.time, "time", lambda: t[0])
+
+
+def test_disk_hit_keeps_original_age(tmp_path, monkeypatch):
+  t = [1000.0]
+  _clock(monkeypatch, t)
+  path = str(tmp_path / "rc.sqlite")
+  ResultCache(version="v", path=path, ttl_sec=100).open().put("k", {"a": 1})
+
+  fresh = ResultCache(version="v", path=path, ttl_sec=100).open()  # new process: empty memory tier
+  t[0] = 1090.0
+  assert fresh.get("k") == {"a": 1}
+  assert fresh.hits_disk == 1
+
+  # Promoted to memory, but still written at t=1000: expires at 1100, not 1190
+  t[0] = 1110.0
+  assert fresh.get("k") is None
+  assert fresh.hits_mem == 0
+
+
+def test_version_change_invalidates(tmp_path):
+  path = str(tmp_path / "rc.sqlite")
+  ResultCache(version="v1", path=path).open().put("k", {"a": 1})
+  assert ResultCache(version="v2", path=path).open().get("k") is None
@@ -0,0 +1,50 @@
+import hashlib
+import io
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+main = pytest.importorskip("main")
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture
+def spools(monkeypatch):
+  """Every upload spool the app opens, so tests can see how much was read and what was left behind."""
+  opened = []
+  real = main._Spool
+
+  class Recording(real):
+    def __init__(self, *a, **kw):
+      super().__init__(*a, **kw)
+      opened.append(self)
+
+  monkeypatch.setattr(main, "_Spool", Recording)
+  return opened
+
+
+def _png(w=64, h=48):
+  ok, buf = cv2.imencode(".png", np.random.default_rng(0).integers(0, 256, (h, w, 3), dtype=np.uint8))
+  return buf.tobytes()
+
+
+def test_image_upload_is_spooled_and_removed(spools):
+  png = _png()
+  r = TestClient(main.app).post("/api/detect/image", files={"file": ("shot.png", png, "image/png")})
+  assert r.status_code == 200, r.text
+  assert r.json()["sha256"] == hashlib.sha256(png).hexdigest()
+  spool, = spools
+  assert spool.size == len(png)
+  assert not main.os.path.exists(spool._fh.name)
+
+
+@pytest.mark.parametrize("route", ["/api/detect/image", "/api/ocr", "/api/pipeline/image-text-risk"])
+def test_oversized_upload_stops_at_the_cap(spools, monkeypatch, route):
+  monkeypatch.setattr(main, "HAS_EASYOCR", True)  # reach the upload on OCR routes without the model
+  big = io.BytesIO(b"\0" * (main.MAX_DOWNLOAD_BYTES + 3 * main.INGEST_CHUNK_BYTES))
+  r = TestClient(main.app).post(route, files={"file": ("big.png", big, "image/png")})
+  assert r.status_code == 413
+  spool, = spools
+  assert spool.size <= main.MAX_DOWNLOAD_BYTES + main.INGEST_CHUNK_BYTES  # stopped within one chunk
+  assert not main.os.path.exists(spool._fh.name)
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pytest
+
+import job_queue
+from job_queue import JobQueue, JobWorkers
+
+cv2 = pytest.importorskip("cv2")
+main = pytest.importorskip("main")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+  t = [1000.0]
+  monkeypatch.setattr(job_queue.time, "time", lambda: t[0])
+  return t
+
+
+def _write_clip(path, n_frames=60, size=(160, 120)):
+  w, h = size
+  out = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 30.0, (w, h))
+  x = np.linspace(0, 255, w, dtype=np.float32)
+  for i in range(n_frames):
+    row = ((x + 2 * i) % 256).astype(np.uint8)
+    out.write(np.repeat(np.repeat(row[None, :, None], h, axis=0), 3, axis=2))
+  out.release()
+  return str(path)
+
+
+def test_lost_lease_leaves_media_for_the_new_owner(tmp_path, clock, monkeypatch):
+  media = _write_clip(tmp_path / "clip.avi")
+  params = {"max_frames": 4, "sample_fps": 1.0, "mode": "uniform", "budget_ms": None, "sha256": "0" * 64, "size": 1}
+  db = str(tmp_path / "jobs.sqlite")
+  a = JobQueue(db, lease_sec=30).open()
+  b = JobQueue(db, lease_sec=30).open()
+  job_id = a.submit("video", params, media_path=media)
+  job_a = a.claim()
+  reclaimed = []
+
+  real_detect = main._detect_video_cached
+
+  def stalls_past_the_lease(m, *args, progress=None, **kw):
+    clock[0] += 31  # e.g. a long decode with the heartbeat thread starved
+    reclaimed.append(b.claim())
+    progress(1)  # the next report finds the lease gone
+    raise AssertionError("unreachable")
+
+  monkeypatch.setattr(main, "_detect_video_cached", stalls_past_the_lease)
+  JobWorkers(a, {"video": main._run_video_job})._run(job_a)
+  assert os.path.exists(media)
+
+  job_b, = reclaimed
+  assert (job_b.id, job_b.attempts) == (job_id, 2)
+  monkeypatch.setattr(main, "_detect_video_cached", real_detect)
+  JobWorkers(b, {"video": main._run_video_job})._run(job_b)
+  job = b.get(job_id, with_result=True)
+  assert job.status == "done", job.error
+  assert job.result["frames_evaluated"] > 0
+  assert not os.path.exists(media)  # finish() deletes it once the job is terminal
+
+
+def test_url_job_download_is_removed_after_the_attempt(tmp_path, clock, monkeypatch):
+  clip = _write_clip(tmp_path / "remote.avi")
+  spooled = tmp_path / "spooled.mp4"
+
+  async def fake_fetch(url):
+    spooled.write_bytes(open(clip, "rb").read())
+    return main.SpooledMedia(path=str(spooled), sha256="1" * 64, size=spooled.stat().st_size)
+
+  monkeypatch.setattr(main, "_fetch_job_media", fake_fetch)
+  q = JobQueue(str(tmp_path / "jobs.sqlite")).open()
+  params = {"max_frames": 4, "sample_fps": 1.0, "mode": "uniform", "budget_ms": None, "url": "http://x/v.mp4"}
+  job_id = q.submit("video", params)
+  JobWorkers(q, {"video": main._run_video_job})._run(q.claim())
+  assert q.get(job_id).status == "done"
+  assert not spooled.exists()
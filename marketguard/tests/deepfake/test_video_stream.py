@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+main = pytest.importorskip("main")
+from fastapi.testclient import TestClient
+
+
+def test_slow_scorer_drops_the_oldest_queued_frames(monkeypatch):
+  monkeypatch.setattr(main, "STREAM_QUEUE_FRAMES", 4)
+  entered, release, all_offered = threading.Event(), threading.Event(), threading.Event()
+  batches = []
+
+  def slow_score(batch):
+    batches.append([idx for idx, _t, _data in batch])
+    entered.set()
+    release.wait(10)
+    return [
+      main.FrameResult(index=idx, time_sec=t, width=1, height=1, risk=main.Risk(score=0.1))
+      for idx, t, _data in batch
+    ]
+
+  offer = main._FrameStream.offer
+
+  def counting_offer(self, data):
+    offer(self, data)
+    if self.received == 10:
+      all_offered.set()
+
+  monkeypatch.setattr(main, "_score_stream_frames", slow_score)
+  monkeypatch.setattr(main._FrameStream, "offer", counting_offer)
+
+  client = TestClient(main.app)
+  with client.websocket_connect("/api/detect/video-stream?session=s1") as ws:
+    ws.send_bytes(b"frame-0")
+    assert entered.wait(5)  # the scorer is now stuck on frame 0
+    for i in range(1, 10):
+      ws.send_bytes(f"frame-{i}".encode())
+    assert all_offered.wait(5)
+    release.set()
+    ws.send_json({"type": "end"})
+    messages = []
+    while not messages or messages[-1]["type"] != "final":
+      messages.append(ws.receive_json())
+
+  scored = [m["frame"]["index"] for m in messages if m["type"] == "verdict"]
+  assert scored == [0, 6, 7, 8, 9]  # only the newest STREAM_QUEUE_FRAMES survived the stall
+  assert batches == [[0], [6, 7, 8, 9]]
+  stats = messages[-1]["stats"]
+  assert (stats["received"], stats["scored"], stats["dropped"]) == (10, 5, 5)
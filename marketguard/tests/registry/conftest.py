@@ -0,0 +1,49 @@
+# Registry service modules import their siblings directly (uvicorn runs main:app
+# from the service directory), so tests see them the same way.
+import os
+import sys
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "services", "registry"))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+import importlib.util
+import itertools
+import shutil
+
+import pytest
+
+SEBI_DB = os.path.join(SERVICE_DIR, "sebi_dummy.db")
+_loads = itertools.count()
+
+
+@pytest.fixture
+def registry_db(tmp_path):
+    """A private copy of the sample DB."""
+    path = str(tmp_path / "registry.db")
+    shutil.copyfile(SEBI_DB, path)
+    return path
+
+
+@pytest.fixture
+def load_registry(monkeypatch):
+    """Import a fresh registry main.py against the given DB and env.
+
+    main reads its config at import time, and "main" is also the deepfake service's
+    module name, so each load gets its own module name.
+    """
+    loaded = []
+
+    def load(db_path, **env):
+        monkeypatch.setenv("SEBI_DB", db_path)
+        for k, v in env.items():
+            monkeypatch.setenv(k, str(v))
+        spec = importlib.util.spec_from_file_location(f"registry_main_{next(_loads)}", os.path.join(SERVICE_DIR, "main.py"))
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+        loaded.append(mod)
+        return mod
+
+    yield load
+    for mod in loaded:
+        mod.POOL.close()
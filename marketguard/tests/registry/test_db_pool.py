@@ -0,0 +1,54 @@
+import os
+import sqlite3
+
+from db_pool import ReadOnlyPool
+
+
+def _make_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS t (x INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(rows)])
+    conn.commit()
+    return conn
+
+
+def test_writes_and_checkpoints_keep_pooled_connections(tmp_path):
+    path = str(tmp_path / "r.db")
+    writer = _make_db(path, 10)
+    pool = ReadOnlyPool(path)
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 10
+    stamp = pool.data_stamp()
+
+    writer.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(5)])
+    writer.commit()
+    writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    new_stamp = pool.data_stamp()
+    assert new_stamp[0] == stamp[0]  # same file: same generation, pool kept
+    assert new_stamp != stamp        # but the commit is visible to caches
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 15
+    assert pool.stats()["opened"] == 1
+    writer.close()
+    pool.close()
+
+
+def test_replaced_file_drops_pooled_connections(tmp_path):
+    path = str(tmp_path / "r.db")
+    _make_db(path, 10).close()
+    pool = ReadOnlyPool(path)
+    with pool.connection() as conn:
+        conn.execute("SELECT 1").fetchone()
+    generation = pool.check()
+
+    fresh = str(tmp_path / "r.db.new")
+    _make_db(fresh, 3).close()
+    os.replace(fresh, path)
+
+    assert pool.check() == generation + 1
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 3
+    assert pool.stats()["opened"] == 2
+    pool.close()
@@ -0,0 +1,123 @@
+import csv
+import os
+import sqlite3
+
+import ingest
+import risk_summary
+from db_pool import ReadOnlyPool
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["name", "type", "reg_no", "status", "member", "link"])
+        w.writerows(rows)
+    return str(path)
+
+
+def _users(conn):
+    return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+
+def test_swap_under_an_open_pooled_connection(tmp_path, registry_db):
+    # The old file has WAL frames a writer has not checkpointed
+    writer = sqlite3.connect(registry_db)
+    writer.execute("UPDATE users SET full_name = full_name || ' Jr' WHERE id = 1")
+    writer.commit()
+    assert os.path.getsize(registry_db + "-wal") > 0
+    old_shm = os.stat(registry_db + "-shm").st_ino
+
+    pool = ReadOnlyPool(registry_db)
+    with pool.connection() as old:
+        before = _users(old)
+        renamed = old.execute("SELECT full_name FROM users WHERE id = 1").fetchone()[0]
+        src = _write_csv(tmp_path / "r.csv", [[f"Advisor {i}", "IA", f"INA{i:08d}", "active", "", ""] for i in range(40)])
+        ingest.ingest([src], registry_db)
+
+        with pool.connection() as new:
+            assert _users(new) == 40
+            assert new.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert new.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        new_shm = os.stat(registry_db + "-shm").st_ino
+        assert new_shm != old_shm
+
+        # The old connection still reads the old file through its own WAL
+        assert _users(old) == before
+        assert old.execute("SELECT full_name FROM users WHERE id = 1").fetchone()[0] == renamed
+
+    # Closing the last handles on the old file leaves the new WAL files alone
+    writer.close()
+    assert pool.stats()["opened"] == 2
+    assert os.stat(registry_db + "-shm").st_ino == new_shm
+    with pool.connection() as new:
+        assert _users(new) == 40
+    pool.close()
+
+
+def _summary(conn):
+    # Everything but the surrogate id, which the triggers reassign
+    rows = conn.execute(f"SELECT * FROM {risk_summary.TABLE}").fetchall()
+    return sorted((r[1:] for r in rows), key=repr)
+
+
+def test_full_load_counts_and_summary(tmp_path):
+    src = _write_csv(tmp_path / "a.csv", [
+        ["Asha Rao", "ia", " ina00000001 ", "Active", "Rao Advisors", ""],
+        ["Vikram Shah", "RA", "INH00000002", "", "", "https://example.com/v"],
+        ["", "IA", "INA00000003", "active", "", ""],          # no name: skipped
+        ["Nobody", "IA", "", "active", "", ""],               # no reg_no: skipped
+        ["Asha R. Rao", "IA", "INA00000001", "suspended", "", ""],  # later row wins
+    ])
+    more = _write_csv(tmp_path / "b.csv", [["Meera Iyer", "PMS", "INP00000004", "active", "", ""]])
+    db = str(tmp_path / "new.db")
+    r = ingest.ingest([src, more], db)
+    assert (r["read"], r["skipped"], r["distinct_reg_nos"], r["inserted"], r["updated"]) == (6, 2, 3, 3, 0)
+
+    conn = sqlite3.connect(db)
+    assert _users(conn) == 3
+    assert r["summary_rows"] == conn.execute(f"SELECT COUNT(*) FROM {risk_summary.TABLE}").fetchone()[0] == 3
+    assert conn.execute(
+        "SELECT full_name, account_status, intermediary_type FROM users WHERE sebi_reg_no = 'INA00000001'"
+    ).fetchone() == ("Asha R. Rao", "suspended", "IA")
+    assert conn.execute("SELECT status, link FROM registry_entries WHERE reg_no = 'INH00000002'").fetchone() == (
+        "active", "https://example.com/v")
+    assert conn.execute("SELECT source FROM registry_entries WHERE reg_no = 'INP00000004'").fetchone() == ("b.csv",)
+    assert conn.execute(risk_summary.lookup_sql("reg_key", False), ("INA00000001",)).fetchone()[1] == "Asha R. Rao"
+    assert risk_summary.check_plans(conn) == []
+    conn.close()
+
+
+def test_delta_updates_and_keeps_the_summary_current(tmp_path, registry_db):
+    conn = sqlite3.connect(registry_db)
+    existing, before = conn.execute(
+        "SELECT sebi_reg_no, (SELECT COUNT(*) FROM users) FROM users WHERE sebi_reg_no IS NOT NULL ORDER BY id LIMIT 1"
+    ).fetchone()
+    conn.close()
+
+    # First delta: the sample DB has no summary table yet, so it is built from scratch
+    first = _write_csv(tmp_path / "d1.csv", [
+        ["Renamed Advisor", "", existing, "suspended", "", ""],
+        ["New Advisor", "RA", "INH99999999", "active", "", ""],
+    ])
+    r = ingest.ingest([first], registry_db, delta=True)
+    assert (r["read"], r["distinct_reg_nos"], r["inserted"], r["updated"]) == (2, 2, 1, 1)
+    conn = sqlite3.connect(registry_db)
+    assert _users(conn) == before + 1
+    assert r["summary_rows"] == conn.execute(f"SELECT COUNT(*) FROM {risk_summary.TABLE}").fetchone()[0]
+    row = conn.execute(risk_summary.lookup_sql("reg_key", False), (existing,)).fetchone()
+    assert (row[1], row[8]) == ("Renamed Advisor", "suspended")
+    conn.close()
+
+    # Second delta: the triggers keep the existing table current; a rebuild changes nothing
+    second = _write_csv(tmp_path / "d2.csv", [
+        ["New Advisor", "RA", "INH99999999", "active", "", ""],     # unchanged
+        ["Second Rename", "IA", existing, "active", "", ""],
+    ])
+    r = ingest.ingest([second], registry_db, delta=True)
+    assert (r["inserted"], r["updated"]) == (0, 1)
+    conn = sqlite3.connect(registry_db)
+    assert conn.execute(risk_summary.lookup_sql("reg_key", False), (existing,)).fetchone()[1] == "Second Rename"
+    incremental = _summary(conn)
+    risk_summary.install(conn, rebuild=True)
+    assert _summary(conn) == incremental
+    conn.close()
@@ -0,0 +1,39 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+
+def test_startup_build_runs_in_the_background(registry_db, load_registry):
+    main = load_registry(registry_db, KEY_FILTER_FP_RATE="0.01")
+    gate = threading.Event()
+    load = main.load_filter_keys
+
+    def slow_load():
+        gate.wait(10)
+        return load()
+
+    main.load_filter_keys = slow_load
+    t0 = time.perf_counter()
+    main._build_key_filters()
+    assert time.perf_counter() - t0 < 1.0
+    assert main.KEY_FILTERS.stats()["building"]
+
+    # Until the filters land, verify answers from SQLite
+    client = TestClient(main.app)
+    r = client.get("/api/registry/v1/verify", params={"reg_no": "INA99999901"})
+    assert r.status_code == 200 and r.json()["matches"] == []
+    stats = main.KEY_FILTERS.stats()
+    assert stats["stale_skips"] == 1 and stats["short_circuits"] == {}
+
+    gate.set()
+    deadline = time.monotonic() + 10
+    while main.KEY_FILTERS.stats()["building"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert main.KEY_FILTERS.builds == 1
+
+    r = client.get("/api/registry/v1/verify", params={"reg_no": "INA99999902"})
+    assert r.status_code == 200 and r.json()["matches"] == []
+    assert main.KEY_FILTERS.stats()["short_circuits"] == {"reg_key": 1}
+    health = client.get("/healthz").json()["key_filters"]
+    assert health["builds"] == 1 and health["build_error"] is None
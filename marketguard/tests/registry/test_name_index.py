@@ -0,0 +1,88 @@
+import threading
+
+from name_index import NameIndex
+
+ROWS = [(1, "Rajesh Sharma", "IA"), (2, "Sunita Verma", "RA"), (3, "Amit Patel", "PMS")]
+
+
+def _names(index, query):
+    return [uid for uid, _score in index.search(query)]
+
+
+def test_refresh_runs_in_background_and_applies_only_the_diff():
+    index = NameIndex()
+    assert index.ensure(1, lambda: ROWS) is True  # first build is inline
+    assert _names(index, "Rajesh Sharma") == [1]
+
+    release = threading.Event()
+
+    def load_rows():
+        release.wait(5)
+        return [(1, "Rajesh Sharma", "IA"), (2, "Sunita Varma", "RA"), (4, "Priya Nair", "IA")]
+
+    assert index.ensure(2, load_rows) is False
+    # The caller is not held up by the reload; queries see the previous index meanwhile
+    assert index.stamp == 1
+    assert _names(index, "Amit Patel") == [3]
+    assert index.ensure(3, load_rows) is False  # one refresh at a time
+
+    release.set()
+    index.wait(5)
+    assert index.stamp == 2
+    assert index.last_sync == {"added": 1, "changed": 1, "removed": 1}
+    assert _names(index, "Amit Patel") == []
+    assert _names(index, "Priya Nair") == [4]
+    assert _names(index, "Sunita Varma") == [2]
+    assert index.stats()["names"] == 3
+
+
+def test_failed_refresh_keeps_the_current_index():
+    index = NameIndex()
+    index.ensure(1, lambda: ROWS)
+
+    def broken():
+        raise RuntimeError("db gone")
+
+    index.ensure(2, broken)
+    index.wait(5)
+    assert (index.stamp, index.refresh_errors) == (1, 1)
+    assert _names(index, "Rajesh Sharma") == [1]
+    index.ensure(2, lambda: ROWS[:1], wait=True)
+    assert (index.stamp, index.stats()["names"]) == (2, 1)
+
+
+def _brute_force(index, query, limit, min_score):
+    """Exact ranking by scoring every indexed name (what the pruned search must reproduce)."""
+    from name_index import PHONETIC_WEIGHT, _dice, normalize_name, phonetic_key, trigrams
+
+    norm = normalize_name(query)
+    q_phon, q_norm = trigrams(phonetic_key(norm)), trigrams(norm)
+    scored = []
+    for uid, (_name, _typ, d_norm, d_phon, _n) in index._docs.items():
+        score = PHONETIC_WEIGHT * _dice(q_phon, trigrams(d_phon)) + (1 - PHONETIC_WEIGHT) * _dice(q_norm, trigrams(d_norm))
+        if score >= min_score:
+            scored.append((uid, score))
+    scored.sort(key=lambda x: (-x[1], x[0]))
+    return scored[:limit]
+
+
+def test_pruned_search_ranks_like_a_full_scan():
+    import random
+
+    rng = random.Random(3)
+    first = ["Rajesh", "Ramesh", "Suresh", "Mahesh", "Amit", "Sumit", "Priya", "Pooja", "Anil", "Sunil", "Kavita"]
+    last = ["Kumar", "Kumari", "Sharma", "Verma", "Varma", "Patel", "Singh", "Gupta", "Nair", "Iyer"]
+    rows = []
+    for uid in range(1, 6001):
+        name = f"{rng.choice(first)} {rng.choice(['', 'Kumar ', 'Lal '])}{rng.choice(last)}"
+        rows.append((uid, name, rng.choice(["IA", "RA"])))
+    index = NameIndex()
+    index.sync(rows)
+
+    queries = ["Rajesh Kumar", "Kumar", "Suresh Kumaar Sharma", "Priya Nair", "Sumeet Varma", "Anil Lal Gupta", "Kavitha Iyer"]
+    for query in queries:
+        for limit, min_score in ((20, 0.5), (5, 0.3), (50, 0.7)):
+            got = index.search(query, limit=limit, min_score=min_score)
+            want = _brute_force(index, query, limit, min_score)
+            assert [u for u, _ in got] == [u for u, _ in want], (query, limit, min_score)
+            assert all(abs(a - b) < 1e-12 for (_, a), (_, b) in zip(got, want))
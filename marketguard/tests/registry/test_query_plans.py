@@ -0,0 +1,51 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import risk_summary
+
+SEBI_DB = os.path.join(os.path.dirname(__file__), "..", "..", "services", "registry", "sebi_dummy.db")
+
+# The pre-aggregation's query it replaced, for an exact name
+LEGACY_NAME_SQL = "SELECT id FROM users WHERE full_name = ? ORDER BY id"
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("registry") / "r.db")
+    shutil.copyfile(SEBI_DB, path)
+    conn = sqlite3.connect(path)
+    risk_summary.install(conn)
+    yield conn
+    conn.close()
+
+
+def _plan(conn, sql, params):
+    return " | ".join(str(r[3]) for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+
+def test_no_plan_regressions(conn):
+    assert risk_summary.check_plans(conn) == []
+
+
+@pytest.mark.parametrize("col,idx", sorted(risk_summary.KEY_INDEXES.items()))
+def test_lookup_uses_its_covering_index(conn, col, idx):
+    for typed in (False, True):
+        plan = _plan(conn, risk_summary.lookup_sql(col, typed), ("x", "IA") if typed else ("x",))
+        assert f"USING INDEX {idx} ({col}=?" in plan, plan
+        assert "SCAN" not in plan, plan
+    bulk = risk_summary.bulk_sql(col, risk_summary.BULK_SLOTS)
+    plan = _plan(conn, bulk, ["x"] * risk_summary.BULK_SLOTS)
+    assert f"USING INDEX {idx}" in plan and "SCAN" not in plan, plan
+
+
+def test_exact_name_matches_like_the_base_tables(conn):
+    names = [r[0] for r in conn.execute("SELECT full_name FROM users ORDER BY id LIMIT 25")]
+    sql = risk_summary.lookup_sql("name_key", False)
+    for name in names:
+        for query in (name, f"  {name} ", name.upper(), name.lower()):
+            expected = [r[0] for r in conn.execute(LEGACY_NAME_SQL, (query.strip(),))]
+            got = sorted({r[0] for r in conn.execute(sql, (risk_summary.normalize_key("name_key", query),))})
+            assert got == expected, query
@@ -0,0 +1,77 @@
+import json
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+import risk_summary
+import snapshot
+
+TYPES = (None, "IA", "RA", "PMS", "BROKER", "NONE")
+
+
+@pytest.fixture
+def summary_db(registry_db):
+    conn = sqlite3.connect(registry_db)
+    risk_summary.install(conn)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    snapshot.build(registry_db, registry_db + ".snap")
+    return registry_db
+
+
+def _sql_lookup(conn, col, key, typ):
+    sql = risk_summary.lookup_sql(col, bool(typ))
+    return [dict(r) for r in conn.execute(sql, (key, typ) if typ else (key,))]
+
+
+def test_snapshot_lookup_matches_sqlite(summary_db):
+    snap = snapshot.Snapshot(summary_db + ".snap", summary_db)
+    assert snap.usable("stamp") and snap.state == "ok"
+    conn = sqlite3.connect(summary_db)
+    conn.row_factory = sqlite3.Row
+    checked = 0
+    for col in snapshot.KEY_COLS:
+        keys = [r[0] for r in conn.execute(f"SELECT DISTINCT {col} FROM {risk_summary.TABLE} WHERE {col} IS NOT NULL")]
+        keys += ["", "INA00000000", "ZZZZZ9999Z", "nobody@ybl", keys[0] + "X", keys[0][:-1]]
+        for key in keys:
+            for typ in TYPES:
+                assert snap.lookup(col, key, typ) == _sql_lookup(conn, col, key, typ), (col, key, typ)
+                checked += 1
+            every = [dict(r) for r in conn.execute(f"{risk_summary.SUMMARY_SELECT} WHERE {col} = ?", (key,))]
+            assert sorted(map(json.dumps, snap.lookup(col, key, None, limit=None))) == sorted(map(json.dumps, every))
+    conn.close()
+    assert checked > 1000
+
+
+def test_verify_answers_the_same_with_and_without_the_snapshot(summary_db, load_registry):
+    plain = TestClient(load_registry(summary_db).app)
+    with_snap = load_registry(summary_db, REGISTRY_SNAPSHOT=summary_db + ".snap")
+    client = TestClient(with_snap.app)
+
+    conn = sqlite3.connect(summary_db)
+    queries = [{"reg_no": r[0]} for r in conn.execute("SELECT sebi_reg_no FROM users WHERE sebi_reg_no IS NOT NULL LIMIT 15")]
+    queries += [{"pan": r[0].lower()} for r in conn.execute("SELECT pan_id FROM users WHERE pan_id IS NOT NULL LIMIT 15")]
+    queries += [{"upi": r[0].upper()} for r in conn.execute("SELECT upi_id FROM upi_accounts LIMIT 15")]
+    queries += [{"reg_no": "INA00000000"}, {"upi": "nobody@ybl", "type": "IA"}, {**queries[0], "type": "RA"}]
+    conn.close()
+
+    def same_answers():
+        for q in queries:
+            a = plain.get("/api/registry/v1/verify", params=q)
+            b = client.get("/api/registry/v1/verify", params=q)
+            assert a.status_code == b.status_code == 200
+            assert a.json() == b.json(), q
+
+    same_answers()
+    assert with_snap.SNAPSHOT.lookups > 0 and with_snap.SNAPSHOT.state == "ok"
+
+    # A write makes the snapshot stale: lookups go back to SQLite and still agree
+    writer = sqlite3.connect(summary_db)
+    writer.execute("UPDATE users SET account_status = 'suspended' WHERE sebi_reg_no = ?", (queries[0]["reg_no"],))
+    writer.commit()
+    lookups = with_snap.SNAPSHOT.lookups
+    same_answers()
+    writer.close()
+    assert with_snap.SNAPSHOT.lookups == lookups
+    assert with_snap.SNAPSHOT.state.startswith("stale")
@@ -0,0 +1,68 @@
+import random
+import re
+
+import text_scan
+
+# One pattern per kind, run separately and merged the way a per-pattern loop would:
+# left to right, UPI first at a shared offset, nothing that overlaps an earlier hit
+PER_KIND = [
+    ("upi", re.compile(r"(?<![\w@.\-])[A-Za-z0-9_.\-]{2,256}@[A-Za-z][A-Za-z0-9]{1,63}(?![\w@]|[.\-][A-Za-z0-9])")),
+    ("reg_no", re.compile(r"(?<![\w@])[Ii][Nn][AaHhPpZz][0-9]{8}\b")),
+    ("pan", re.compile(r"(?<![\w@])[A-Za-z]{5}[0-9]{4}[A-Za-z]\b")),
+]
+
+
+def per_pattern_scan(text):
+    found = []
+    for rank, (kind, rx) in enumerate(PER_KIND):
+        found.extend((m.start(), rank, kind, m.group(), m.end()) for m in rx.finditer(text))
+    out, end = [], 0
+    for start, _rank, kind, value, stop in sorted(found):
+        if start >= end:
+            out.append((kind, value, start, stop))
+            end = stop
+    return out
+
+
+def one_pass(text):
+    return [(h.kind, h.value, h.start, h.end) for h in text_scan.scan(text)]
+
+
+TOKENS = [
+    "INA12345678", "inh00000001", "INZ123456789", "INP1234567", "ABCDE1234F", "abcde1234f", "ABCD1234F",
+    "rahul.s@ybl", "a@b", "x_y-z@oksbi", "INA12345678@ybl", "ABCDE1234F@paytm", "user@mail.com",
+    "user@gmail.co.in", "-foo@ybl", ".bar@axl", "me@@ybl", "pay@ybl.", "pay@ybl-", "q@ybl1",
+    "Advisor", "SEBI", "reg", "no:", "(", ")", ",", ".", "-", "@", "_", "/", "\n", "\t", "₹500", "नमस्ते",
+]
+SEPARATORS = ["", "", " ", " ", "  ", ", ", ".", "-", "@", "/", "\n", ":"]
+
+
+def test_matches_the_per_pattern_loop_on_known_cases():
+    cases = {
+        "Reg INA12345678, PAN ABCDE1234F, pay rahul.s@ybl": [
+            ("reg_no", "INA12345678", 4, 15), ("pan", "ABCDE1234F", 21, 31), ("upi", "rahul.s@ybl", 37, 48),
+        ],
+        "INA12345678@ybl": [("upi", "INA12345678@ybl", 0, 15)],
+        "write to user@mail.com": [],
+        "INA123456789 ABCDE1234FG": [],
+    }
+    for text, want in cases.items():
+        assert one_pass(text) == per_pattern_scan(text) == want, text
+
+
+def test_matches_the_per_pattern_loop_on_random_text():
+    rng = random.Random(47)
+    for _ in range(3000):
+        parts = []
+        for _ in range(rng.randint(1, 12)):
+            parts.append(rng.choice(TOKENS))
+            parts.append(rng.choice(SEPARATORS))
+        text = "".join(parts)
+        assert one_pass(text) == per_pattern_scan(text), text
+
+
+def test_group_hits_collapses_to_normalized_keys():
+    hits = list(text_scan.scan("INA12345678 ina12345678 Me@YBL me@ybl ABCDE1234F"))
+    groups = text_scan.group_hits(hits)
+    assert list(groups) == [("reg_no", "INA12345678"), ("upi", "me@ybl"), ("pan", "ABCDE1234F")]
+    assert [len(v) for v in groups.values()] == [2, 2, 1]
@@ -0,0 +1,53 @@
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+
+def _some_reg_no(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT sebi_reg_no FROM users WHERE sebi_reg_no IS NOT NULL ORDER BY id LIMIT 1").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_verify_revalidates_until_the_data_changes(registry_db, load_registry):
+    main = load_registry(registry_db)
+    client = TestClient(main.app)
+    reg_no = _some_reg_no(registry_db)
+    url = "/api/registry/v1/verify"
+
+    first = client.get(url, params={"reg_no": reg_no})
+    assert first.status_code == 200 and first.json()["matches"]
+    etag = first.headers["etag"]
+
+    again = client.get(url, params={"reg_no": reg_no}, headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == etag
+    for header in (f"W/{etag}", f'"nope", {etag}', "*"):
+        assert client.get(url, params={"reg_no": reg_no}, headers={"If-None-Match": header}).status_code == 304
+
+    # Same matches under a different query echo are a different representation
+    other = client.get(url, params={"reg_no": reg_no.lower()}, headers={"If-None-Match": etag})
+    assert other.status_code == 200 and other.headers["etag"] != etag
+
+    # A commit to the DB moves the data version: the old tag no longer matches
+    writer = sqlite3.connect(registry_db)
+    writer.execute("UPDATE users SET full_name = 'Renamed Advisor' WHERE sebi_reg_no = ?", (reg_no,))
+    writer.commit()
+    writer.close()
+    changed = client.get(url, params={"reg_no": reg_no}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["matches"][0]["full_name"] == "Renamed Advisor"
+    assert client.get(url, params={"reg_no": reg_no}, headers={"If-None-Match": changed.headers["etag"]}).status_code == 304
+
+
+def test_unchanged_data_keeps_the_tag_across_cache_misses(registry_db, load_registry):
+    main = load_registry(registry_db, VERIFY_CACHE_ITEMS=0)
+    client = TestClient(main.app)
+    params = {"upi": "nobody@nowhere"}
+    a = client.get("/api/registry/v1/verify", params=params)
+    b = client.get("/api/registry/v1/verify", params=params, headers={"If-None-Match": a.headers["etag"]})
+    assert a.status_code == 200 and a.json()["matches"] == []
+    assert b.status_code == 304